@@ -0,0 +1,37 @@
+"""add metrics entry unique constraint
+
+Revision ID: 3f2a9c7d1b84
+Revises: 56b9e86e5425
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c7d1b84'
+down_revision: Union[str, None] = '56b9e86e5425'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Chave de conflito da ingestão em lote inclui o usuário
+    op.drop_constraint('unique_metric_entry', 'metrics', type_='unique')
+    op.create_unique_constraint(
+        'uq_metrics_entry',
+        'metrics',
+        ['user_id', 'platform_id', 'metric_name', 'collected_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_metrics_entry', 'metrics', type_='unique')
+    op.create_unique_constraint(
+        'unique_metric_entry',
+        'metrics',
+        ['platform_id', 'metric_name', 'collected_at']
+    )
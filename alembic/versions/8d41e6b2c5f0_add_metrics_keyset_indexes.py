@@ -0,0 +1,36 @@
+"""add metrics keyset indexes
+
+Revision ID: 8d41e6b2c5f0
+Revises: 3f2a9c7d1b84
+Create Date: 2026-10-18 11:03:27.552910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41e6b2c5f0'
+down_revision: Union[str, None] = '3f2a9c7d1b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Índices compostos para paginação keyset em (collected_at, id)
+    op.create_index('ix_metrics_collected_at_id', 'metrics', ['collected_at', 'id'], unique=False)
+    op.create_index('ix_metrics_user_collected_id', 'metrics', ['user_id', 'collected_at', 'id'], unique=False)
+    op.create_index('ix_metrics_platform_collected_id', 'metrics', ['platform_id', 'collected_at', 'id'], unique=False)
+    op.create_index('ix_metrics_name_collected_id', 'metrics', ['metric_name', 'collected_at', 'id'], unique=False)
+    # Prefixo de ix_metrics_user_collected_id: o índice antigo só custa escrita
+    op.drop_index('ix_metrics_user_collected', table_name='metrics')
+
+
+def downgrade() -> None:
+    op.create_index('ix_metrics_user_collected', 'metrics', ['user_id', 'collected_at'], unique=False)
+    op.drop_index('ix_metrics_name_collected_id', table_name='metrics')
+    op.drop_index('ix_metrics_platform_collected_id', table_name='metrics')
+    op.drop_index('ix_metrics_user_collected_id', table_name='metrics')
+    op.drop_index('ix_metrics_collected_at_id', table_name='metrics')
@@ -0,0 +1,56 @@
+"""add metric rollups table
+
+Revision ID: b7c3e1f9a2d6
+Revises: 8d41e6b2c5f0
+Create Date: 2026-10-18 12:20:05.117843
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c3e1f9a2d6'
+down_revision: Union[str, None] = '8d41e6b2c5f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'metric_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=10), nullable=False),
+        sa.Column('bucket_start', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('platform_id', sa.Integer(), nullable=False),
+        sa.Column('metric_name', sa.String(length=100), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('sum_value', sa.Numeric(precision=20, scale=2), nullable=False),
+        sa.Column('min_value', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.Column('max_value', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.Column('last_value', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.Column('last_collected_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['platform_id'], ['platforms.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'granularity', 'bucket_start', 'user_id', 'platform_id', 'metric_name',
+            name='uq_metric_rollups_bucket'
+        )
+    )
+    op.create_index(op.f('ix_metric_rollups_id'), 'metric_rollups', ['id'], unique=False)
+    op.create_index(
+        'ix_metric_rollups_granularity_bucket',
+        'metric_rollups',
+        ['granularity', 'bucket_start'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_metric_rollups_granularity_bucket', table_name='metric_rollups')
+    op.drop_index(op.f('ix_metric_rollups_id'), table_name='metric_rollups')
+    op.drop_table('metric_rollups')
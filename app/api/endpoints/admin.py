@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict, Optional
+from redis.exceptions import RedisError
+
+from app.services import polling_service
+from app.utils.collection_schedule import collection_scheduler
+from app.utils.debounce import refresh_debouncer
+from app.utils.dedup import get_deduplicator
+from app.utils.rate_limiter import Platform, quota_report, scheduler_stats
+from app.utils.webhook_stream import webhook_stream
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+@router.get("/rate-limits")
+def read_rate_limits(
+    platform: Optional[str] = Query(None, description="Filtra por plataforma (ex: twitter)"),
+    tenant: Optional[str] = Query(None, description="Filtra por tenant")
+) -> Dict[str, Any]:
+    """
+    Orçamento restante de cada cota (plataforma, credencial, endpoint) por tenant
+
+    Inclui as filas de prioridade deste worker (profundidade e espera).
+    """
+    selected = None
+    if platform:
+        selected = Platform.__members__.get(platform.upper())
+        if selected is None:
+            raise HTTPException(status_code=400, detail="Plataforma não suportada")
+
+    try:
+        quotas = quota_report(platform=selected, tenant=tenant)
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Rate limit indisponível: {str(e)}")
+
+    return {"quotas": quotas, "schedulers": scheduler_stats()}
+
+@router.get("/webhooks")
+def read_webhook_stats() -> Dict[str, Any]:
+    """
+    Ingestão de webhooks: tamanho do stream, entradas sem confirmação e
+    taxa de reentregas descartadas por plataforma
+    """
+    # Contadores ficam no Redis: valem também para os eventos vistos pelos workers
+    deduplication = [
+        get_deduplicator(f"webhooks:{platform}").stats()
+        for platform in ("facebook", "instagram", "twitter")
+    ]
+    return {
+        "stream": webhook_stream.stats(),
+        "deduplication": deduplication,
+        "refresh": refresh_debouncer.stats()
+    }
+
+@router.get("/collection-schedule")
+def read_collection_schedule(
+    limit: int = Query(100, ge=1, le=1000, description="Quantidade de próximas coletas")
+) -> Dict[str, Any]:
+    """
+    Próximas coletas periódicas: intervalo atual de cada conta, taxa de
+    variação aprendida do histórico e o motivo do intervalo escolhido
+    """
+    try:
+        accounts = polling_service.schedule_report(limit)
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Agenda de coleta indisponível: {str(e)}")
+
+    return {"schedule": collection_scheduler.stats(), "accounts": accounts}
@@ -1,15 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from app.db.database import get_db
 from app.db.models import Metric
-from app.schemas.metric import MetricCreate, MetricResponse
+from app.schemas.metric import (
+    MetricBulkRequest,
+    MetricBulkResponse,
+    MetricCreate,
+    MetricResponse
+)
 from app.schemas.social import TwitterUserMetrics, TwitterPostMetrics
-from app.services.metric_service import create_metric, get_metrics
+from app.services.metric_service import (
+    create_metric,
+    create_metrics_bulk,
+    get_metrics_page,
+    iter_metrics_csv,
+    iter_metrics_ndjson,
+    stream_metrics
+)
 from app.services.twitter_service import TwitterService
 
 router = APIRouter(prefix="/api/v1", tags=["metrics"])
+# Limite de linhas aceitas por requisição de ingestão em lote
+MAX_BULK_METRICS = 10000
 twitter_service = TwitterService()
 
 # Rotas para métricas internas
@@ -26,16 +42,79 @@ async def create_new_metric(metric: MetricCreate, db: Session = Depends(get_db))
             detail=f"Erro ao registrar métrica: {str(e)}"
         )
 
+@router.post("/metrics/bulk", response_model=MetricBulkResponse)
+def create_metrics_in_bulk(payload: MetricBulkRequest, db: Session = Depends(get_db)):
+    """
+    Registra várias métricas numa única transação
+
+    Retorna as linhas rejeitadas (com índice e motivo) e a vazão do lote.
+    """
+    if len(payload.metrics) > MAX_BULK_METRICS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote excede o limite de {MAX_BULK_METRICS} métricas"
+        )
+    try:
+        return create_metrics_bulk(
+            db=db,
+            rows=payload.metrics,
+            on_conflict=payload.on_conflict
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Erro ao registrar métricas em lote: {str(e)}"
+        )
+
 @router.get("/metrics", response_model=List[MetricResponse])
-async def list_metrics(
+def list_metrics(
+    response: Response,
     user_id: Optional[int] = None,
     platform_id: Optional[int] = None,
+    metric_name: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson", "csv"] = "json",
     db: Session = Depends(get_db)
 ):
     """
-    Lista métricas com filtros opcionais
+    Lista métricas com filtros opcionais, das mais recentes para as mais antigas
+
+    - **json**: paginação por cursor; o cursor da próxima página vem no
+      cabeçalho `X-Next-Cursor` (ausente na última página)
+    - **ndjson** / **csv**: exportação em streaming de todas as linhas filtradas
     """
-    return get_metrics(db=db, user_id=user_id, platform_id=platform_id)
+    filters = {
+        "user_id": user_id,
+        "platform_id": platform_id,
+        "metric_name": metric_name,
+        "start_date": start_date,
+        "end_date": end_date
+    }
+
+    if format != "json":
+        rows = stream_metrics(db, **filters)
+        if format == "csv":
+            return StreamingResponse(
+                iter_metrics_csv(rows),
+                media_type="text/csv",
+                headers={"Content-Disposition": "attachment; filename=metrics.csv"}
+            )
+        return StreamingResponse(
+            iter_metrics_ndjson(rows),
+            media_type="application/x-ndjson"
+        )
+
+    try:
+        metrics, next_cursor = get_metrics_page(db, limit=limit, cursor=cursor, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return metrics
 
 # Rotas para integração com APIs sociais
 @router.get("/metrics/twitter/{username}", response_model=TwitterUserMetrics)
@@ -4,12 +4,12 @@ from typing import List
 
 from app.db.database import get_db
 from app.db.models import User
-from app.schemas.user import UserCreate
+from app.schemas.user import UserCreate, UserResponse
 from app.services.user_service import create_user, get_user_by_id
 
 router = APIRouter()
 
-@router.post("/users", response_model=User, status_code=201)
+@router.post("/users", response_model=UserResponse, status_code=201)
 async def create_new_user(user: UserCreate, db: Session = Depends(get_db)):
     """
     Cria um novo usuário no sistema
@@ -22,7 +22,7 @@ async def create_new_user(user: UserCreate, db: Session = Depends(get_db)):
             detail=f"Erro ao criar usuário: {str(e)}"
         )
 
-@router.get("/users/{user_id}", response_model=User)
+@router.get("/users/{user_id}", response_model=UserResponse)
 async def read_user(user_id: int, db: Session = Depends(get_db)):
     """
     Busca um usuário pelo ID
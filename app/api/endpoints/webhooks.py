@@ -1,11 +1,29 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, HTTPException
 from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
 from app.core.config import settings
+from app.utils.webhook_stream import webhook_stream
+import asyncio
 import hmac
 import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+VALID_PLATFORMS = ["facebook", "instagram", "twitter"]
+
+def verify_facebook_signature(body: bytes, signature: str, secret: str) -> bool:
+    """Valida X-Hub-Signature(-256) da Meta (`sha1=<hex>` ou `sha256=<hex>`)"""
+    algo, _, digest = signature.partition("=")
+    hash_algo = {"sha1": hashlib.sha1, "sha256": hashlib.sha256}.get(algo)
+    if not hash_algo or not digest:
+        return False
+    expected_signature = hmac.new(secret.encode(), body, hash_algo).hexdigest()
+    return hmac.compare_digest(digest, expected_signature)
+
 async def verify_webhook_signature(request: Request) -> Request:
     """Middleware para validação HMAC de webhooks"""
     signature = request.headers.get('X-Signature')
@@ -44,53 +62,65 @@ async def verify_webhook_signature(request: Request) -> Request:
         X-Signature-Algo: sha256
     Body: { "event": "message", ... }
     ```
+
+    Com `WEBHOOK_FAST_ACK` o payload é apenas gravado no stream de webhooks
+    e processado pelos workers (`python -m app.workers.webhook_consumer`).
     """,
     responses={
         200: {"description": "Webhook processado com sucesso"},
         401: {"description": "Assinatura inválida"},
-        400: {"description": "Plataforma não suportada"}
-    }
+        400: {"description": "Plataforma não suportada"},
+        503: {"description": "Payload não armazenado; a plataforma deve reenviar"}
+    },
+    # A verificação HMAC lê o corpo e o injeta em request.state.verified_body
+    dependencies=[Depends(verify_webhook_signature)]
 )
 async def handle_webhook(
     platform: str,
-    request: Request = Depends(verify_webhook_signature)
+    request: Request
 ):
     """Endpoint base para recebimento de webhooks"""
-    body = request.state.verified_body
-    
     # Validação básica de plataforma
-    valid_platforms = ["facebook", "instagram", "twitter"]
-    if platform not in valid_platforms:
+    if platform not in VALID_PLATFORMS:
         raise HTTPException(status_code=400, detail="Plataforma não suportada")
-    
-    # Obter payload bruto para validação
-    body = await request.body()
-    signature = request.headers.get("x-hub-signature")
-    
+
+    # Corpo lido uma única vez, na verificação HMAC
+    body = request.state.verified_body
+
     if platform == "facebook":
+        signature = request.headers.get("x-hub-signature-256") or request.headers.get("x-hub-signature")
         if not signature or not verify_facebook_signature(
             body,
             signature,
             settings.FACEBOOK_APP_SECRET
         ):
             raise HTTPException(status_code=401, detail="Assinatura inválida")
-    
-    payload = await request.json()
-    
-    # Processar eventos do Facebook
-    if platform == "facebook":
-        if payload.get("object") == "page":
-            from app.workers.tasks import process_facebook_event
-            for entry in payload.get("entry", []):
-                for event in entry.get("changes", []):
-                    # Enfileirar evento para processamento assíncrono
-                    process_facebook_event.delay(
-                        event_type=event.get("field"),
-                        event_data=event.get("value"),
-                        page_id=entry.get("id")
-                    )
+
+    if settings.WEBHOOK_FAST_ACK:
+        # Um XADD e a resposta; os eventos são distribuídos pelos workers do stream
+        try:
+            await asyncio.to_thread(webhook_stream.append, platform, body)
+        except RedisError as e:
+            logger.error(f"Erro ao gravar webhook {platform} no stream: {str(e)}")
+            raise HTTPException(status_code=503, detail="Webhook não armazenado")
+    else:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Payload inválido")
+
+        # Processar eventos do Facebook
+        from app.workers.webhook_consumer import enqueue_deduplicated, extract_events
+        from app.workers.tasks import process_facebook_event
+
+        def enqueue(events):
+            for event in events:
+                # Enfileirar evento para processamento assíncrono
+                process_facebook_event.delay(**event)
+
+        await asyncio.to_thread(enqueue_deduplicated, platform, extract_events(platform, payload), enqueue)
     
     return JSONResponse(
         content={"status": "received", "platform": platform},
         status_code=200
-    )
\ No newline at end of file
+    )
@@ -85,6 +85,117 @@ class Settings(BaseSettings):
     BACKEND_CORS_ORIGINS: str = "*"
     ALGORITHM: str = "HS256" # Adicionar algoritmo JWT padrão se não existir
 
+    # Agregação de métricas entre plataformas
+    METRIC_AGGREGATOR_TIMEOUT: float = 10.0  # segundos por plataforma
+
+    # Rollups de métricas (rodar scripts/db/backfill_rollups.py ao habilitar)
+    METRIC_ROLLUPS_ENABLED: bool = False
+
+    # Cache de respostas (Redis)
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_SERIALIZER: str = "orjson"  # orjson, msgpack ou json
+    CACHE_COMPRESSION: str = "auto"  # auto, zstd, lz4, zlib ou none
+    CACHE_COMPRESSION_THRESHOLD: int = 1024  # bytes
+    CACHE_SCHEMA_VERSION: int = 1  # incrementar invalida entradas antigas
+    CACHE_LEGACY_PICKLE_READS: bool = True  # lê entradas pickle anteriores ao codec
+    CACHE_L1_ENABLED: bool = True  # LRU em memória na frente do Redis
+    CACHE_L1_MAXSIZE: int = 1024  # entradas por processo
+    CACHE_L1_TTL: float = 30.0  # segundos; limita a defasagem sem invalidação
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"  # canal pub/sub
+    CACHE_LOCK_TIMEOUT: float = 30.0  # TTL do lock de recálculo (segundos)
+    CACHE_LOCK_WAIT_TIMEOUT: float = 10.0  # espera pelo recálculo de outro processo
+    CACHE_REFRESH_WORKERS: int = 4  # threads de revalidação em segundo plano
+    CACHE_NAMESPACE_VERSION_TTL: float = 2.0  # segundos; versão de namespace sem L1
+
+    # Rate limiting distribuído (Redis)
+    RATE_LIMIT_MAX_WAIT: float = 5.0  # espera máxima por vaga antes de falhar (segundos)
+    RATE_LIMIT_AGING_SECONDS: float = 2.0  # envelhecimento da fila de prioridade (segundos por nível)
+    RATE_LIMIT_QUOTA_INDEX_TTL: int = 86400  # cotas sem uso saem da introspecção após (segundos)
+
+    # Orçamento adaptativo a partir dos cabeçalhos de rate limit das plataformas
+    RATE_BUDGET_LOW_WATERMARK: float = 0.5  # uso a partir do qual a vazão é reduzida
+    RATE_BUDGET_MIN_SCALE: float = 0.1  # fração mínima do limite configurado
+    RATE_BUDGET_RAMP_STEP: float = 0.1  # recuperação da vazão por resposta com folga
+    RATE_BUDGET_BLOCK_SECONDS: int = 60  # pausa quando a Graph API reporta 100% sem estimativa
+    RATE_BUDGET_TTL: int = 3600  # validade do orçamento observado (segundos)
+
+    # Circuit breaker distribuído (Redis)
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5  # taxa de falhas na janela que abre o circuito
+    CIRCUIT_BREAKER_MIN_CALLS: int = 20  # chamadas mínimas na janela antes de avaliar a taxa
+    CIRCUIT_BREAKER_WINDOW_SECONDS: int = 60  # janela deslizante de resultados (segundos)
+    CIRCUIT_BREAKER_OPEN_SECONDS: int = 30  # tempo aberto antes das sondas (segundos)
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES: int = 3  # sondas com sucesso necessárias para fechar
+
+    # Retentativas das chamadas às plataformas
+    RETRY_BUDGET_RATIO: float = 0.1  # retentativas permitidas por requisição recente
+    RETRY_BUDGET_MIN_RETRIES: int = 10  # retentativas sempre permitidas na janela
+    RETRY_BUDGET_WINDOW_SECONDS: int = 10  # janela do orçamento de retentativas (segundos)
+    RETRY_MAX_RETRY_AFTER: float = 10.0  # espera máxima pedida pela plataforma antes de desistir (segundos)
+
+    # Hedge de leituras sensíveis à latência
+    HEDGE_PERCENTILE: float = 0.95  # percentil de latência do endpoint que dispara a duplicata
+    HEDGE_MIN_SAMPLES: int = 20  # amostras mínimas antes de duplicar chamadas
+    HEDGE_SAMPLE_SIZE: int = 200  # latências recentes guardadas por endpoint
+    HEDGE_MIN_DELAY: float = 0.05  # atraso mínimo antes da duplicata (segundos)
+    HEDGE_MAX_RATIO: float = 0.05  # fração máxima de chamadas duplicadas
+
+    # Deduplicação de chamadas idênticas em andamento
+    REQUEST_COALESCING: bool = True  # GETs idênticos concorrentes compartilham a chamada
+    REQUEST_COALESCING_DISTRIBUTED: bool = False  # deduplica também entre processos (Redis)
+    REQUEST_COALESCING_RESULT_TTL: int = 2  # validade do resultado publicado (segundos)
+    REQUEST_COALESCING_WAIT_TIMEOUT: float = 10.0  # espera pelo líder de outro processo
+    REQUEST_COALESCING_LOCK_TIMEOUT: float = 30.0  # TTL do lock do líder (segundos)
+
+    # Paginação de históricos (backfill)
+    PAGINATION_CURSOR_TTL: int = 7 * 86400  # validade dos cursores salvos para retomada (segundos)
+
+    # Ingestão de webhooks (Redis Streams)
+    WEBHOOK_FAST_ACK: bool = True  # grava o payload bruto no stream e responde sem enfileirar eventos
+    WEBHOOK_STREAM_KEY: str = "webhooks:stream"
+    WEBHOOK_STREAM_GROUP: str = "webhook-workers"  # consumer group dos workers
+    WEBHOOK_STREAM_MAXLEN: int = 100000  # entradas mantidas no stream (aproximado)
+    WEBHOOK_STREAM_BATCH: int = 100  # entradas lidas por vez pelo worker
+    WEBHOOK_STREAM_BLOCK_MS: int = 5000  # espera por novas entradas (milissegundos)
+    WEBHOOK_STREAM_CLAIM_IDLE: int = 60  # entradas sem ack são reassumidas após (segundos)
+    WEBHOOK_FANOUT_BATCH: int = 100  # eventos por tarefa enfileirada
+    WEBHOOK_DEDUP: bool = True  # descarta reentregas antes de enfileirar
+    WEBHOOK_DEDUP_EXACT_TTL: int = 900  # IDs lembrados sem erro por (segundos)
+    WEBHOOK_DEDUP_WINDOW: int = 86400  # janela do filtro de Bloom (segundos)
+    WEBHOOK_DEDUP_CAPACITY: int = 1000000  # eventos por janela no dimensionamento do filtro
+    WEBHOOK_DEDUP_ERROR_RATE: float = 0.001  # falsos positivos tolerados (evento novo descartado)
+
+    # Debounce das coletas disparadas por webhooks
+    REFRESH_DEBOUNCE_WINDOW: float = 10.0  # espera após o último evento da conta (segundos)
+    REFRESH_DEBOUNCE_MAX_DELAY: float = 60.0  # atraso máximo após o primeiro evento (segundos)
+    REFRESH_DEBOUNCE_FLUSH_INTERVAL: float = 1.0  # intervalo de despacho das coletas devidas (segundos)
+    REFRESH_DEBOUNCE_BATCH: int = 50  # contas por coleta (limite do batch da Graph API)
+
+    # Agenda de coleta periódica das contas acompanhadas
+    COLLECT_SHARDS: int = 16  # sorted sets da roda de tempo, drenados em paralelo
+    COLLECT_TICK_SECONDS: float = 10.0  # intervalo entre rodadas da agenda (e jitter máximo)
+    COLLECT_DEFAULT_INTERVAL: float = 900.0  # intervalo de coleta sem padrão da plataforma (segundos)
+    COLLECT_INTERVALS: Dict[str, float] = {"facebook": 900.0, "instagram": 900.0}  # por plataforma
+    COLLECT_CHUNK_SIZE: int = 50  # contas por tarefa de coleta (limite do batch da Graph API)
+    COLLECT_SYNC_SECONDS: int = 300  # intervalo de sincronização com as contas do banco
+
+    # Intervalo de coleta adaptado à atividade de cada conta
+    ADAPTIVE_POLLING: bool = True
+    ADAPTIVE_MIN_INTERVAL: float = 300.0  # intervalo das contas mais ativas (segundos)
+    ADAPTIVE_MAX_INTERVAL: float = 6 * 3600.0  # intervalo das contas sem variação (segundos)
+    ADAPTIVE_TARGET_CHANGE: float = 0.01  # variação relativa esperada entre duas coletas
+    ADAPTIVE_EWMA_ALPHA: float = 0.3  # peso da variação mais recente na média
+    ADAPTIVE_HISTORY_DAYS: int = 7  # histórico de métricas considerado
+    ADAPTIVE_MIN_SAMPLES: int = 3  # variações mínimas antes de sair do padrão da plataforma
+    ADAPTIVE_BOOST_SECONDS: int = 1800  # intervalo mínimo após atividade via webhook (segundos)
+    ADAPTIVE_UPDATE_SECONDS: int = 900  # intervalo entre recálculos (segundos)
+
+    # Cliente HTTP assíncrono compartilhado (httpx)
+    HTTP_CLIENT_HTTP2: bool = True
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 100
+    HTTP_CLIENT_MAX_KEEPALIVE: int = 20
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = 30.0  # segundos
+    HTTP_CLIENT_TIMEOUT: float = 10.0  # segundos
+
     class Config:
         case_sensitive = True
         # Remover env_file = ".env"
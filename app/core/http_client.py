@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import weakref
+from typing import MutableMapping, Optional
+import httpx
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Um cliente por event loop: reaproveita conexões (keep-alive/HTTP2) entre
+# todos os serviços de redes sociais. O pool de conexões fica preso ao loop
+# em que foi criado, então loops diferentes (testes, asyncio.run em workers)
+# não podem compartilhar o mesmo cliente. Loops encerrados saem do mapa.
+_clients: MutableMapping[asyncio.AbstractEventLoop, httpx.AsyncClient] = weakref.WeakKeyDictionary()
+# Cliente de chamadas feitas fora de um event loop
+_client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    """Verifica se o pacote h2 (extra httpx[http2]) está instalado"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def _create_client() -> httpx.AsyncClient:
+    http2 = settings.HTTP_CLIENT_HTTP2 and _http2_available()
+    if settings.HTTP_CLIENT_HTTP2 and not http2:
+        logger.warning("Pacote h2 não instalado - usando HTTP/1.1")
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY
+        ),
+        timeout=settings.HTTP_CLIENT_TIMEOUT
+    )
+
+def get_async_client() -> httpx.AsyncClient:
+    """Retorna o httpx.AsyncClient do event loop atual, criando-o sob demanda"""
+    global _client
+    loop = _running_loop()
+    if loop is None:
+        if _client is None or _client.is_closed:
+            _client = _create_client()
+        return _client
+
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = _create_client()
+    return client
+
+async def close_async_client() -> None:
+    """Fecha o cliente do event loop atual (chamado no shutdown da aplicação)"""
+    client = _clients.pop(_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
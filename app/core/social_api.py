@@ -1,65 +1,368 @@
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import httpx
 import requests
 from pydantic import BaseModel, ValidationError
 from app.core.config import settings
-from app.utils.retry import retry
-from app.utils.rate_limiter import RateLimiter
+from app.core.http_client import get_async_client
+from app.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from app.utils.coalescing import request_coalescer, request_key
+from app.utils.hedging import get_hedge_budget, latency_tracker
+from app.utils.retry import RetryPolicy, get_retry_budget, is_retryable_error
+from app.utils.rate_budget import budget_store
+from app.utils.rate_limiter import (
+    Platform, RateLimiter, RateLimitExceeded, credential_hash, get_scheduler, quota_scope, rate_limit_key
+)
 
 logger = logging.getLogger(__name__)
 
+# Segmentos de caminho com dígitos (IDs) não entram na chave da cota
+_ID_SEGMENT = re.compile(r"[^/]*\d[^/]*")
+
+def _endpoint_template(endpoint: str) -> str:
+    """Caminho sem query string e com IDs trocados por {id}"""
+    return _ID_SEGMENT.sub("{id}", endpoint.split("?", 1)[0]).strip("/") or "root"
+
+def _is_retryable(error: Exception) -> bool:
+    """Cota local esgotada e circuito aberto falhariam do mesmo jeito na repetição"""
+    if isinstance(error, (RateLimitExceeded, CircuitOpenError)):
+        return False
+    return is_retryable_error(error)
+
+def _is_platform_failure(error: BaseException) -> bool:
+    """Falhas que contam para o circuit breaker: rede, timeout e HTTP 5xx"""
+    if isinstance(error, (requests.exceptions.HTTPError, httpx.HTTPStatusError)):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.exceptions.RequestException, httpx.TransportError))
+
+# Até 3 tentativas, dentro do orçamento de retentativas da plataforma
+REQUEST_RETRY_POLICY = RetryPolicy(
+    max_retries=2,
+    initial_delay=1,
+    is_retryable=_is_retryable,
+    budget=lambda api, *args, **kwargs: api.retry_budget
+)
+
+class _QuotaSlots:
+    """Várias vagas da mesma cota, obtidas em sequência (ex: itens de um batch)"""
+
+    def __init__(self, slot: Any, cost: int):
+        self.slot = slot
+        self.cost = cost
+
+    def __enter__(self):
+        for _ in range(self.cost):
+            self.slot.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        for _ in range(self.cost):
+            await self.slot.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
 class SocialAPI:
-    """Classe base para integração com APIs de redes sociais."""
-    
+    """
+    Classe base para integração com APIs de redes sociais.
+
+    Oferece dois caminhos de transporte: `_make_request` (síncrono, via
+    requests.Session, usado pelos workers Celery) e `_make_request_async`
+    (assíncrono, via cliente httpx compartilhado, usado pelas rotas FastAPI).
+
+    Plataformas com limite distribuído (enum Platform) passam pela fila de
+    prioridade compartilhada, cuja vazão acompanha o orçamento informado nos
+    cabeçalhos de rate limit de cada resposta; as demais usam um limitador
+    em processo. A cota é por (plataforma, credencial, endpoint) e a fila
+    divide a vazão entre tenants (`tenant`, padrão: a própria credencial).
+
+    Cada plataforma tem um circuit breaker compartilhado entre processos:
+    com a plataforma falhando (rede, timeout, 5xx) as chamadas falham na hora
+    com CircuitOpenError, sem consumir cota.
+    """
+
     def __init__(self, api_name: str):
         self.api_name = api_name
         self.base_url = ""
+        self.headers: Dict[str, str] = {}
+        self.timeout = 10
+        self.platform = Platform.__members__.get(api_name.upper())
+        # Usado apenas por APIs sem limite distribuído
         self.rate_limiter = RateLimiter(max_calls=5, period=1)
+        self.circuit_breaker = get_circuit_breaker(api_name)
+        self.retry_budget = get_retry_budget(api_name)
         self.session = requests.Session()
-        
-    @retry(max_retries=3, delay=1)
+
+    def _auth_headers(self) -> Dict[str, str]:
+        """Cabeçalhos de autenticação; sobrescrito pelas plataformas que precisam"""
+        return {}
+
+    def _observe_rate_limit(self, response: Any, scope: Optional[str] = None) -> None:
+        """Alimenta o orçamento compartilhado com os cabeçalhos da resposta"""
+        budget_store.observe(self.api_name, response.headers, scope)
+
+    def _quota(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]],
+        headers: Dict[str, Any],
+        quota_endpoint: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Chave de rate limit (plataforma, endpoint, credencial) e credencial da chamada"""
+        credential = headers.get("Authorization") or (params or {}).get("access_token")
+        if self.platform is None:
+            return None, credential
+
+        quota_endpoint = quota_endpoint or _endpoint_template(endpoint)
+        return rate_limit_key(self.platform, quota_endpoint, credential), credential
+
+    def _quota_slot(
+        self,
+        key: Optional[str],
+        credential: Optional[str],
+        tenant: Optional[str] = None,
+        max_wait: Optional[float] = None,
+        cost: int = 1
+    ) -> Any:
+        """
+        Vaga na cota da chamada; o tenant padrão é a própria credencial
+
+        `cost` é o número de chamadas que a plataforma contabiliza (ex: cada
+        item de um batch da Graph API conta como uma chamada).
+        """
+        if key is None:
+            slot = self.rate_limiter
+        else:
+            slot = get_scheduler(self.platform).slot(
+                key,
+                max_wait=settings.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait,
+                tenant=tenant or credential_hash(credential)
+            )
+        return slot if cost == 1 else _QuotaSlots(slot, cost)
+
+    def _build_url(self, endpoint: str) -> str:
+        return f"{self.base_url}{endpoint}"
+
+    def _build_headers(self, headers: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        merged = {**self.headers, **self._auth_headers()}
+        if headers:
+            merged.update(headers)
+        return merged
+
+    def _coalescing_key(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, Any]]
+    ) -> Optional[str]:
+        """Chave de deduplicação da chamada; só leituras (GET) são compartilhadas"""
+        if not settings.REQUEST_COALESCING or method.upper() != "GET":
+            return None
+        _, credential = self._quota(endpoint, params, self._build_headers(headers))
+        return request_key(method, self._build_url(endpoint), params, credential)
+
     def _make_request(
         self,
         method: str,
         endpoint: str,
         params: Optional[Dict[str, Any]] = None,
         data: Optional[Dict[str, Any]] = None,
-        headers: Optional[Dict[str, Any]] = None
+        headers: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None,
+        quota_endpoint: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Método genérico para fazer requisições HTTP."""
-        url = f"{self.base_url}{endpoint}"
-        
-        with self.rate_limiter:
+        """
+        Método genérico para fazer requisições HTTP.
+
+        `tenant` identifica o usuário dono da chamada na divisão da cota e
+        `quota_endpoint` agrupa caminhos no mesmo limite da plataforma. GETs
+        idênticos em andamento (método, URL, parâmetros e credencial)
+        compartilham uma única chamada à plataforma.
+        """
+        key = self._coalescing_key(method, endpoint, params, headers)
+        if key is None:
+            return self._send_request(method, endpoint, params, data, headers, tenant, quota_endpoint)
+        return request_coalescer.run(
+            key,
+            lambda: self._send_request(method, endpoint, params, data, headers, tenant, quota_endpoint)
+        )
+
+    @REQUEST_RETRY_POLICY
+    def _send_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None,
+        quota_endpoint: Optional[str] = None,
+        cost: int = 1
+    ) -> Any:
+        """
+        Chamada à plataforma, sem deduplicação; consome `cost` vagas da cota
+
+        Só falhas transitórias são retentadas (rede, timeout, 5xx e 429 com
+        Retry-After); cota local esgotada (RateLimitExceeded) e circuito
+        aberto (CircuitOpenError) não.
+        """
+        url = self._build_url(endpoint)
+        request_headers = self._build_headers(headers)
+        key, credential = self._quota(endpoint, params, request_headers, quota_endpoint)
+        scope = quota_scope(key) if key else None
+
+        with self.circuit_breaker.call(_is_platform_failure), self._quota_slot(key, credential, tenant, cost=cost):
             try:
                 response = self.session.request(
                     method=method,
                     url=url,
                     params=params,
                     json=data,
-                    headers=headers,
-                    timeout=10
+                    headers=request_headers,
+                    timeout=self.timeout
                 )
+                self._observe_rate_limit(response, scope)
                 response.raise_for_status()
                 return response.json()
             except requests.exceptions.RequestException as e:
                 self._handle_errors(e)
                 raise
-    
+
+    async def _make_request_async(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None,
+        quota_endpoint: Optional[str] = None,
+        hedge: bool = False
+    ) -> Dict[str, Any]:
+        """Versão assíncrona de _make_request sobre o cliente httpx compartilhado."""
+        key = self._coalescing_key(method, endpoint, params, headers)
+        if key is None:
+            return await self._send_request_async(
+                method, endpoint, params, data, headers, tenant, quota_endpoint, hedge
+            )
+        return await request_coalescer.run_async(
+            key,
+            lambda: self._send_request_async(method, endpoint, params, data, headers, tenant, quota_endpoint, hedge)
+        )
+
+    @REQUEST_RETRY_POLICY
+    async def _send_request_async(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None,
+        quota_endpoint: Optional[str] = None,
+        hedge: bool = False,
+        cost: int = 1
+    ) -> Any:
+        """
+        Versão assíncrona de _send_request.
+
+        Com `hedge=True` (leituras GET sensíveis à latência), se a resposta
+        demorar mais que o percentil HEDGE_PERCENTILE do endpoint, uma segunda
+        chamada idêntica é enviada e vale a primeira resposta. As duplicatas
+        ficam limitadas a HEDGE_MAX_RATIO das chamadas e só saem se houver
+        vaga imediata na cota da plataforma.
+        """
+        url = self._build_url(endpoint)
+        client = get_async_client()
+        request_headers = self._build_headers(headers)
+        key, credential = self._quota(endpoint, params, request_headers, quota_endpoint)
+        scope = quota_scope(key) if key else None
+        latency_key = f"{self.api_name}:{quota_endpoint or _endpoint_template(endpoint)}"
+
+        async def send(max_wait: Optional[float] = None) -> httpx.Response:
+            async with self._quota_slot(key, credential, tenant, max_wait, cost):
+                started = time.monotonic()
+                response = await client.request(
+                    method=method,
+                    url=url,
+                    params=params,
+                    json=data,
+                    headers=request_headers,
+                    timeout=self.timeout
+                )
+            if response.status_code < 500:
+                latency_tracker.record(latency_key, time.monotonic() - started)
+            # EVAL síncrono no Redis: fora do event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._observe_rate_limit, response, scope
+            )
+            return response
+
+        async with self.circuit_breaker.call(_is_platform_failure):
+            try:
+                if hedge and method.upper() == "GET":
+                    response = await self._hedged(send, latency_key)
+                else:
+                    response = await send()
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPError as e:
+                self._handle_errors(e)
+                raise
+
+    async def _hedged(self, send: Callable[..., Awaitable[httpx.Response]], latency_key: str) -> httpx.Response:
+        """Envia a chamada e, se ela passar do percentil do endpoint, uma duplicata"""
+        budget = get_hedge_budget(self.api_name)
+        budget.record_request()
+        primary = asyncio.ensure_future(send())
+        tasks = [primary]
+        try:
+            delay = latency_tracker.percentile(latency_key)
+            if delay is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=max(delay, settings.HEDGE_MIN_DELAY))
+            if done or not budget.try_spend():
+                return await primary
+
+            logger.debug(f"Hedge em {latency_key}: sem resposta após {delay:.3f}s")
+            # A duplicata não espera na fila: sem vaga imediata, segue só a original
+            tasks.append(asyncio.ensure_future(send(max_wait=0)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
     def _handle_errors(self, error: Exception) -> None:
         """Tratamento padrão de erros para todas as APIs."""
         error_msg = f"Erro na API {self.api_name}: {str(error)}"
         logger.error(error_msg)
-        
-        if isinstance(error, requests.exceptions.HTTPError):
+
+        if isinstance(error, (requests.exceptions.HTTPError, httpx.HTTPStatusError)):
             if error.response.status_code == 401:
                 logger.error("Erro de autenticação - verifique suas credenciais")
             elif error.response.status_code == 429:
                 logger.error("Rate limit excedido - aguarde antes de tentar novamente")
-    
+
     def validate_response(self, model: BaseModel, data: Dict[str, Any]) -> BaseModel:
         """Valida a resposta da API usando um modelo Pydantic."""
         try:
             return model(**data)
         except ValidationError as e:
             logger.error(f"Erro de validação na resposta da API {self.api_name}: {e}")
-            raise
\ No newline at end of file
+            raise
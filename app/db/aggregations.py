@@ -0,0 +1,190 @@
+import math
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session
+
+from app.db.models import Metric
+
+# Colunas permitidas em group_by
+GROUP_FIELDS = {
+    "metric_name": Metric.metric_name,
+    "platform_id": Metric.platform_id,
+    "user_id": Metric.user_id,
+}
+
+# Granularidades de agrupamento temporal suportadas
+TIME_BUCKETS = ("hour", "day", "week", "month")
+
+DEFAULT_STATS = ("count", "sum", "avg", "min", "max")
+
+_SQLITE_BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+    "month": "%Y-%m-01 00:00:00",
+}
+
+_PERCENTILE_PATTERN = re.compile(r"^p(\d{1,2}(?:\.\d+)?)$")
+
+
+def _dialect_name(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _bucket_expression(dialect: str, bucket: str):
+    """Expressão SQL que trunca collected_at para o início do intervalo"""
+    if bucket not in TIME_BUCKETS:
+        raise ValueError(f"Intervalo de agrupamento não suportado: {bucket}")
+
+    if dialect == "postgresql":
+        # Literal (validado acima) para que SELECT e GROUP BY usem a mesma expressão
+        return func.date_trunc(literal_column(f"'{bucket}'"), Metric.collected_at)
+
+    if dialect == "sqlite":
+        if bucket == "week":
+            # Semanas iniciam na segunda-feira, como o date_trunc do PostgreSQL
+            return func.strftime(
+                "%Y-%m-%d 00:00:00", Metric.collected_at, "weekday 0", "-6 days"
+            )
+        return func.strftime(_SQLITE_BUCKET_FORMATS[bucket], Metric.collected_at)
+
+    raise ValueError(f"Agrupamento temporal não suportado no dialeto {dialect}")
+
+
+def _percentile(stat: str) -> Optional[float]:
+    match = _PERCENTILE_PATTERN.match(stat)
+    if not match:
+        return None
+    return float(match.group(1)) / 100
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    return float(value)
+
+
+def _to_datetime(value: Any) -> Any:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def aggregate_metrics(
+    db: Session,
+    start_date: Optional[Any] = None,
+    end_date: Optional[Any] = None,
+    metric_name: Optional[str] = None,
+    platform_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    group_by: Sequence[str] = (),
+    bucket: Optional[str] = None,
+    stats: Sequence[str] = DEFAULT_STATS,
+) -> List[Dict[str, Any]]:
+    """
+    Calcula estatísticas de métricas diretamente no banco com GROUP BY
+
+    Args:
+        group_by: Colunas de agrupamento (metric_name, platform_id, user_id)
+        bucket: Agrupamento temporal opcional (hour, day, week, month)
+        stats: Estatísticas desejadas (count, sum, avg, min, max, stddev, pNN)
+
+    Returns:
+        Lista de dicionários, um por grupo, com as chaves de agrupamento
+        (incluindo "bucket" quando informado) e as estatísticas pedidas.
+        Percentis retornam None em dialetos sem percentile_cont (ex: SQLite).
+    """
+    dialect = _dialect_name(db)
+
+    for field in group_by:
+        if field not in GROUP_FIELDS:
+            raise ValueError(f"Campo de agrupamento não suportado: {field}")
+
+    group_columns = [GROUP_FIELDS[field].label(field) for field in group_by]
+    if bucket:
+        group_columns.append(_bucket_expression(dialect, bucket).label("bucket"))
+
+    stat_columns = []
+    unsupported = []
+    for stat in stats:
+        if stat == "count":
+            stat_columns.append(func.count(Metric.id).label("count"))
+        elif stat == "sum":
+            stat_columns.append(func.sum(Metric.value).label("sum"))
+        elif stat == "avg":
+            stat_columns.append(func.avg(Metric.value).label("avg"))
+        elif stat == "min":
+            stat_columns.append(func.min(Metric.value).label("min"))
+        elif stat == "max":
+            stat_columns.append(func.max(Metric.value).label("max"))
+        elif stat == "stddev":
+            if dialect == "postgresql":
+                stat_columns.append(func.stddev_samp(Metric.value).label("stddev"))
+            else:
+                # Sem stddev nativo: calcula a partir dos momentos agregados
+                stat_columns.extend([
+                    func.count(Metric.value).label("_n"),
+                    func.sum(Metric.value).label("_sum"),
+                    func.sum(Metric.value * Metric.value).label("_sum_sq"),
+                ])
+        elif _percentile(stat) is not None:
+            if dialect == "postgresql":
+                stat_columns.append(
+                    func.percentile_cont(_percentile(stat))
+                    .within_group(Metric.value)
+                    .label(stat)
+                )
+            else:
+                unsupported.append(stat)
+        else:
+            raise ValueError(f"Estatística não suportada: {stat}")
+
+    query = db.query(*group_columns, *stat_columns)
+
+    if start_date:
+        query = query.filter(Metric.collected_at >= start_date)
+    if end_date:
+        query = query.filter(Metric.collected_at <= end_date)
+    if metric_name:
+        query = query.filter(Metric.metric_name == metric_name)
+    if platform_id:
+        query = query.filter(Metric.platform_id == platform_id)
+    if user_id:
+        query = query.filter(Metric.user_id == user_id)
+
+    if group_columns:
+        query = query.group_by(*group_columns).order_by(*group_columns)
+
+    results = []
+    for row in query.all():
+        data = row._asdict()
+        item = {field: data[field] for field in group_by}
+        if bucket:
+            item["bucket"] = _to_datetime(data["bucket"])
+
+        for stat in stats:
+            if stat == "count":
+                item["count"] = data["count"] or 0
+            elif stat == "stddev" and "_sum_sq" in data:
+                item["stddev"] = _sample_stddev(
+                    data["_n"], _to_float(data["_sum"]), _to_float(data["_sum_sq"])
+                )
+            elif stat in unsupported:
+                item[stat] = None
+            else:
+                item[stat] = _to_float(data[stat])
+        results.append(item)
+
+    return results
+
+
+def _sample_stddev(
+    count: int, total: Optional[float], total_squares: Optional[float]
+) -> Optional[float]:
+    """Desvio padrão amostral a partir de n, soma e soma dos quadrados"""
+    if not count or count < 2 or total is None or total_squares is None:
+        return None
+    variance = (total_squares - (total * total) / count) / (count - 1)
+    return math.sqrt(max(variance, 0.0))
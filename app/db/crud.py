@@ -1,6 +1,16 @@
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import insert, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.services import rollup_service
 from . import models
 
+# Colunas que identificam uma métrica (constraint uq_metrics_entry)
+METRIC_CONFLICT_COLUMNS = ["user_id", "platform_id", "metric_name", "collected_at"]
+
 # Operações CRUD para Platform
 def create_platform(db: Session, name: str, url: str = None):
     db_platform = models.Platform(name=name, url=url)
@@ -34,18 +44,76 @@ def delete_platform(db: Session, platform_id: int):
     return db_platform
 
 # Operações CRUD para Metric
-def create_metric(db: Session, platform_id: int, metric_name: str, value: float, date: str):
+# Escritas de linha única mantêm os rollups (METRIC_ROLLUPS_ENABLED) na mesma transação
+def create_metric(db: Session, user_id: int, platform_id: int, metric_name: str, value: float, collected_at: datetime):
     db_metric = models.Metric(
+        user_id=user_id,
         platform_id=platform_id,
         metric_name=metric_name,
         value=value,
-        date=date
+        collected_at=collected_at
     )
     db.add(db_metric)
+    if settings.METRIC_ROLLUPS_ENABLED:
+        db.flush()
+        rollup_service.apply_metrics(db, [db_metric])
     db.commit()
     db.refresh(db_metric)
     return db_metric
 
+def _metric_insert_statement(dialect: str, rows: List[Dict[str, Any]], on_conflict: str):
+    if dialect == "postgresql":
+        stmt = pg_insert(models.Metric).values(rows)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(models.Metric).values(rows)
+    else:
+        return insert(models.Metric).values(rows)
+
+    if on_conflict == "update":
+        return stmt.on_conflict_do_update(
+            index_elements=METRIC_CONFLICT_COLUMNS,
+            set_={"value": stmt.excluded.value}
+        )
+    return stmt.on_conflict_do_nothing(index_elements=METRIC_CONFLICT_COLUMNS)
+
+def bulk_insert_metrics(db: Session, rows: List[Dict[str, Any]], on_conflict: str = "ignore") -> int:
+    """
+    Insere várias métricas com um único INSERT multi-linha (sem commit)
+
+    on_conflict: "ignore" descarta linhas já existentes; "update" sobrescreve o valor.
+    Retorna o número de linhas gravadas.
+    """
+    if not rows:
+        return 0
+
+    stmt = _metric_insert_statement(db.get_bind().dialect.name, rows, on_conflict)
+    return db.execute(stmt).rowcount
+
+def supports_insert_returning(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def bulk_insert_metrics_returning(db: Session, rows: List[Dict[str, Any]], on_conflict: str = "ignore") -> List[Any]:
+    """
+    Como bulk_insert_metrics, mas devolve as linhas efetivamente gravadas (PostgreSQL)
+
+    Cada linha traz chave, valor e `inserted` (False quando ON CONFLICT DO
+    UPDATE sobrescreveu uma linha existente). O resultado vem do próprio
+    INSERT, então continua correto com lotes concorrentes na mesma chave.
+    """
+    if not rows:
+        return []
+
+    stmt = _metric_insert_statement("postgresql", rows, on_conflict).returning(
+        models.Metric.user_id,
+        models.Metric.platform_id,
+        models.Metric.metric_name,
+        models.Metric.value,
+        models.Metric.collected_at,
+        # xmax = 0 só em linhas criadas por este INSERT
+        literal_column("xmax = 0").label("inserted")
+    )
+    return db.execute(stmt).all()
+
 def get_metric(db: Session, metric_id: int):
     return db.query(models.Metric).filter(models.Metric.id == metric_id).first()
 
@@ -56,6 +124,9 @@ def update_metric(db: Session, metric_id: int, value: float = None):
     db_metric = get_metric(db, metric_id)
     if db_metric and value:
         db_metric.value = value
+        if settings.METRIC_ROLLUPS_ENABLED:
+            db.flush()
+            rollup_service.refresh_buckets(db, [rollup_service.metric_key(db_metric)])
         db.commit()
         db.refresh(db_metric)
     return db_metric
@@ -63,7 +134,11 @@ def update_metric(db: Session, metric_id: int, value: float = None):
 def delete_metric(db: Session, metric_id: int):
     db_metric = get_metric(db, metric_id)
     if db_metric:
+        key = rollup_service.metric_key(db_metric)
         db.delete(db_metric)
+        if settings.METRIC_ROLLUPS_ENABLED:
+            db.flush()
+            rollup_service.refresh_buckets(db, [key])
         db.commit()
     return db_metric
 
@@ -106,4 +181,15 @@ def delete_user(db: Session, user_id: int):
     if db_user:
         db.delete(db_user)
         db.commit()
-    return db_user
\ No newline at end of file
+    return db_user
+
+def get_tracked_accounts(db: Session) -> List[Tuple[str, str]]:
+    """Contas acompanhadas: (plataforma, ID na plataforma) dos usuários ativos"""
+    rows = (
+        db.query(models.Platform.name, models.User.platform_user_id)
+        .join(models.User.platform)
+        .filter(models.User.is_active.is_(True), models.User.platform_user_id.isnot(None))
+        .distinct()
+        .all()
+    )
+    return [(name.lower(), account_id) for name, account_id in rows]
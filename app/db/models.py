@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, Date, Boolean, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Numeric, Date, Boolean, ForeignKey, TIMESTAMP, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -22,10 +22,48 @@ class Metric(Base):
     collected_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Chave natural usada para deduplicar ingestões em lote
+        UniqueConstraint(
+            "user_id", "platform_id", "metric_name", "collected_at",
+            name="uq_metrics_entry"
+        ),
+        # Índices compostos para paginação keyset em (collected_at, id)
+        Index("ix_metrics_collected_at_id", "collected_at", "id"),
+        Index("ix_metrics_user_collected_id", "user_id", "collected_at", "id"),
+        Index("ix_metrics_platform_collected_id", "platform_id", "collected_at", "id"),
+        Index("ix_metrics_name_collected_id", "metric_name", "collected_at", "id"),
+    )
+
     # Relacionamentos
     platform = relationship("Platform")
     user = relationship("User")
 
+class MetricRollup(Base):
+    """Agregados por intervalo (hora/dia/semana) mantidos incrementalmente"""
+    __tablename__ = "metric_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)  # hour, day ou week
+    bucket_start = Column(TIMESTAMP(timezone=True), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    platform_id = Column(Integer, ForeignKey("platforms.id", ondelete="CASCADE"), nullable=False)
+    metric_name = Column(String(100), nullable=False)
+    count = Column(Integer, nullable=False)
+    sum_value = Column(Numeric(20, 2), nullable=False)
+    min_value = Column(Numeric(15, 2), nullable=False)
+    max_value = Column(Numeric(15, 2), nullable=False)
+    last_value = Column(Numeric(15, 2), nullable=False)
+    last_collected_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "granularity", "bucket_start", "user_id", "platform_id", "metric_name",
+            name="uq_metric_rollups_bucket"
+        ),
+        Index("ix_metric_rollups_granularity_bucket", "granularity", "bucket_start"),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
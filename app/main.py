@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.http_client import close_async_client
 from app.utils.correlation import CorrelationIdMiddleware
 
 app = FastAPI()
@@ -23,4 +24,9 @@ async def health_check():
 @app.on_event("startup")
 async def startup_event():
     # Inicializar conexões com banco de dados e Redis aqui
-    pass
\ No newline at end of file
+    pass
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Fecha o pool de conexões HTTP compartilhado pelos serviços
+    await close_async_client()
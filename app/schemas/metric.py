@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel
 
 class MetricBase(BaseModel):
@@ -11,9 +12,47 @@ class MetricBase(BaseModel):
 class MetricCreate(MetricBase):
     pass
 
+class MetricBulkRequest(BaseModel):
+    # Linhas validadas individualmente para reportar rejeições por índice
+    metrics: List[Dict[str, Any]]
+    on_conflict: Literal["ignore", "update"] = "ignore"
+
+class MetricBulkReject(BaseModel):
+    index: int
+    error: str
+
+class MetricBulkResponse(BaseModel):
+    received: int
+    written: int
+    skipped: int  # conflitos ignorados na chave (user, plataforma, métrica, data)
+    rejected: List[MetricBulkReject] = []
+    elapsed_ms: float
+    rows_per_second: float
+
 class MetricResponse(MetricBase):
     id: int
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class PlatformMetrics(BaseModel):
+    """Métricas brutas retornadas pelo serviço de uma plataforma"""
+    engagement_rate: float = 0
+    reach: int = 0
+    impressions: int = 0
+    interactions: int = 0
+    messages_sent: Optional[int] = None
+    messages_received: Optional[int] = None
+
+class PlatformStatus(BaseModel):
+    """Resultado da coleta de uma plataforma na consolidação"""
+    status: str  # ok, timeout ou error
+    elapsed_ms: float
+    error: Optional[str] = None
+
+class SocialMetrics(BaseModel):
+    platforms: Dict[str, Dict[str, Any]]
+    status: Dict[str, PlatformStatus] = {}
+    date_from: datetime
+    date_to: datetime
@@ -39,6 +39,14 @@ class FacebookPostSchema(BaseModel):
     comments: int
     shares: int
 
+class InstagramPostSchema(BaseModel):
+    post_id: str
+    caption: Optional[str] = None
+    likes: int
+    comments: int
+    timestamp: Optional[datetime] = None
+    url: Optional[HttpUrl] = None
+
 class InstagramMediaSchema(BaseModel):
     media_id: str
     caption: Optional[str] = None
@@ -49,7 +57,7 @@ class InstagramMediaSchema(BaseModel):
 
 class WhatsAppMessageSchema(BaseModel):
     message_id: str
-    from_number: str = Field(..., regex=r"^\+\d{1,15}$")
+    from_number: str = Field(..., pattern=r"^\+\d{1,15}$")
     timestamp: datetime
     message_type: str
     content: Optional[str] = None
@@ -65,4 +73,40 @@ class SocialBatchRequest(BaseModel):
     start_date: datetime
     end_date: datetime
     account_ids: List[str] = Field(..., min_items=1)
-    metrics: List[str]
\ No newline at end of file
+    metrics: List[str]
+
+class TwitterPublicMetrics(BaseModel):
+    followers_count: int = 0
+    following_count: int = 0
+    tweet_count: int = 0
+    listed_count: int = 0
+
+class TwitterUserMetrics(BaseModel):
+    id: str
+    username: str
+    name: str
+    created_at: Optional[datetime] = None
+    public_metrics: TwitterPublicMetrics
+
+class TwitterTweetPublicMetrics(BaseModel):
+    retweet_count: int = 0
+    reply_count: int = 0
+    like_count: int = 0
+    quote_count: int = 0
+    impression_count: Optional[int] = None
+
+class TwitterPostMetrics(BaseModel):
+    id: str
+    text: str
+    created_at: Optional[datetime] = None
+    public_metrics: TwitterTweetPublicMetrics
+
+class TikTokMetricsResponse(BaseModel):
+    follower_count: int = 0
+    engagement_rate: float = 0
+    video_views: int = 0
+
+class WhatsAppMetrics(BaseModel):
+    messages_sent: int = 0
+    messages_received: int = 0
+    delivered_rate: Optional[float] = None
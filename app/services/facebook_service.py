@@ -1,15 +1,17 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Union
 from datetime import datetime
+import httpx
 import requests
-from app.core.social_api import SocialAPI
+from app.core.graph_api import GraphAPI, GraphBatchError
 from app.core.config import settings
 from app.schemas.social import FacebookPostSchema, PlatformType, SocialMediaResponse
+from app.utils.pagination import BACKFILL_TENANT
 from app.utils.api_cache import cache
 
 logger = logging.getLogger(__name__)
 
-class FacebookService(SocialAPI):
+class FacebookService(GraphAPI):
     """Serviço para integração com Facebook Graph API"""
     
     def __init__(self):
@@ -17,6 +19,15 @@ class FacebookService(SocialAPI):
         self.base_url = "https://graph.facebook.com/v18.0"
         self.access_token = settings.FACEBOOK_ACCESS_TOKEN
         
+    def _page_params(self) -> Dict[str, Any]:
+        return {
+            "fields": "fan_count,followers_count,posts.limit(10){created_time,message,shares,comments.limit(1).summary(true),reactions.limit(1).summary(true)}",
+            "access_token": self.access_token
+        }
+
+    def _page_request(self, page_id: str) -> Dict[str, Any]:
+        return {"method": "GET", "endpoint": f"/{page_id}", "params": self._page_params()}
+
     def get_facebook_metrics(self, page_id: str) -> SocialMediaResponse:
         """Obtém métricas de uma página do Facebook"""
         try:
@@ -24,47 +35,10 @@ class FacebookService(SocialAPI):
             page_data = self._make_request(
                 method="GET",
                 endpoint=f"/{page_id}",
-                params={
-                    "fields": "fan_count,followers_count,posts.limit(10){created_time,message,shares,comments.limit(1).summary(true),reactions.limit(1).summary(true)}",
-                    "access_token": self.access_token
-                }
+                params=self._page_params()
             )
-            
-            # Processa métricas
-            fan_count = page_data.get('fan_count', 0)
-            followers_count = page_data.get('followers_count', 0)
-            
-            recent_posts = []
-            for post in page_data.get('posts', {}).get('data', []):
-                try:
-                    recent_posts.append(
-                        FacebookPostSchema(
-                            post_id=post['id'],
-                            message=post.get('message', ''),
-                            created_time=post.get('created_time'),
-                            shares=post.get('shares', {}).get('count', 0),
-                            comments=post.get('comments', {}).get('summary', {}).get('total_count', 0),
-                            reactions=post.get('reactions', {}).get('summary', {}).get('total_count', 0),
-                            url=f"https://facebook.com/{post['id']}"
-                        ).dict()
-                    )
-                except (KeyError, ValueError) as e:
-                    logger.warning(f"Erro ao processar post {post.get('id')}: {str(e)}")
-            
-            metrics_data = {
-                "platform": PlatformType.FACEBOOK,
-                "account_id": page_id,
-                "timestamp": datetime.utcnow(),
-                "metrics": {
-                    "fan_count": fan_count,
-                    "followers_count": followers_count,
-                    "recent_posts": recent_posts
-                },
-                "raw_data": page_data
-            }
-            
-            return SocialMediaResponse(**metrics_data)
-            
+            return self._build_metrics_response(page_id, page_data)
+
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 400:
                 logger.error(f"Token de acesso inválido ou expirado: {str(e)}")
@@ -72,4 +46,104 @@ class FacebookService(SocialAPI):
             raise
         except Exception as e:
             logger.error(f"Erro inesperado: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    async def get_facebook_metrics_async(self, page_id: str) -> SocialMediaResponse:
+        """Versão assíncrona de get_facebook_metrics (cliente HTTP compartilhado)"""
+        try:
+            page_data = await self._make_request_async(
+                method="GET",
+                endpoint=f"/{page_id}",
+                params=self._page_params()
+            )
+            return self._build_metrics_response(page_id, page_data)
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 400:
+                logger.error(f"Token de acesso inválido ou expirado: {str(e)}")
+            logger.error(f"Erro na API Facebook: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Erro inesperado: {str(e)}")
+            raise
+
+    def get_facebook_metrics_many(self, page_ids: List[str]) -> Dict[str, Union[SocialMediaResponse, GraphBatchError]]:
+        """
+        Métricas de várias páginas em requisições batch da Graph API
+
+        Retorna, por página, o SocialMediaResponse ou o GraphBatchError do
+        item; a falha de uma página não afeta as demais.
+        """
+        page_ids = list(dict.fromkeys(page_ids))
+        results = self._graph_batch([self._page_request(page_id) for page_id in page_ids])
+        return self._build_many(page_ids, results)
+
+    async def get_facebook_metrics_many_async(
+        self,
+        page_ids: List[str]
+    ) -> Dict[str, Union[SocialMediaResponse, GraphBatchError]]:
+        """Versão assíncrona de get_facebook_metrics_many"""
+        page_ids = list(dict.fromkeys(page_ids))
+        results = await self._graph_batch_async([self._page_request(page_id) for page_id in page_ids])
+        return self._build_many(page_ids, results)
+
+    def iter_facebook_posts(
+        self,
+        page_id: str,
+        page_size: int = 100,
+        resume: bool = False,
+        tenant: str = BACKFILL_TENANT
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Todos os posts da página, do mais recente ao mais antigo (dados brutos)
+
+        Gerador assíncrono: busca a próxima página enquanto a atual é
+        consumida e salva o cursor no Redis; `resume` continua de onde a
+        última iteração parou.
+        """
+        request = {
+            "endpoint": f"/{page_id}/posts",
+            "params": {
+                "fields": "created_time,message,shares,comments.limit(0).summary(true),reactions.limit(0).summary(true)",
+                "limit": page_size,
+                "access_token": self.access_token
+            }
+        }
+        return self._iter_edge(request, resume_key=f"facebook:posts:{page_id}", resume=resume, tenant=tenant)
+
+    def _build_metrics_response(self, page_id: str, page_data: Dict[str, Any]) -> SocialMediaResponse:
+        """Processa a resposta da Graph API em um SocialMediaResponse"""
+        fan_count = page_data.get('fan_count', 0)
+        followers_count = page_data.get('followers_count', 0)
+
+        recent_posts = []
+        for post in page_data.get('posts', {}).get('data', []):
+            try:
+                recent_posts.append(
+                    FacebookPostSchema(
+                        post_id=post['id'],
+                        message=post.get('message', ''),
+                        created_time=post.get('created_time'),
+                        shares=post.get('shares', {}).get('count', 0),
+                        comments=post.get('comments', {}).get('summary', {}).get('total_count', 0),
+                        reactions=post.get('reactions', {}).get('summary', {}).get('total_count', 0),
+                        url=f"https://facebook.com/{post['id']}"
+                    ).dict()
+                )
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Erro ao processar post {post.get('id')}: {str(e)}")
+
+        metrics_data = {
+            "platform": PlatformType.FACEBOOK,
+            "id": f"facebook:{page_id}",
+            "account_id": page_id,
+            "timestamp": datetime.utcnow(),
+            "metrics": {
+                "fan_count": fan_count,
+                "followers_count": followers_count,
+                "recent_posts": recent_posts
+            },
+            "raw_data": page_data
+        }
+
+        return SocialMediaResponse(**metrics_data)
@@ -1,16 +1,18 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Union
 from datetime import datetime
+import httpx
 import requests
 import base64
-from app.core.social_api import SocialAPI
+from app.core.graph_api import GraphAPI, GraphBatchError
 from app.core.config import settings
 from app.schemas.social import InstagramPostSchema, PlatformType, SocialMediaResponse
+from app.utils.pagination import BACKFILL_TENANT
 from app.utils.api_cache import cache
 
 logger = logging.getLogger(__name__)
 
-class InstagramService(SocialAPI):
+class InstagramService(GraphAPI):
     """Serviço para integração com Instagram Graph API"""
     
     def __init__(self):
@@ -23,58 +25,26 @@ class InstagramService(SocialAPI):
         credentials = f"{settings.INSTAGRAM_APP_ID}:{settings.INSTAGRAM_APP_SECRET}"
         self.basic_auth = base64.b64encode(credentials.encode()).decode()
         
+    def _account_request(self, account_id: str) -> Dict[str, Any]:
+        return {
+            "method": "GET",
+            "endpoint": f"/{account_id}",
+            "params": {
+                "fields": "followers_count,follows_count,media_count,media.limit(10){caption,like_count,comments_count,timestamp,permalink}",
+                "access_token": settings.FACEBOOK_ACCESS_TOKEN  # Instagram usa token do Facebook
+            },
+            "headers": {
+                "Authorization": f"Basic {self.basic_auth}"
+            }
+        }
+
     def get_instagram_metrics(self, account_id: str) -> SocialMediaResponse:
         """Obtém métricas de uma conta do Instagram"""
         try:
             # Obtém informações básicas da conta
-            account_data = self._make_request(
-                method="GET",
-                endpoint=f"/{account_id}",
-                params={
-                    "fields": "followers_count,follows_count,media_count,media.limit(10){caption,like_count,comments_count,timestamp,permalink}",
-                    "access_token": settings.FACEBOOK_ACCESS_TOKEN  # Instagram usa token do Facebook
-                },
-                headers={
-                    "Authorization": f"Basic {self.basic_auth}"
-                }
-            )
-            
-            # Processa métricas
-            followers = account_data.get('followers_count', 0)
-            follows = account_data.get('follows_count', 0)
-            media_count = account_data.get('media_count', 0)
-            
-            recent_posts = []
-            for media in account_data.get('media', {}).get('data', []):
-                try:
-                    recent_posts.append(
-                        InstagramPostSchema(
-                            post_id=media['id'],
-                            caption=media.get('caption', ''),
-                            likes=media.get('like_count', 0),
-                            comments=media.get('comments_count', 0),
-                            timestamp=media.get('timestamp'),
-                            url=media.get('permalink')
-                        ).dict()
-                    )
-                except (KeyError, ValueError) as e:
-                    logger.warning(f"Erro ao processar post {media.get('id')}: {str(e)}")
-            
-            metrics_data = {
-                "platform": PlatformType.INSTAGRAM,
-                "account_id": account_id,
-                "timestamp": datetime.utcnow(),
-                "metrics": {
-                    "followers": followers,
-                    "following": follows,
-                    "media_count": media_count,
-                    "recent_posts": recent_posts
-                },
-                "raw_data": account_data
-            }
-            
-            return SocialMediaResponse(**metrics_data)
-            
+            account_data = self._make_request(**self._account_request(account_id))
+            return self._build_metrics_response(account_id, account_data)
+
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 400:
                 logger.error(f"Token de acesso inválido ou expirado: {str(e)}")
@@ -82,4 +52,100 @@ class InstagramService(SocialAPI):
             raise
         except Exception as e:
             logger.error(f"Erro inesperado: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    async def get_instagram_metrics_async(self, account_id: str) -> SocialMediaResponse:
+        """Versão assíncrona de get_instagram_metrics (cliente HTTP compartilhado)"""
+        try:
+            account_data = await self._make_request_async(**self._account_request(account_id))
+            return self._build_metrics_response(account_id, account_data)
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 400:
+                logger.error(f"Token de acesso inválido ou expirado: {str(e)}")
+            logger.error(f"Erro na API Instagram: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Erro inesperado: {str(e)}")
+            raise
+
+    def get_instagram_metrics_many(
+        self,
+        account_ids: List[str]
+    ) -> Dict[str, Union[SocialMediaResponse, GraphBatchError]]:
+        """
+        Métricas de várias contas em requisições batch da Graph API
+
+        Retorna, por conta, o SocialMediaResponse ou o GraphBatchError do
+        item; a falha de uma conta não afeta as demais.
+        """
+        account_ids = list(dict.fromkeys(account_ids))
+        results = self._graph_batch([self._account_request(account_id) for account_id in account_ids])
+        return self._build_many(account_ids, results)
+
+    async def get_instagram_metrics_many_async(
+        self,
+        account_ids: List[str]
+    ) -> Dict[str, Union[SocialMediaResponse, GraphBatchError]]:
+        """Versão assíncrona de get_instagram_metrics_many"""
+        account_ids = list(dict.fromkeys(account_ids))
+        results = await self._graph_batch_async([self._account_request(account_id) for account_id in account_ids])
+        return self._build_many(account_ids, results)
+
+    def iter_instagram_media(
+        self,
+        account_id: str,
+        page_size: int = 100,
+        resume: bool = False,
+        tenant: str = BACKFILL_TENANT
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Todas as mídias da conta, da mais recente à mais antiga (dados brutos)
+
+        Gerador assíncrono: busca a próxima página enquanto a atual é
+        consumida e salva o cursor no Redis; `resume` continua de onde a
+        última iteração parou.
+        """
+        request = self._account_request(account_id)
+        request["endpoint"] = f"/{account_id}/media"
+        request["params"]["fields"] = "caption,like_count,comments_count,timestamp,permalink"
+        request["params"]["limit"] = page_size
+        return self._iter_edge(request, resume_key=f"instagram:media:{account_id}", resume=resume, tenant=tenant)
+
+    def _build_metrics_response(self, account_id: str, account_data: Dict[str, Any]) -> SocialMediaResponse:
+        """Processa a resposta da Graph API em um SocialMediaResponse"""
+        followers = account_data.get('followers_count', 0)
+        follows = account_data.get('follows_count', 0)
+        media_count = account_data.get('media_count', 0)
+
+        recent_posts = []
+        for media in account_data.get('media', {}).get('data', []):
+            try:
+                recent_posts.append(
+                    InstagramPostSchema(
+                        post_id=media['id'],
+                        caption=media.get('caption', ''),
+                        likes=media.get('like_count', 0),
+                        comments=media.get('comments_count', 0),
+                        timestamp=media.get('timestamp'),
+                        url=media.get('permalink')
+                    ).dict()
+                )
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Erro ao processar post {media.get('id')}: {str(e)}")
+
+        metrics_data = {
+            "platform": PlatformType.INSTAGRAM,
+            "id": f"instagram:{account_id}",
+            "account_id": account_id,
+            "timestamp": datetime.utcnow(),
+            "metrics": {
+                "followers": followers,
+                "following": follows,
+                "media_count": media_count,
+                "recent_posts": recent_posts
+            },
+            "raw_data": account_data
+        }
+
+        return SocialMediaResponse(**metrics_data)
@@ -1,81 +1,181 @@
-from typing import Dict, List
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from fastapi import HTTPException
+from app.core.config import settings
 from app.services.facebook_service import FacebookService
 from app.services.instagram_service import InstagramService
 from app.services.twitter_service import TwitterService
 from app.services.whatsapp_service import WhatsAppService
-from app.schemas.metric import SocialMetrics, PlatformMetrics
+from app.schemas.metric import SocialMetrics, PlatformMetrics, PlatformStatus
+from app.schemas.social import SocialMediaResponse, WhatsAppMetrics
 from app.utils.date_utils import get_date_range
 
+logger = logging.getLogger(__name__)
+
+# Método assíncrono de cada serviço; todos usam o cliente HTTP compartilhado,
+# então o tempo limite cancela a requisição em vez de prender uma thread
+PLATFORM_FETCHERS = {
+    "facebook": "get_facebook_metrics_async",
+    "instagram": "get_instagram_metrics_async",
+    "twitter": "get_twitter_metrics_async",
+    "whatsapp": "get_whatsapp_metrics"
+}
+
+# Campos de interação dos posts recentes (Facebook, Instagram e Twitter)
+INTERACTION_FIELDS = ("likes", "comments", "shares", "reactions", "retweets", "replies")
+
 class MetricAggregator:
-    def __init__(self):
-        self.services = {
-            "facebook": FacebookService(),
-            "instagram": InstagramService(),
-            "twitter": TwitterService(),
-            "whatsapp": WhatsAppService()
-        }
+    def __init__(self, services: Optional[Dict[str, Any]] = None):
+        if services is None:
+            services = {
+                "facebook": FacebookService(),
+                "instagram": InstagramService(),
+                "twitter": TwitterService(),
+                "whatsapp": WhatsAppService()
+            }
+        self.services = services
 
-    async def get_all_metrics(self, 
+    async def get_all_metrics(self,
                             platforms: List[str] = None,
                             date_from: datetime = None,
-                            date_to: datetime = None) -> SocialMetrics:
-        """Consolida métricas de todas as plataformas"""
+                            date_to: datetime = None,
+                            timeout: Optional[float] = None,
+                            accounts: Optional[Dict[str, str]] = None) -> SocialMetrics:
+        """
+        Consolida métricas de todas as plataformas em paralelo
+
+        `accounts` mapeia plataforma -> ID da conta/página consultada (o
+        WhatsApp usa WHATSAPP_BUSINESS_ID por padrão). Cada plataforma tem seu
+        próprio tempo limite. Falhas e timeouts são reportados no bloco
+        `status` sem descartar as demais plataformas; só gera HTTPException
+        quando nenhuma plataforma responde.
+        """
         if not date_from or not date_to:
             date_from, date_to = get_date_range(days=7)
-            
+
         if not platforms:
             platforms = list(self.services.keys())
 
+        platforms = [platform for platform in platforms if platform in self.services]
+        if timeout is None:
+            timeout = settings.METRIC_AGGREGATOR_TIMEOUT
+        accounts = {"whatsapp": settings.WHATSAPP_BUSINESS_ID, **(accounts or {})}
+
+        outcomes = await asyncio.gather(*(
+            self._collect_platform(platform, accounts.get(platform), timeout)
+            for platform in platforms
+        ))
+
         results = {}
-        for platform in platforms:
-            if platform not in self.services:
-                continue
-                
-            try:
-                metrics = await self._get_platform_metrics(
-                    platform, 
-                    date_from, 
-                    date_to
-                )
-                results[platform] = self._normalize_metrics(platform, metrics)
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Erro ao buscar métricas de {platform}: {str(e)}"
-                )
+        status = {}
+        for platform, (metrics, platform_status) in zip(platforms, outcomes):
+            status[platform] = platform_status
+            if metrics is not None:
+                results[platform] = metrics
+
+        if platforms and not results:
+            errors = "; ".join(
+                f"{platform}: {platform_status.error}"
+                for platform, platform_status in status.items()
+            )
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erro ao buscar métricas das plataformas: {errors}"
+            )
 
         return SocialMetrics(
             platforms=results,
+            status=status,
             date_from=date_from,
             date_to=date_to
         )
 
-    async def _get_platform_metrics(self, 
+    async def _collect_platform(self,
+                                platform: str,
+                                account_id: Optional[str],
+                                timeout: float) -> Tuple[Optional[Dict], PlatformStatus]:
+        """Busca uma plataforma respeitando o tempo limite e registra o status"""
+        started = time.perf_counter()
+
+        def elapsed_ms() -> float:
+            return round((time.perf_counter() - started) * 1000, 2)
+
+        try:
+            metrics = await asyncio.wait_for(
+                self._get_platform_metrics(platform, account_id),
+                timeout=timeout
+            )
+            normalized = self._normalize_metrics(platform, metrics)
+            return normalized, PlatformStatus(status="ok", elapsed_ms=elapsed_ms())
+        except asyncio.TimeoutError:
+            logger.warning(f"Tempo limite excedido ao buscar métricas de {platform}")
+            return None, PlatformStatus(
+                status="timeout",
+                elapsed_ms=elapsed_ms(),
+                error=f"Tempo limite de {timeout}s excedido"
+            )
+        except Exception as e:
+            logger.error(f"Erro ao buscar métricas de {platform}: {str(e)}")
+            return None, PlatformStatus(
+                status="error",
+                elapsed_ms=elapsed_ms(),
+                error=str(e)
+            )
+
+    async def _get_platform_metrics(self,
                                   platform: str,
-                                  date_from: datetime,
-                                  date_to: datetime) -> PlatformMetrics:
+                                  account_id: Optional[str]) -> PlatformMetrics:
         """Obtém métricas de uma plataforma específica"""
-        service = self.services[platform]
-        return await service.get_metrics(date_from, date_to)
+        if not account_id:
+            raise ValueError(f"Conta de {platform} não informada")
+
+        fetch = getattr(self.services[platform], PLATFORM_FETCHERS[platform])
+        return self._to_platform_metrics(await fetch(account_id))
+
+    def _to_platform_metrics(self, result: Any) -> PlatformMetrics:
+        """Converte a resposta de um serviço em PlatformMetrics"""
+        if isinstance(result, WhatsAppMetrics):
+            return PlatformMetrics(
+                messages_sent=result.messages_sent,
+                messages_received=result.messages_received
+            )
+        if not isinstance(result, SocialMediaResponse):
+            return result
+
+        metrics = result.metrics
+        reach = metrics.get("followers_count", metrics.get("followers", 0))
+        posts = metrics.get("recent_posts") or metrics.get("recent_tweets") or []
+        interactions = sum(
+            post.get(field) or 0 for post in posts for field in INTERACTION_FIELDS
+        )
+        return PlatformMetrics(
+            engagement_rate=interactions / reach if reach else 0,
+            reach=reach,
+            interactions=interactions
+        )
 
-    def _normalize_metrics(self, 
+    def _normalize_metrics(self,
                          platform: str,
                          metrics: PlatformMetrics) -> Dict:
         """Normaliza métricas entre diferentes plataformas"""
+        if isinstance(metrics, dict):
+            metrics = PlatformMetrics(**metrics)
+
         normalized = {
             "engagement": metrics.engagement_rate,
             "reach": metrics.reach,
             "impressions": metrics.impressions,
             "interactions": metrics.interactions
         }
-        
+
         # WhatsApp tem métricas diferentes
         if platform == "whatsapp":
             normalized.update({
                 "messages_sent": metrics.messages_sent,
                 "messages_received": metrics.messages_received
             })
-            
-        return normalized
\ No newline at end of file
+
+        return normalized
@@ -1,9 +1,31 @@
+import base64
+import binascii
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import distinct, func, tuple_
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from typing import List, Optional
+from pydantic import ValidationError
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from app.db.models import Metric
-from app.schemas.metric import MetricCreate, MetricResponse
+from app.core.config import settings
+from app.db import crud
+from app.db.aggregations import aggregate_metrics
+from app.db.models import Metric, Platform, User
+from app.schemas.metric import (
+    MetricBulkReject,
+    MetricBulkResponse,
+    MetricCreate,
+    MetricResponse
+)
+from app.services import rollup_service
+
+# Linhas por INSERT multi-linha na ingestão em lote
+BULK_CHUNK_SIZE = 1000
 
 def create_metric(db: Session, metric: MetricCreate) -> Metric:
     """Cria uma nova entrada de métrica no banco de dados"""
@@ -16,24 +38,241 @@ def create_metric(db: Session, metric: MetricCreate) -> Metric:
     )
     
     db.add(db_metric)
+    if settings.METRIC_ROLLUPS_ENABLED:
+        db.flush()
+        rollup_service.apply_metrics(db, [db_metric])
     db.commit()
     db.refresh(db_metric)
     return db_metric
 
-def get_metrics(
-    db: Session, 
+def create_metrics_bulk(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    on_conflict: str = "ignore",
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> MetricBulkResponse:
+    """
+    Registra métricas em lote numa única transação
+
+    Linhas inválidas, duplicadas no próprio lote ou com usuário/plataforma
+    inexistentes são rejeitadas individualmente; as demais são gravadas com
+    INSERT multi-linha tratando conflitos em (user_id, platform_id,
+    metric_name, collected_at).
+    """
+    started = time.perf_counter()
+    rejected: List[MetricBulkReject] = []
+    valid: List[tuple] = []
+    seen: Dict[tuple, int] = {}
+
+    for index, row in enumerate(rows):
+        try:
+            metric = MetricCreate(**row)
+        except (ValidationError, TypeError) as e:
+            rejected.append(MetricBulkReject(index=index, error=str(e)))
+            continue
+
+        # Mesmo instante em fusos diferentes é a mesma chave no banco
+        key = rollup_service.metric_key(metric)
+        if key in seen:
+            rejected.append(MetricBulkReject(
+                index=index,
+                error=f"Entrada duplicada no lote (índice {seen[key]})"
+            ))
+            continue
+        seen[key] = index
+        valid.append((index, metric))
+
+    # Rejeita referências inexistentes antes de abrir a transação de escrita
+    user_ids = {metric.user_id for _, metric in valid}
+    platform_ids = {metric.platform_id for _, metric in valid}
+    known_users = {
+        row[0] for row in db.query(User.id).filter(User.id.in_(user_ids)).all()
+    } if user_ids else set()
+    known_platforms = {
+        row[0] for row in db.query(Platform.id).filter(Platform.id.in_(platform_ids)).all()
+    } if platform_ids else set()
+
+    to_insert = []
+    for index, metric in valid:
+        if metric.user_id not in known_users:
+            rejected.append(MetricBulkReject(
+                index=index, error=f"Usuário {metric.user_id} não encontrado"
+            ))
+        elif metric.platform_id not in known_platforms:
+            rejected.append(MetricBulkReject(
+                index=index, error=f"Plataforma {metric.platform_id} não encontrada"
+            ))
+        else:
+            to_insert.append(metric.model_dump())
+
+    written = 0
+    try:
+        for start in range(0, len(to_insert), chunk_size):
+            chunk = to_insert[start:start + chunk_size]
+            if not settings.METRIC_ROLLUPS_ENABLED:
+                written += crud.bulk_insert_metrics(db, chunk, on_conflict=on_conflict)
+            elif crud.supports_insert_returning(db):
+                # O próprio INSERT informa o que foi gravado: lotes concorrentes
+                # na mesma chave não contam a métrica duas vezes
+                rows_written = crud.bulk_insert_metrics_returning(db, chunk, on_conflict=on_conflict)
+                written += len(rows_written)
+                rollup_service.sync_written_metrics(db, rows_written)
+            else:
+                # Sem RETURNING (SQLite): consulta prévia, exata com um único escritor
+                existing = rollup_service.existing_metric_keys(db, chunk)
+                written += crud.bulk_insert_metrics(db, chunk, on_conflict=on_conflict)
+                rollup_service.sync_bulk_insert(db, chunk, existing, on_conflict)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    rejected.sort(key=lambda reject: reject.index)
+    return MetricBulkResponse(
+        received=len(rows),
+        written=written,
+        skipped=len(to_insert) - written,
+        rejected=rejected,
+        elapsed_ms=round(elapsed * 1000, 2),
+        rows_per_second=round(written / elapsed, 2) if elapsed > 0 else 0.0
+    )
+
+def encode_cursor(collected_at: datetime, metric_id: int) -> str:
+    """Gera cursor opaco a partir da última linha retornada"""
+    raw = json.dumps([collected_at.isoformat(), metric_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decodifica cursor opaco; gera ValueError se for inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        collected_at, metric_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(collected_at), int(metric_id)
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+def _filtered_metrics_query(
+    query,
     user_id: Optional[int] = None,
-    platform_id: Optional[int] = None
-) -> List[Metric]:
-    """Lista métricas com filtros opcionais"""
-    query = db.query(Metric)
-    
+    platform_id: Optional[int] = None,
+    metric_name: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+):
     if user_id:
         query = query.filter(Metric.user_id == user_id)
     if platform_id:
         query = query.filter(Metric.platform_id == platform_id)
-        
-    return query.order_by(Metric.collected_at.desc()).all()
+    if metric_name:
+        query = query.filter(Metric.metric_name == metric_name)
+    if start_date:
+        query = query.filter(Metric.collected_at >= start_date)
+    if end_date:
+        query = query.filter(Metric.collected_at <= end_date)
+    return query.order_by(Metric.collected_at.desc(), Metric.id.desc())
+
+def get_metrics(
+    db: Session, 
+    user_id: Optional[int] = None,
+    platform_id: Optional[int] = None,
+    metric_name: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> List[Metric]:
+    """Lista métricas com filtros opcionais (mais recentes primeiro)"""
+    query = _filtered_metrics_query(
+        db.query(Metric), user_id, platform_id, metric_name, start_date, end_date
+    )
+
+    if cursor:
+        # Paginação keyset: continua após a última linha (collected_at, id) vista
+        collected_at, metric_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(Metric.collected_at, Metric.id) < tuple_(collected_at, metric_id)
+        )
+
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+def get_metrics_page(
+    db: Session,
+    limit: int,
+    cursor: Optional[str] = None,
+    **filters
+) -> Tuple[List[Metric], Optional[str]]:
+    """Retorna uma página de métricas e o cursor da próxima (ou None)"""
+    rows = get_metrics(db, limit=limit + 1, cursor=cursor, **filters)
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].collected_at, rows[-1].id)
+
+# Colunas exportadas no modo streaming
+EXPORT_COLUMNS = [
+    "id", "user_id", "platform_id", "metric_name", "value", "collected_at", "created_at"
+]
+
+# Caracteres acumulados por pedaço enviado na exportação (um write por linha
+# custaria uma ida ao socket por métrica)
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def stream_metrics(db: Session, batch_size: int = 1000, **filters) -> Iterator[Any]:
+    """
+    Itera sobre as métricas filtradas usando cursor no servidor
+
+    Busca apenas as colunas exportadas, em lotes de `batch_size`, sem montar
+    objetos ORM nem carregar o resultado inteiro em memória.
+    """
+    query = _filtered_metrics_query(
+        db.query(*[getattr(Metric, column) for column in EXPORT_COLUMNS]),
+        **filters
+    )
+    yield from query.execution_options(stream_results=True).yield_per(batch_size)
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def iter_metrics_ndjson(rows: Iterable[Any], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """Serializa linhas exportadas como NDJSON (um objeto por linha), em pedaços de ~chunk_size"""
+    lines: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps({
+            column: _export_value(value) for column, value in zip(EXPORT_COLUMNS, row)
+        }) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(lines)
+            lines, size = [], 0
+
+    if lines:
+        yield "".join(lines)
+
+def iter_metrics_csv(rows: Iterable[Any], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """Serializa linhas exportadas como CSV com cabeçalho, em pedaços de ~chunk_size"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([_export_value(value) for value in row])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
 
 def calculate_metrics(
     db: Session,
@@ -45,29 +284,54 @@ def calculate_metrics(
     Calcula métricas agregadas por período
     Retorna: {
         "total": int,
+        "sum": float,
         "average": float,
         "min": float,
         "max": float
     }
     """
-    query = db.query(Metric).filter(
-        Metric.collected_at >= start_date,
-        Metric.collected_at <= end_date
-    )
-    
-    if metric_name:
-        query = query.filter(Metric.metric_name == metric_name)
-        
-    metrics = query.all()
-    values = [m.value for m in metrics]
-    
+    if settings.METRIC_ROLLUPS_ENABLED:
+        totals = rollup_service.rollup_totals(
+            db, start_date, end_date, metric_name=metric_name
+        )
+        if totals is not None:
+            return {
+                "total": totals["count"],
+                "sum": totals["sum"] or 0,
+                "average": totals["sum"] / totals["count"] if totals["count"] else 0,
+                "min": totals["min"] or 0,
+                "max": totals["max"] or 0
+            }
+
+    stats = aggregate_metrics(
+        db,
+        start_date=start_date,
+        end_date=end_date,
+        metric_name=metric_name
+    )[0]
+
     return {
-        "total": len(values),
-        "average": sum(values)/len(values) if values else 0,
-        "min": min(values) if values else 0,
-        "max": max(values) if values else 0
+        "total": stats["count"],
+        "sum": stats["sum"] or 0,
+        "average": stats["avg"] or 0,
+        "min": stats["min"] or 0,
+        "max": stats["max"] or 0
     }
 
+def _filter_period(query, start_date: Optional[str], end_date: Optional[str]):
+    if start_date and end_date:
+        query = query.filter(
+            Metric.collected_at >= start_date,
+            Metric.collected_at <= end_date
+        )
+    return query
+
+def _rollup_period(start_date: Optional[str], end_date: Optional[str]) -> tuple:
+    """Mesma regra de _filter_period: o período só vale com início e fim"""
+    if start_date and end_date:
+        return start_date, end_date
+    return None, None
+
 def get_platform_metrics(
     db: Session,
     platform_id: int,
@@ -77,22 +341,43 @@ def get_platform_metrics(
     """
     Calcula métricas agregadas por plataforma
     """
-    query = db.query(Metric).filter(
-        Metric.platform_id == platform_id
-    )
-    
-    if start_date and end_date:
-        query = query.filter(
-            Metric.collected_at >= start_date,
-            Metric.collected_at <= end_date
-        )
-        
-    metrics = query.all()
+    if settings.METRIC_ROLLUPS_ENABLED:
+        period = _rollup_period(start_date, end_date)
+        totals = rollup_service.rollup_totals(db, *period, platform_id=platform_id)
+        if totals is not None:
+            return {
+                "platform_id": platform_id,
+                "total_metrics": totals["count"],
+                "unique_users": len(rollup_service.rollup_distinct(
+                    db, "user_id", *period, platform_id=platform_id
+                )),
+                "metric_types": rollup_service.rollup_distinct(
+                    db, "metric_name", *period, platform_id=platform_id
+                )
+            }
+
+    totals = _filter_period(
+        db.query(
+            func.count(Metric.id),
+            func.count(distinct(Metric.user_id))
+        ).filter(Metric.platform_id == platform_id),
+        start_date,
+        end_date
+    ).one()
+
+    metric_types = _filter_period(
+        db.query(Metric.metric_name)
+        .filter(Metric.platform_id == platform_id)
+        .distinct(),
+        start_date,
+        end_date
+    ).all()
+
     return {
         "platform_id": platform_id,
-        "total_metrics": len(metrics),
-        "unique_users": len({m.user_id for m in metrics}),
-        "metric_types": list({m.metric_name for m in metrics})
+        "total_metrics": totals[0],
+        "unique_users": totals[1],
+        "metric_types": [row[0] for row in metric_types]
     }
 
 def get_user_metrics(
@@ -104,20 +389,42 @@ def get_user_metrics(
     """
     Calcula métricas agregadas por usuário
     """
-    query = db.query(Metric).filter(
-        Metric.user_id == user_id
-    )
-    
-    if start_date and end_date:
-        query = query.filter(
-            Metric.collected_at >= start_date,
-            Metric.collected_at <= end_date
-        )
-        
-    metrics = query.all()
+    if settings.METRIC_ROLLUPS_ENABLED:
+        period = _rollup_period(start_date, end_date)
+        totals = rollup_service.rollup_totals(db, *period, user_id=user_id)
+        if totals is not None:
+            return {
+                "user_id": user_id,
+                "total_metrics": totals["count"],
+                "platforms_used": rollup_service.rollup_distinct(
+                    db, "platform_id", *period, user_id=user_id
+                ),
+                "metric_types": rollup_service.rollup_distinct(
+                    db, "metric_name", *period, user_id=user_id
+                )
+            }
+
+    total = _filter_period(
+        db.query(func.count(Metric.id)).filter(Metric.user_id == user_id),
+        start_date,
+        end_date
+    ).scalar()
+
+    platforms = _filter_period(
+        db.query(Metric.platform_id).filter(Metric.user_id == user_id).distinct(),
+        start_date,
+        end_date
+    ).all()
+
+    metric_types = _filter_period(
+        db.query(Metric.metric_name).filter(Metric.user_id == user_id).distinct(),
+        start_date,
+        end_date
+    ).all()
+
     return {
         "user_id": user_id,
-        "total_metrics": len(metrics),
-        "platforms_used": list({m.platform_id for m in metrics}),
-        "metric_types": list({m.metric_name for m in metrics})
-    }
\ No newline at end of file
+        "total_metrics": total,
+        "platforms_used": [row[0] for row in platforms],
+        "metric_types": [row[0] for row in metric_types]
+    }
@@ -0,0 +1,174 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Metric, Platform, User
+from app.utils.collection_schedule import CollectionScheduler, collection_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Justificativa do intervalo atual de cada conta (hash membro -> JSON)
+REASONS_KEY = "collect:reasons"
+BOOST_PREFIX = "collect:boost:"
+
+AccountKey = Tuple[str, str]
+
+def ewma_change_rate(points: List[Tuple[datetime, float]], alpha: Optional[float] = None) -> Tuple[Optional[float], int]:
+    """
+    Média móvel exponencial da variação relativa por hora de uma série
+
+    `points` em ordem cronológica. Retorna (taxa, variações consideradas);
+    a taxa é None sem ao menos duas coletas em instantes distintos.
+    """
+    alpha = alpha or settings.ADAPTIVE_EWMA_ALPHA
+    rate = None
+    samples = 0
+    for (previous_at, previous), (current_at, current) in zip(points, points[1:]):
+        hours = (current_at - previous_at).total_seconds() / 3600
+        if hours <= 0:
+            continue
+        change = abs(current - previous) / max(abs(previous), 1.0) / hours
+        rate = change if rate is None else alpha * change + (1 - alpha) * rate
+        samples += 1
+    return rate, samples
+
+def account_change_rates(db: Session, since: datetime) -> Dict[AccountKey, Tuple[float, int]]:
+    """
+    Taxa de variação de cada conta a partir do histórico de `Metric`
+
+    Cada métrica da conta (seguidores, engajamento...) gera sua própria
+    EWMA; vale a da métrica que mais varia.
+    """
+    rows = (
+        db.query(Platform.name, User.platform_user_id, Metric.metric_name, Metric.collected_at, Metric.value)
+        .join(User, Metric.user_id == User.id)
+        .join(Platform, Metric.platform_id == Platform.id)
+        .filter(
+            Metric.platform_id == User.platform_id,
+            User.platform_user_id.isnot(None),
+            Metric.collected_at >= since
+        )
+        .order_by(Metric.user_id, Metric.metric_name, Metric.collected_at)
+        .yield_per(5000)
+    )
+
+    series: Dict[Tuple[str, str, str], List[Tuple[datetime, float]]] = {}
+    for platform, account_id, metric_name, collected_at, value in rows:
+        series.setdefault((platform.lower(), account_id, metric_name), []).append((collected_at, float(value)))
+
+    rates: Dict[AccountKey, Tuple[float, int]] = {}
+    for (platform, account_id, _), points in series.items():
+        rate, samples = ewma_change_rate(points)
+        if rate is None:
+            continue
+        best_rate, best_samples = rates.get((platform, account_id), (0.0, 0))
+        rates[(platform, account_id)] = (max(rate, best_rate), max(samples, best_samples))
+    return rates
+
+def adapted_interval(rate: Optional[float], samples: int, default: float) -> Tuple[float, str]:
+    """
+    Intervalo de coleta para a taxa de variação observada, e o porquê
+
+    O intervalo ideal é o tempo para a conta variar ADAPTIVE_TARGET_CHANGE,
+    limitado a [ADAPTIVE_MIN_INTERVAL, ADAPTIVE_MAX_INTERVAL]. Com pouco
+    histórico vale o padrão da plataforma.
+    """
+    if rate is None or samples < settings.ADAPTIVE_MIN_SAMPLES:
+        return default, f"histórico insuficiente ({samples} variações): intervalo padrão da plataforma"
+    if rate <= 0:
+        return settings.ADAPTIVE_MAX_INTERVAL, "sem variação no histórico: intervalo máximo"
+
+    ideal = settings.ADAPTIVE_TARGET_CHANGE / rate * 3600
+    interval = min(max(ideal, settings.ADAPTIVE_MIN_INTERVAL), settings.ADAPTIVE_MAX_INTERVAL)
+    reason = (
+        f"variação média (EWMA) de {rate:.3%}/h em {samples} coletas: "
+        f"{settings.ADAPTIVE_TARGET_CHANGE:.1%} de variação a cada {ideal / 60:.0f} min"
+    )
+    if interval != ideal:
+        reason += f", limitado a {interval / 60:.0f} min"
+    return interval, reason
+
+def _boosted(scheduler: CollectionScheduler, accounts: List[AccountKey]) -> List[bool]:
+    pipe = scheduler.redis.pipeline()
+    for platform, account_id in accounts:
+        pipe.exists(f"{BOOST_PREFIX}{platform}:{account_id}")
+    return [bool(exists) for exists in pipe.execute()]
+
+def adapt_intervals(db: Session, scheduler: Optional[CollectionScheduler] = None) -> int:
+    """
+    Recalcula o intervalo de todas as contas agendadas
+
+    Contas com reforço de webhook ativo ficam no intervalo mínimo até o
+    reforço expirar. Retorna quantas contas tiveram o intervalo recalculado.
+    """
+    scheduler = scheduler or collection_scheduler
+    since = datetime.now(timezone.utc) - timedelta(days=settings.ADAPTIVE_HISTORY_DAYS)
+    rates = account_change_rates(db, since)
+
+    accounts = scheduler.accounts()
+    intervals: Dict[AccountKey, float] = {}
+    reasons: Dict[str, str] = {}
+    for (platform, account_id), boosted in zip(accounts, _boosted(scheduler, accounts)):
+        if boosted:
+            continue
+        rate, samples = rates.get((platform, account_id), (None, 0))
+        interval, reason = adapted_interval(rate, samples, scheduler.default_interval(platform))
+        intervals[(platform, account_id)] = interval
+        reasons[f"{platform}:{account_id}"] = json.dumps({
+            "interval": interval,
+            "change_rate": rate,
+            "samples": samples,
+            "reason": reason,
+            "updated_at": time.time()
+        })
+
+    if intervals:
+        scheduler.set_intervals(intervals)
+        scheduler.redis.hset(REASONS_KEY, mapping=reasons)
+    logger.info(f"Intervalos de coleta recalculados para {len(intervals)} contas")
+    return len(intervals)
+
+def boost(platform: str, account_ids: Iterable[str], scheduler: Optional[CollectionScheduler] = None) -> None:
+    """
+    Coleta no intervalo mínimo por ADAPTIVE_BOOST_SECONDS após atividade
+    reportada por webhook; o próximo recálculo após o reforço restaura o
+    intervalo aprendido. Contas fora da agenda são ignoradas.
+    """
+    scheduler = scheduler or collection_scheduler
+    interval = settings.ADAPTIVE_MIN_INTERVAL
+    reason = json.dumps({
+        "interval": interval,
+        "reason": f"atividade via webhook: intervalo mínimo por {settings.ADAPTIVE_BOOST_SECONDS // 60} min",
+        "updated_at": time.time()
+    })
+    for account_id in dict.fromkeys(account_ids):
+        if not scheduler.set_interval(platform, account_id, interval):
+            continue
+        member = f"{platform}:{account_id}"
+        pipe = scheduler.redis.pipeline()
+        pipe.set(f"{BOOST_PREFIX}{member}", 1, ex=settings.ADAPTIVE_BOOST_SECONDS)
+        pipe.hset(REASONS_KEY, member, reason)
+        pipe.execute()
+
+def schedule_report(limit: int = 100, scheduler: Optional[CollectionScheduler] = None) -> List[Dict[str, Any]]:
+    """Próximas coletas com o intervalo de cada conta e a justificativa dele"""
+    scheduler = scheduler or collection_scheduler
+    entries = scheduler.entries(limit)
+    if not entries:
+        return []
+
+    accounts = [(entry["platform"], entry["account_id"]) for entry in entries]
+    members = [f"{platform}:{account_id}" for platform, account_id in accounts]
+    reasons = scheduler.redis.hmget(REASONS_KEY, members)
+    for entry, reason, boosted in zip(entries, reasons, _boosted(scheduler, accounts)):
+        details = json.loads(reason) if reason else {"reason": "intervalo padrão da plataforma"}
+        entry["boosted"] = boosted
+        entry["change_rate"] = details.get("change_rate")
+        entry["samples"] = details.get("samples")
+        entry["reason"] = details["reason"]
+    return entries
@@ -0,0 +1,404 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.db.models import Metric, MetricRollup
+
+logger = logging.getLogger(__name__)
+
+# Da granularidade mais fina para a mais grossa
+GRANULARITIES = ("hour", "day", "week")
+
+ROLLUP_KEY = ["granularity", "bucket_start", "user_id", "platform_id", "metric_name"]
+
+# Linhas por INSERT ... ON CONFLICT e por lote do backfill
+UPSERT_CHUNK_SIZE = 1000
+BACKFILL_BATCH_SIZE = 5000
+
+MetricKey = Tuple[int, int, str, datetime]
+
+def _as_utc(value: datetime) -> datetime:
+    """Intervalos são calculados em UTC; datas sem fuso são tratadas como UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def _field(row: Any, name: str) -> Any:
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """Início (UTC) do intervalo que contém `value`; semanas começam na segunda"""
+    value = _as_utc(value)
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Granularidade não suportada: {granularity}")
+
+def metric_key(row: Any) -> MetricKey:
+    return (
+        _field(row, "user_id"),
+        _field(row, "platform_id"),
+        _field(row, "metric_name"),
+        _as_utc(_field(row, "collected_at"))
+    )
+
+def _accumulate(rows: Iterable[Any]) -> Dict[tuple, Dict[str, Any]]:
+    """Pré-agrega as linhas por intervalo para enviar um único upsert por chave"""
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        value = Decimal(str(_field(row, "value")))
+        collected_at = _as_utc(_field(row, "collected_at"))
+
+        for granularity in GRANULARITIES:
+            key = (
+                granularity,
+                bucket_start(collected_at, granularity),
+                _field(row, "user_id"),
+                _field(row, "platform_id"),
+                _field(row, "metric_name")
+            )
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "count": 1,
+                    "sum_value": value,
+                    "min_value": value,
+                    "max_value": value,
+                    "last_value": value,
+                    "last_collected_at": collected_at
+                }
+                continue
+
+            bucket["count"] += 1
+            bucket["sum_value"] += value
+            bucket["min_value"] = min(bucket["min_value"], value)
+            bucket["max_value"] = max(bucket["max_value"], value)
+            if collected_at >= bucket["last_collected_at"]:
+                bucket["last_value"] = value
+                bucket["last_collected_at"] = collected_at
+    return buckets
+
+def _upsert_statement(db: Session, rows: List[Dict[str, Any]]):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = pg_insert(MetricRollup).values(rows)
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(MetricRollup).values(rows)
+    else:
+        raise ValueError(f"Rollups não suportados no dialeto {dialect}")
+
+    excluded = stmt.excluded
+    is_newer = excluded.last_collected_at >= MetricRollup.last_collected_at
+    return stmt.on_conflict_do_update(
+        index_elements=ROLLUP_KEY,
+        set_={
+            "count": MetricRollup.count + excluded.count,
+            "sum_value": MetricRollup.sum_value + excluded.sum_value,
+            "min_value": case(
+                (excluded.min_value < MetricRollup.min_value, excluded.min_value),
+                else_=MetricRollup.min_value
+            ),
+            "max_value": case(
+                (excluded.max_value > MetricRollup.max_value, excluded.max_value),
+                else_=MetricRollup.max_value
+            ),
+            "last_value": case(
+                (is_newer, excluded.last_value),
+                else_=MetricRollup.last_value
+            ),
+            "last_collected_at": case(
+                (is_newer, excluded.last_collected_at),
+                else_=MetricRollup.last_collected_at
+            )
+        }
+    )
+
+def apply_metrics(db: Session, rows: Iterable[Any]) -> int:
+    """
+    Incorpora métricas recém-inseridas aos rollups (sem commit)
+
+    Aceita objetos Metric, schemas ou dicionários com user_id, platform_id,
+    metric_name, value e collected_at. Retorna o número de intervalos afetados.
+    """
+    buckets = _accumulate(rows)
+    values = [dict(zip(ROLLUP_KEY, key), **agg) for key, agg in buckets.items()]
+
+    for start in range(0, len(values), UPSERT_CHUNK_SIZE):
+        db.execute(_upsert_statement(db, values[start:start + UPSERT_CHUNK_SIZE]))
+    return len(values)
+
+def existing_metric_keys(db: Session, rows: List[Any]) -> Set[MetricKey]:
+    """Chaves das linhas que já existem em `metrics` (antes de um insert em lote)"""
+    if not rows:
+        return set()
+
+    keys = [metric_key(row) for row in rows]
+    found = db.query(
+        Metric.user_id, Metric.platform_id, Metric.metric_name, Metric.collected_at
+    ).filter(
+        tuple_(
+            Metric.user_id, Metric.platform_id, Metric.metric_name, Metric.collected_at
+        ).in_(keys)
+    ).all()
+    return {metric_key(row) for row in found}
+
+def refresh_buckets(db: Session, keys: Iterable[MetricKey]) -> None:
+    """
+    Recalcula, a partir das linhas brutas, as semanas afetadas por métricas
+    sobrescritas (min/max não podem ser corrigidos incrementalmente)
+    """
+    series_weeks = {
+        (user_id, platform_id, metric_name, bucket_start(collected_at, "week"))
+        for user_id, platform_id, metric_name, collected_at in keys
+    }
+
+    for user_id, platform_id, metric_name, week in series_weeks:
+        week_end = week + timedelta(days=7)
+        db.query(MetricRollup).filter(
+            MetricRollup.user_id == user_id,
+            MetricRollup.platform_id == platform_id,
+            MetricRollup.metric_name == metric_name,
+            MetricRollup.bucket_start >= week,
+            MetricRollup.bucket_start < week_end
+        ).delete(synchronize_session=False)
+
+        rows = db.query(
+            Metric.user_id, Metric.platform_id, Metric.metric_name,
+            Metric.value, Metric.collected_at
+        ).filter(
+            Metric.user_id == user_id,
+            Metric.platform_id == platform_id,
+            Metric.metric_name == metric_name,
+            Metric.collected_at >= week,
+            Metric.collected_at < week_end
+        ).all()
+        apply_metrics(db, rows)
+
+def sync_bulk_insert(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    existing_keys: Set[MetricKey],
+    on_conflict: str
+) -> None:
+    """Atualiza os rollups após um insert em lote com tratamento de conflitos"""
+    apply_metrics(db, [row for row in rows if metric_key(row) not in existing_keys])
+
+    if on_conflict == "update":
+        updated = {metric_key(row) for row in rows} & existing_keys
+        if updated:
+            refresh_buckets(db, updated)
+
+def sync_written_metrics(db: Session, written: Iterable[Any]) -> None:
+    """
+    Atualiza os rollups a partir das linhas devolvidas por um INSERT ...
+    RETURNING (crud.bulk_insert_metrics_returning): linhas novas entram no
+    incremento e linhas sobrescritas recalculam a semana afetada
+    """
+    written = list(written)
+    apply_metrics(db, [row for row in written if row.inserted])
+
+    updated = {metric_key(row) for row in written if not row.inserted}
+    if updated:
+        refresh_buckets(db, updated)
+
+def rebuild_rollups(
+    db: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> int:
+    """
+    Reconstrói os rollups a partir das métricas brutas (backfill)
+
+    Processa semana a semana, com um commit por semana, apagando e recriando
+    os intervalos de cada janela. Retorna o número de métricas processadas.
+    """
+    if start_date is None or end_date is None:
+        first, last = db.query(
+            func.min(Metric.collected_at), func.max(Metric.collected_at)
+        ).one()
+        if first is None:
+            return 0
+        start_date = start_date or first
+        end_date = end_date or last
+
+    window = bucket_start(start_date, "week")
+    stop = bucket_start(end_date, "week") + timedelta(days=7)
+    processed = 0
+
+    while window < stop:
+        window_end = window + timedelta(days=7)
+        db.query(MetricRollup).filter(
+            MetricRollup.bucket_start >= window,
+            MetricRollup.bucket_start < window_end
+        ).delete(synchronize_session=False)
+
+        rows = db.query(
+            Metric.user_id, Metric.platform_id, Metric.metric_name,
+            Metric.value, Metric.collected_at
+        ).filter(
+            Metric.collected_at >= window,
+            Metric.collected_at < window_end
+        ).execution_options(stream_results=True).yield_per(BACKFILL_BATCH_SIZE)
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                apply_metrics(db, batch)
+                processed += len(batch)
+                batch = []
+        if batch:
+            apply_metrics(db, batch)
+            processed += len(batch)
+
+        db.commit()
+        logger.info(f"Rollups reconstruídos para a semana {window.date()} ({processed} métricas)")
+        window = window_end
+
+    return processed
+
+def _rollup_plan(
+    start_date: Any,
+    end_date: Any
+) -> Optional[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """
+    Escolhe a granularidade mais grossa que responde o período exatamente
+
+    Sem período usa os rollups semanais inteiros; com período, início e fim
+    precisam estar alinhados ao intervalo. Retorna None quando só as linhas
+    brutas respondem a consulta.
+    """
+    if start_date is None and end_date is None:
+        return GRANULARITIES[-1], None, None
+    if start_date is None or end_date is None:
+        return None
+
+    start, end = _parse_datetime(start_date), _parse_datetime(end_date)
+    if start is None or end is None:
+        return None
+
+    for granularity in reversed(GRANULARITIES):
+        if (bucket_start(start, granularity) == _as_utc(start)
+                and bucket_start(end, granularity) == _as_utc(end)):
+            return granularity, _as_utc(start), _as_utc(end)
+    return None
+
+def _filter_rollups(query, plan, metric_name=None, platform_id=None, user_id=None):
+    granularity, start, end = plan
+    query = query.filter(MetricRollup.granularity == granularity)
+    if start is not None:
+        query = query.filter(
+            MetricRollup.bucket_start >= start,
+            MetricRollup.bucket_start < end
+        )
+    if metric_name:
+        query = query.filter(MetricRollup.metric_name == metric_name)
+    if platform_id:
+        query = query.filter(MetricRollup.platform_id == platform_id)
+    if user_id:
+        query = query.filter(MetricRollup.user_id == user_id)
+    return query
+
+def _filter_end_instant(query, plan, metric_name=None, platform_id=None, user_id=None):
+    """Linhas brutas exatamente no fim do período (o filtro original é inclusivo)"""
+    query = query.filter(Metric.collected_at == plan[2])
+    if metric_name:
+        query = query.filter(Metric.metric_name == metric_name)
+    if platform_id:
+        query = query.filter(Metric.platform_id == platform_id)
+    if user_id:
+        query = query.filter(Metric.user_id == user_id)
+    return query
+
+def _to_float(value: Any) -> Optional[float]:
+    return float(value) if value is not None else None
+
+def rollup_totals(
+    db: Session,
+    start_date: Any = None,
+    end_date: Any = None,
+    **filters
+) -> Optional[Dict[str, Any]]:
+    """count/sum/min/max lidos dos rollups, ou None se não houver resposta exata"""
+    plan = _rollup_plan(start_date, end_date)
+    if plan is None:
+        return None
+
+    count, total, minimum, maximum = _filter_rollups(
+        db.query(
+            func.sum(MetricRollup.count),
+            func.sum(MetricRollup.sum_value),
+            func.min(MetricRollup.min_value),
+            func.max(MetricRollup.max_value)
+        ),
+        plan,
+        **filters
+    ).one()
+    parts = [(count or 0, _to_float(total), _to_float(minimum), _to_float(maximum))]
+
+    if plan[2] is not None:
+        edge = _filter_end_instant(
+            db.query(
+                func.count(Metric.id),
+                func.sum(Metric.value),
+                func.min(Metric.value),
+                func.max(Metric.value)
+            ),
+            plan,
+            **filters
+        ).one()
+        parts.append((edge[0] or 0, _to_float(edge[1]), _to_float(edge[2]), _to_float(edge[3])))
+
+    parts = [part for part in parts if part[0]]
+    return {
+        "count": int(sum(part[0] for part in parts)),
+        "sum": sum(part[1] for part in parts) if parts else None,
+        "min": min(part[2] for part in parts) if parts else None,
+        "max": max(part[3] for part in parts) if parts else None
+    }
+
+def rollup_distinct(
+    db: Session,
+    column: str,
+    start_date: Any = None,
+    end_date: Any = None,
+    **filters
+) -> Optional[List[Any]]:
+    """Valores distintos de user_id/platform_id/metric_name lidos dos rollups"""
+    plan = _rollup_plan(start_date, end_date)
+    if plan is None:
+        return None
+
+    values = {
+        row[0] for row in _filter_rollups(
+            db.query(getattr(MetricRollup, column)).distinct(), plan, **filters
+        ).all()
+    }
+    if plan[2] is not None:
+        values |= {
+            row[0] for row in _filter_end_instant(
+                db.query(getattr(Metric, column)).distinct(), plan, **filters
+            ).all()
+        }
+    return sorted(values)
@@ -1,13 +1,14 @@
 from typing import Dict, Any
 from app.core.social_api import SocialAPI
 from app.schemas.social import TikTokMetricsResponse
-from app.utils.retry import retry_on_failure
+from app.utils.retry import retry
 
 class TikTokService(SocialAPI):
     """Serviço para integração com a TikTok Business API"""
     
     def __init__(self):
-        super().__init__(platform='tiktok')
+        super().__init__(api_name='tiktok')
+        self.base_url = 'https://business-api.tiktok.com/open_api/v1.3'
         self.headers.update({
             'Authorization': f'Bearer {self._get_access_token()}'
         })
@@ -51,7 +52,17 @@ class TikTokService(SocialAPI):
         
         return token_data['access_token']
     
-    @retry_on_failure(max_retries=3)
+    def _metrics_request(self, business_id: str) -> Dict[str, Any]:
+        return {
+            'method': 'GET',
+            'endpoint': f'/business/{business_id}/metrics',
+            'params': {
+                'metrics': 'follower_count,engagement_rate,video_views',
+                'period': 'last_30_days'
+            }
+        }
+
+    @retry(max_retries=3)
     def get_tiktok_metrics(self, business_id: str) -> TikTokMetricsResponse:
         """Obtém métricas de negócios da API do TikTok
         
@@ -61,16 +72,18 @@ class TikTokService(SocialAPI):
         Returns:
             TikTokMetricsResponse: Modelo Pydantic com as métricas
         """
-        endpoint = f'business/{business_id}/metrics'
-        params = {
-            'metrics': 'follower_count,engagement_rate,video_views',
-            'period': 'last_30_days'
-        }
-        
-        data = self._make_request(endpoint, params)
+        data = self._make_request(**self._metrics_request(business_id))
+        return TikTokMetricsResponse(**data)
+
+    async def get_tiktok_metrics_async(self, business_id: str) -> TikTokMetricsResponse:
+        """Versão assíncrona de get_tiktok_metrics (cliente HTTP compartilhado)"""
+        data = await self._make_request_async(**self._metrics_request(business_id))
         return TikTokMetricsResponse(**data)
 
     def get_video_analytics(self, video_id: str) -> Dict[str, Any]:
         """Obtém análises detalhadas de um vídeo específico"""
-        endpoint = f'video/{video_id}/analytics'
-        return self._make_request(endpoint)
\ No newline at end of file
+        return self._make_request('GET', f'/video/{video_id}/analytics')
+
+    async def get_video_analytics_async(self, video_id: str) -> Dict[str, Any]:
+        """Versão assíncrona de get_video_analytics"""
+        return await self._make_request_async('GET', f'/video/{video_id}/analytics')
@@ -1,6 +1,8 @@
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, AsyncIterator, Optional, List, Tuple
 from datetime import datetime
+import httpx
 import requests
 from requests_oauthlib import OAuth2Session
 from pydantic import ValidationError
@@ -8,6 +10,7 @@ from app.core.social_api import SocialAPI
 from app.core.config import settings
 from app.schemas.social import TwitterPostSchema, PlatformType, SocialMediaResponse
 from app.utils.api_cache import cache
+from app.utils.pagination import BACKFILL_TENANT, iter_pages
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +50,16 @@ class TwitterService(SocialAPI):
             logger.error(f"Erro ao obter token OAuth2: {str(e)}")
             raise
     
+    def _auth_headers(self) -> Dict[str, str]:
+        """Inclui o token OAuth2 nas requisições síncronas e assíncronas"""
+        return {"Authorization": f"Bearer {self.oauth.token['access_token']}"}
+
+    def _tweets_params(self) -> Dict[str, Any]:
+        return {
+            "tweet.fields": "public_metrics,created_at",
+            "max_results": 10
+        }
+
     def get_twitter_metrics(self, account_id: str) -> SocialMediaResponse:
         """Obtém métricas de uma conta do Twitter"""
         try:
@@ -61,49 +74,10 @@ class TwitterService(SocialAPI):
             tweets_data = self._make_request(
                 method="GET",
                 endpoint=f"/users/{account_id}/tweets",
-                params={
-                    "tweet.fields": "public_metrics,created_at",
-                    "max_results": 10
-                }
+                params=self._tweets_params()
             )
-            
-            # Processa métricas
-            user_metrics = user_data.get('data', {}).get('public_metrics', {})
-            tweets = tweets_data.get('data', [])
-            
-            recent_tweets = []
-            for tweet in tweets:
-                try:
-                    recent_tweets.append(
-                        TwitterPostSchema(
-                            tweet_id=tweet['id'],
-                            text=tweet.get('text', ''),
-                            likes=tweet['public_metrics'].get('like_count', 0),
-                            retweets=tweet['public_metrics'].get('retweet_count', 0),
-                            replies=tweet['public_metrics'].get('reply_count', 0),
-                            url=f"https://twitter.com/user/status/{tweet['id']}"
-                        ).dict()
-                    )
-                except (KeyError, ValidationError) as e:
-                    logger.warning(f"Erro ao processar tweet {tweet.get('id')}: {str(e)}")
-            
-            metrics_data = {
-                "platform": PlatformType.TWITTER,
-                "account_id": account_id,
-                "timestamp": datetime.utcnow(),
-                "metrics": {
-                    "followers": user_metrics.get('followers_count', 0),
-                    "following": user_metrics.get('following_count', 0),
-                    "tweet_count": user_metrics.get('tweet_count', 0),
-                    "recent_tweets": recent_tweets
-                },
-                "raw_data": {
-                    "user": user_data,
-                    "tweets": tweets_data
-                }
-            }
-            
-            return SocialMediaResponse(**metrics_data)
+
+            return self._build_metrics_response(account_id, user_data, tweets_data)
             
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 401:
@@ -116,10 +90,122 @@ class TwitterService(SocialAPI):
             logger.error(f"Erro inesperado: {str(e)}")
             raise
 
-    def _make_request(self, method: str, endpoint: str, **kwargs):
-        """Sobrescreve método para incluir OAuth"""
-        headers = kwargs.get('headers', {})
-        headers['Authorization'] = f"Bearer {self.oauth.token['access_token']}"
-        kwargs['headers'] = headers
-        
-        return super()._make_request(method, endpoint, **kwargs)
\ No newline at end of file
+    async def get_twitter_metrics_async(self, account_id: str) -> SocialMediaResponse:
+        """Versão assíncrona de get_twitter_metrics (cliente HTTP compartilhado)"""
+        try:
+            user_data, tweets_data = await asyncio.gather(
+                self._make_request_async(
+                    method="GET",
+                    endpoint=f"/users/{account_id}",
+                    params={"user.fields": "public_metrics"}
+                ),
+                self._make_request_async(
+                    method="GET",
+                    endpoint=f"/users/{account_id}/tweets",
+                    params=self._tweets_params()
+                )
+            )
+            return self._build_metrics_response(account_id, user_data, tweets_data)
+
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Erro na API Twitter: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Erro inesperado: {str(e)}")
+            raise
+
+    async def get_user_metrics(self, username: str) -> Dict[str, Any]:
+        """Obtém dados públicos de um usuário pelo username (resposta bruta)"""
+        return await self._make_request_async(
+            method="GET",
+            endpoint=f"/users/by/username/{username}",
+            quota_endpoint="users/by/username",
+            params={"user.fields": "public_metrics,created_at"},
+            hedge=True
+        )
+
+    async def get_tweet_metrics(self, tweet_id: str) -> Dict[str, Any]:
+        """Obtém métricas públicas de um tweet (resposta bruta)"""
+        return await self._make_request_async(
+            method="GET",
+            endpoint=f"/tweets/{tweet_id}",
+            params={"tweet.fields": "public_metrics,created_at"},
+            hedge=True
+        )
+
+    def iter_tweets(
+        self,
+        account_id: str,
+        page_size: int = 100,
+        resume: bool = False,
+        tenant: str = BACKFILL_TENANT
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Todos os tweets do usuário, do mais recente ao mais antigo (dados brutos)
+
+        Segue `meta.next_token`; busca a próxima página enquanto a atual é
+        consumida e salva o cursor no Redis; `resume` continua de onde a
+        última iteração parou.
+        """
+        params = {
+            **self._tweets_params(),
+            # A API aceita de 5 a 100 tweets por página
+            "max_results": min(max(page_size, 5), 100)
+        }
+
+        async def fetch_page(cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+            page_params = dict(params, pagination_token=cursor) if cursor else params
+            page = await self._make_request_async(
+                method="GET",
+                endpoint=f"/users/{account_id}/tweets",
+                params=page_params,
+                tenant=tenant
+            )
+            return page.get("data") or [], (page.get("meta") or {}).get("next_token")
+
+        return iter_pages(fetch_page, resume_key=f"twitter:tweets:{account_id}", resume=resume)
+
+    def _build_metrics_response(
+        self,
+        account_id: str,
+        user_data: Dict[str, Any],
+        tweets_data: Dict[str, Any]
+    ) -> SocialMediaResponse:
+        """Processa as respostas da API em um SocialMediaResponse"""
+        user_metrics = user_data.get('data', {}).get('public_metrics', {})
+        tweets = tweets_data.get('data', [])
+
+        recent_tweets = []
+        for tweet in tweets:
+            try:
+                recent_tweets.append(
+                    TwitterPostSchema(
+                        tweet_id=tweet['id'],
+                        text=tweet.get('text', ''),
+                        likes=tweet['public_metrics'].get('like_count', 0),
+                        retweets=tweet['public_metrics'].get('retweet_count', 0),
+                        replies=tweet['public_metrics'].get('reply_count', 0),
+                        url=f"https://twitter.com/user/status/{tweet['id']}"
+                    ).dict()
+                )
+            except (KeyError, ValidationError) as e:
+                logger.warning(f"Erro ao processar tweet {tweet.get('id')}: {str(e)}")
+
+        metrics_data = {
+            "platform": PlatformType.TWITTER,
+            "id": f"twitter:{account_id}",
+            "account_id": account_id,
+            "timestamp": datetime.utcnow(),
+            "metrics": {
+                "followers": user_metrics.get('followers_count', 0),
+                "following": user_metrics.get('following_count', 0),
+                "tweet_count": user_metrics.get('tweet_count', 0),
+                "recent_tweets": recent_tweets
+            },
+            "raw_data": {
+                "user": user_data,
+                "tweets": tweets_data
+            }
+        }
+
+        return SocialMediaResponse(**metrics_data)
@@ -40,7 +40,7 @@ class WhatsAppService:
                 url=url,
                 method="POST",
                 headers=self.headers,
-                json_data=payload
+                json=payload
             )
             return True
         except Exception as e:
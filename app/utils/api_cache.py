@@ -1,70 +1,595 @@
 import redis
 from redis.exceptions import RedisError
 from app.core.config import settings
+import asyncio
+import json
 import logging
-from typing import Optional, Any, Callable, TypeVar, cast
-import pickle
-from functools import wraps
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Any, Awaitable, Callable, Dict, Iterable, Set, Tuple, TypeVar, cast
+from functools import partial, wraps
+from app.utils.cache_codec import CacheCodec, CodecError, get_codec
+from app.utils.cache_keys import DEFAULT_IGNORE, CacheKeyBuilder, UnstableKeyError
+from app.utils.local_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 T = TypeVar('T')
 
+# Envelope gravado pelo decorator cached: valor, expiração lógica e custo do cálculo
+_ENVELOPE_MARKER = "__cached__"
+_LOCK_PREFIX = "lock:"
+_NAMESPACE_PREFIX = "cache_ns:"
+_LOCK_POLL_INTERVAL = 0.05  # segundos
+
+# Remove o lock apenas se ainda pertencer a quem o obteve
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Revalidações em segundo plano das funções síncronas
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=settings.CACHE_REFRESH_WORKERS,
+    thread_name_prefix="cache-refresh"
+)
+
+def _freshness(expires_at: float, delta: float, stale_ttl: int, beta: float) -> str:
+    """
+    Classifica uma entrada: "fresh", "refresh" (servir e revalidar) ou "expired"
+
+    Antes do vencimento aplica o XFetch: a revalidação é antecipada com
+    probabilidade crescente conforme o vencimento se aproxima, proporcional ao
+    custo do último cálculo (delta).
+    """
+    now = time.time()
+    if now < expires_at:
+        if beta > 0 and delta > 0:
+            if now - delta * beta * math.log(1.0 - random.random()) >= expires_at:
+                return "refresh"
+        return "fresh"
+    if now < expires_at + stale_ttl:
+        return "refresh"
+    return "expired"
+
+def _unwrap_entry(entry: Any) -> Optional[Tuple[Any, float, float]]:
+    if entry is None:
+        return None
+    if isinstance(entry, dict) and entry.get(_ENVELOPE_MARKER) == 1:
+        return entry["v"], entry["exp"], entry["d"]
+    # Entrada gravada sem envelope: considerada válida até o TTL físico
+    return entry, float("inf"), 0.0
+
 class APICache:
-    """Gerencia cache de respostas de API usando Redis"""
-    
-    def __init__(self):
+    """
+    Gerencia cache de respostas de API usando Redis
+
+    Opcionalmente mantém uma camada L1 em memória (LRU com TTL) na frente do
+    Redis. Escritas e remoções são publicadas num canal pub/sub para que os
+    demais processos descartem suas cópias locais; enquanto a inscrição no
+    canal não estiver ativa, a L1 não é usada.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[CacheCodec] = None,
+        local_cache: Optional[LRUCache] = None
+    ):
         self.redis_client = redis.Redis.from_url(
             settings.REDIS_URL,
             decode_responses=False
         )
-        
-    def get(self, key: str) -> Optional[Any]:
-        """Obtém valor do cache"""
+        self.codec = codec or get_codec()
+
+        if local_cache is None and settings.CACHE_L1_ENABLED:
+            local_cache = LRUCache(settings.CACHE_L1_MAXSIZE, settings.CACHE_L1_TTL)
+        self.local = local_cache
+        self.invalidation_channel = settings.CACHE_INVALIDATION_CHANNEL
+
+        self.redis_stats = {"hits": 0, "misses": 0, "errors": 0}
+        self.invalidations_received = 0
+        self._listener_pid: Optional[int] = None
+        self._listener_lock = threading.Lock()
+        self._subscribed = threading.Event()
+        self._stop = threading.Event()
+        self.node_id = uuid.uuid4().hex
+
+        # Versões de namespace quando a L1 está desligada: sem invalidação
+        # via pub/sub, valem por poucos segundos (defasagem máxima entre processos)
+        self._versions = LRUCache(maxsize=256, ttl=settings.CACHE_NAMESPACE_VERSION_TTL)
+
+        self._release_script = None
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._inflight_async: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
+
+    def _local_enabled(self) -> bool:
+        """L1 só é confiável com a inscrição de invalidação ativa neste processo"""
+        if self.local is None:
+            return False
+        if self._listener_pid != os.getpid():
+            self._start_invalidation_listener()
+        return self._subscribed.is_set()
+
+    def _start_invalidation_listener(self) -> None:
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+
+            # Após fork (ex: workers Celery) a thread do processo pai não existe
+            self._listener_pid = os.getpid()
+            self.node_id = uuid.uuid4().hex
+            self._subscribed = threading.Event()
+            self.local.clear()
+            threading.Thread(
+                target=self._listen_invalidations,
+                name="cache-invalidation",
+                daemon=True
+            ).start()
+
+    def _listen_invalidations(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.invalidation_channel)
+                # Invalidações perdidas enquanto desconectado: descarta a L1 inteira
+                self.local.clear()
+                self._subscribed.set()
+                backoff = 1.0
+
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._handle_invalidation(message["data"])
+            except RedisError as e:
+                logger.warning(f"Canal de invalidação do cache indisponível: {str(e)}")
+                self._subscribed.clear()
+                self.local.clear()
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                pubsub.close()
+
+    def _handle_invalidation(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning("Mensagem de invalidação de cache inválida")
+            return
+
+        if message.get("node") == self.node_id:
+            return
+        self.invalidations_received += 1
+        for key in message.get("keys", []):
+            self.local.delete(key)
+
+    def _invalidation_message(self, key: str) -> str:
+        return json.dumps({"node": self.node_id, "keys": [key]})
+
+    def get(self, key: str, local: bool = True) -> Optional[Any]:
+        """
+        Obtém valor do cache
+
+        Args:
+            local: Se False, ignora a camada L1 (ex: contadores compartilhados)
+        """
+        use_local = local and self._local_enabled()
         try:
-            cached_data = self.redis_client.get(key)
-            if cached_data:
-                return pickle.loads(cached_data)
+            cached_data = self.local.get(key) if use_local else None
+            if cached_data is None:
+                ttl_ms = None
+                if use_local:
+                    # PTTL na mesma ida ao Redis: a cópia local não sobrevive à chave
+                    pipe = self.redis_client.pipeline(transaction=False)
+                    pipe.get(key)
+                    pipe.pttl(key)
+                    cached_data, ttl_ms = pipe.execute()
+                else:
+                    cached_data = self.redis_client.get(key)
+                if not cached_data:
+                    self.redis_stats["misses"] += 1
+                    return None
+
+                self.redis_stats["hits"] += 1
+                if use_local:
+                    # -1: chave sem expiração (vale o TTL da L1)
+                    self.local.set(key, cached_data, ttl_ms / 1000 if ttl_ms >= 0 else None)
+            return self.codec.decode(cached_data)
+        except CodecError as e:
+            # Entrada de outra versão de schema ou corrompida: tratada como miss
+            logger.warning(f"Entrada de cache descartada ({key}): {str(e)}")
+            if self.local is not None:
+                self.local.delete(key)
             return None
         except RedisError as e:
+            self.redis_stats["errors"] += 1
             logger.error(f"Erro ao acessar cache: {str(e)}")
             return None
-            
-    def set(self, key: str, value: Any, timeout: int = 3600) -> bool:
+
+    def set(self, key: str, value: Any, timeout: int = 3600, local: bool = True) -> bool:
         """Armazena valor no cache com timeout em segundos"""
         try:
-            serialized = pickle.dumps(value)
-            return self.redis_client.setex(
-                key,
-                timeout,
-                serialized
-            )
+            serialized = self.codec.encode(value)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(key, timeout, serialized)
+            if self.local is not None:
+                pipe.publish(self.invalidation_channel, self._invalidation_message(key))
+            stored = pipe.execute()[0]
+
+            if self.local is not None:
+                if local and self._local_enabled():
+                    self.local.set(key, serialized, timeout)
+                else:
+                    self.local.delete(key)
+            return stored
+        except (TypeError, ValueError) as e:
+            logger.error(f"Valor não serializável para o cache ({key}): {str(e)}")
+            return False
         except RedisError as e:
+            self.redis_stats["errors"] += 1
             logger.error(f"Erro ao armazenar no cache: {str(e)}")
             return False
-            
+
     def delete(self, key: str) -> bool:
         """Remove valor do cache"""
+        if self.local is not None:
+            self.local.delete(key)
         try:
-            return self.redis_client.delete(key) > 0
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.delete(key)
+            if self.local is not None:
+                pipe.publish(self.invalidation_channel, self._invalidation_message(key))
+            return pipe.execute()[0] > 0
         except RedisError as e:
+            self.redis_stats["errors"] += 1
             logger.error(f"Erro ao remover do cache: {str(e)}")
             return False
 
-    def cached(self, timeout: int = 3600, key_prefix: str = "cache_"):
-        """Decorator para cache automático de resultados de função"""
+    def namespace_version(self, namespace: str) -> int:
+        """
+        Versão atual do namespace
+
+        Mantida na L1 (invalidada via pub/sub) ou, sem L1, num cache local de
+        CACHE_NAMESPACE_VERSION_TTL segundos, para não custar um GET por chamada.
+        """
+        key = f"{_NAMESPACE_PREFIX}{namespace}"
+        versions = self.local if self._local_enabled() else self._versions
+        version = versions.get(key)
+        if version is not None:
+            return version
+
+        try:
+            raw = self.redis_client.get(key)
+        except RedisError as e:
+            self.redis_stats["errors"] += 1
+            logger.error(f"Erro ao ler versão do namespace {namespace}: {str(e)}")
+            return 0
+
+        version = int(raw) if raw else 0
+        versions.set(key, version)
+        return version
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        """
+        Invalida todas as chaves do namespace incrementando sua versão
+
+        As entradas antigas deixam de ser lidas e expiram pelo próprio TTL.
+        """
+        key = f"{_NAMESPACE_PREFIX}{namespace}"
+        self._versions.delete(key)
+        if self.local is not None:
+            self.local.delete(key)
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.incr(key)
+            if self.local is not None:
+                pipe.publish(self.invalidation_channel, self._invalidation_message(key))
+            return pipe.execute()[0]
+        except RedisError as e:
+            self.redis_stats["errors"] += 1
+            logger.error(f"Erro ao invalidar namespace {namespace}: {str(e)}")
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores por camada (L1 em memória e Redis)"""
+        return {
+            "l1": self.local.stats() if self.local is not None else None,
+            "l1_active": self._subscribed.is_set(),
+            "redis": dict(self.redis_stats),
+            "invalidations_received": self.invalidations_received
+        }
+
+    # --- Proteção contra stampede (usada pelo decorator cached) ---
+
+    def _read_entry(self, key: str, local: bool = True) -> Optional[Tuple[Any, float, float]]:
+        """Retorna (valor, expiração lógica, custo do cálculo) ou None"""
+        return _unwrap_entry(self.get(key, local=local))
+
+    def _write_entry(self, key: str, value: Any, delta: float, timeout: int, stale_ttl: int) -> None:
+        envelope = {_ENVELOPE_MARKER: 1, "v": value, "exp": time.time() + timeout, "d": delta}
+        # O TTL físico inclui a janela em que o valor ainda pode ser servido vencido
+        self.set(key, envelope, timeout + stale_ttl)
+
+    def _acquire_lock(self, key: str, lock_timeout: float) -> Optional[str]:
+        """
+        Tenta obter o lock de recálculo da chave; retorna o token ou None
+
+        Sem Redis, cada processo segue como líder (a deduplicação em
+        processo continua valendo).
+        """
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.redis_client.set(
+                f"{_LOCK_PREFIX}{key}", token, nx=True, px=int(lock_timeout * 1000)
+            )
+            return token if acquired else None
+        except RedisError as e:
+            logger.warning(f"Lock de cache indisponível ({key}): {str(e)}")
+            return token
+
+    def _release_lock(self, key: str, token: str) -> None:
+        try:
+            if self._release_script is None:
+                self._release_script = self.redis_client.register_script(_RELEASE_LOCK_SCRIPT)
+            self._release_script(keys=[f"{_LOCK_PREFIX}{key}"], args=[token])
+        except RedisError as e:
+            logger.warning(f"Erro ao liberar lock de cache ({key}): {str(e)}")
+
+    def _recompute(self, key: str, compute: Callable[[], Any], timeout: int, stale_ttl: int) -> Any:
+        started = time.monotonic()
+        value = compute()
+        self._write_entry(key, value, time.monotonic() - started, timeout, stale_ttl)
+        return value
+
+    def _refresh(self, key: str, compute: Callable[[], Any], token: str, timeout: int, stale_ttl: int) -> None:
+        try:
+            self._recompute(key, compute, timeout, stale_ttl)
+        except Exception as e:
+            logger.error(f"Erro ao revalidar cache ({key}): {str(e)}")
+        finally:
+            self._release_lock(key, token)
+
+    def _compute_as_leader(self, key: str, compute: Callable[[], Any], options: Dict[str, Any]) -> Any:
+        token = self._acquire_lock(key, options["lock_timeout"])
+        if token is None:
+            # Outro processo está recalculando: aguarda o valor ser publicado
+            deadline = time.monotonic() + options["wait_timeout"]
+            while time.monotonic() < deadline:
+                time.sleep(_LOCK_POLL_INTERVAL)
+                entry = self._read_entry(key, local=False)
+                if entry is not None:
+                    return entry[0]
+            logger.warning(f"Tempo de espera pelo cache esgotado ({key}) - recalculando")
+            token = self._acquire_lock(key, options["lock_timeout"])
+
+        try:
+            return self._recompute(key, compute, options["timeout"], options["stale_ttl"])
+        finally:
+            if token:
+                self._release_lock(key, token)
+
+    def _single_flight(self, key: str, compute: Callable[[], Any], options: Dict[str, Any]) -> Any:
+        """Apenas uma chamada por chave recalcula; as concorrentes aguardam o resultado"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._compute_as_leader(key, compute, options)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    # Variantes assíncronas: o cliente Redis é síncrono, então cada ida ao
+    # Redis roda numa thread (asyncio.to_thread) em vez de travar o event loop
+
+    async def _read_entry_async(self, key: str, local: bool = True) -> Optional[Tuple[Any, float, float]]:
+        if local and self._local_enabled():
+            cached_data = self.local.get(key)
+            if cached_data is not None:
+                # Hit na L1 não envolve rede: dispensa a troca de thread
+                try:
+                    return _unwrap_entry(self.codec.decode(cached_data))
+                except CodecError:
+                    self.local.delete(key)
+        return await asyncio.to_thread(self._read_entry, key, local)
+
+    async def _compute_as_leader_async(self, key: str, compute: Callable[[], Awaitable[Any]], options: Dict[str, Any]) -> Any:
+        token = await asyncio.to_thread(self._acquire_lock, key, options["lock_timeout"])
+        if token is None:
+            deadline = time.monotonic() + options["wait_timeout"]
+            while time.monotonic() < deadline:
+                await asyncio.sleep(_LOCK_POLL_INTERVAL)
+                entry = await self._read_entry_async(key, local=False)
+                if entry is not None:
+                    return entry[0]
+            logger.warning(f"Tempo de espera pelo cache esgotado ({key}) - recalculando")
+            token = await asyncio.to_thread(self._acquire_lock, key, options["lock_timeout"])
+
+        try:
+            started = time.monotonic()
+            value = await compute()
+            await asyncio.to_thread(
+                self._write_entry, key, value, time.monotonic() - started, options["timeout"], options["stale_ttl"]
+            )
+            return value
+        finally:
+            if token:
+                await asyncio.to_thread(self._release_lock, key, token)
+
+    async def _single_flight_async(self, key: str, compute: Callable[[], Awaitable[Any]], options: Dict[str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        inflight_key = (id(loop), key)
+        future = self._inflight_async.get(inflight_key)
+        if future is not None:
+            # shield: o cancelamento de quem espera não cancela o líder
+            return await asyncio.shield(future)
+
+        future = self._inflight_async[inflight_key] = loop.create_future()
+        try:
+            result = await self._compute_as_leader_async(key, compute, options)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # evita aviso de exceção não consumida sem seguidores
+            raise
+        finally:
+            self._inflight_async.pop(inflight_key, None)
+
+    async def _refresh_async(self, key: str, compute: Callable[[], Awaitable[Any]], token: str, timeout: int, stale_ttl: int) -> None:
+        try:
+            started = time.monotonic()
+            value = await compute()
+            await asyncio.to_thread(self._write_entry, key, value, time.monotonic() - started, timeout, stale_ttl)
+        except Exception as e:
+            logger.error(f"Erro ao revalidar cache ({key}): {str(e)}")
+        finally:
+            await asyncio.to_thread(self._release_lock, key, token)
+
+    def cached(
+        self,
+        timeout: int = 3600,
+        key_prefix: str = "cache_",
+        single_flight: bool = True,
+        stale_ttl: int = 0,
+        xfetch_beta: float = 1.0,
+        lock_timeout: Optional[float] = None,
+        wait_timeout: Optional[float] = None,
+        key_template: Optional[str] = None,
+        ignore: Iterable[str] = DEFAULT_IGNORE,
+        namespace: Optional[str] = None
+    ):
+        """
+        Decorator para cache automático de resultados de função
+
+        Funciona com funções síncronas e assíncronas.
+
+        Args:
+            timeout: Validade do valor em segundos
+            single_flight: Em caso de miss, só uma chamada (lock no Redis e
+                futures em processo) executa a função; as demais aguardam
+            stale_ttl: Segundos após o vencimento em que o valor antigo ainda
+                é retornado enquanto uma única chamada o revalida em segundo plano
+            xfetch_beta: Fator da expiração antecipada probabilística (XFetch);
+                valores maiores revalidam mais cedo, 0 desabilita
+            lock_timeout: TTL do lock de recálculo
+            wait_timeout: Tempo máximo aguardando o recálculo de outro processo
+            key_template: Template explícito da chave (ex: "twitter:user:{username}");
+                sem ele a chave usa o hash dos argumentos canonicalizados
+            ignore: Argumentos fora da chave (por padrão self, cls, db e session)
+            namespace: Agrupa as chaves para invalidação com invalidate_namespace
+        """
+        options = {
+            "timeout": timeout,
+            "stale_ttl": stale_ttl,
+            "lock_timeout": lock_timeout or settings.CACHE_LOCK_TIMEOUT,
+            "wait_timeout": wait_timeout or settings.CACHE_LOCK_WAIT_TIMEOUT
+        }
+
         def decorator(func: Callable[..., T]) -> Callable[..., T]:
+            build_key = CacheKeyBuilder(
+                func,
+                key_prefix=key_prefix,
+                template=key_template,
+                ignore=ignore,
+                namespace=namespace,
+                version_getter=self.namespace_version
+            )
+            warned = threading.Event()
+
+            def key_or_none(*args, **kwargs) -> Optional[str]:
+                """Chave da chamada; None (sem cache) se algum argumento não gerar chave estável"""
+                try:
+                    return build_key(*args, **kwargs)
+                except UnstableKeyError as e:
+                    if not warned.is_set():
+                        warned.set()
+                        logger.warning(f"Chamada de {build_key.name} executada sem cache: {str(e)}")
+                    return None
+
+            if asyncio.iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if namespace is None:
+                        cache_key = key_or_none(*args, **kwargs)
+                    else:
+                        # A versão do namespace pode exigir uma leitura no Redis
+                        cache_key = await asyncio.to_thread(key_or_none, *args, **kwargs)
+                    if cache_key is None:
+                        return await func(*args, **kwargs)
+                    compute = partial(func, *args, **kwargs)
+
+                    entry = await self._read_entry_async(cache_key)
+                    if entry is not None:
+                        value, expires_at, delta = entry
+                        state = _freshness(expires_at, delta, stale_ttl, xfetch_beta)
+                        if state == "fresh":
+                            return value
+                        if state == "refresh":
+                            token = await asyncio.to_thread(self._acquire_lock, cache_key, options["lock_timeout"])
+                            if token is not None:
+                                task = asyncio.create_task(self._refresh_async(
+                                    cache_key, compute, token, timeout, stale_ttl
+                                ))
+                                self._background_tasks.add(task)
+                                task.add_done_callback(self._background_tasks.discard)
+                            return value
+
+                    if not single_flight:
+                        started = time.monotonic()
+                        value = await compute()
+                        await asyncio.to_thread(
+                            self._write_entry, cache_key, value, time.monotonic() - started, timeout, stale_ttl
+                        )
+                        return value
+                    return await self._single_flight_async(cache_key, compute, options)
+                return cast(Callable[..., T], async_wrapper)
+
             @wraps(func)
             def wrapper(*args, **kwargs) -> T:
-                cache_key = f"{key_prefix}{func.__name__}_{str(args)}_{str(kwargs)}"
-                cached_value = self.get(cache_key)
-                if cached_value is not None:
-                    return cached_value
-                
-                result = func(*args, **kwargs)
-                self.set(cache_key, result, timeout)
-                return result
+                cache_key = key_or_none(*args, **kwargs)
+                if cache_key is None:
+                    return func(*args, **kwargs)
+                compute = partial(func, *args, **kwargs)
+
+                entry = self._read_entry(cache_key)
+                if entry is not None:
+                    value, expires_at, delta = entry
+                    state = _freshness(expires_at, delta, stale_ttl, xfetch_beta)
+                    if state == "fresh":
+                        return value
+                    if state == "refresh":
+                        token = self._acquire_lock(cache_key, options["lock_timeout"])
+                        if token is not None:
+                            _refresh_executor.submit(
+                                self._refresh, cache_key, compute, token, timeout, stale_ttl
+                            )
+                        return value
+
+                if not single_flight:
+                    return self._recompute(cache_key, compute, timeout, stale_ttl)
+                return self._single_flight(cache_key, compute, options)
             return cast(Callable[..., T], wrapper)
         return decorator
 
 # Instância global do cache
-cache = APICache()
\ No newline at end of file
+cache = APICache()
@@ -1,6 +1,7 @@
 import httpx
 from typing import Optional, Dict, Any
 from fastapi import HTTPException
+from app.core.http_client import get_async_client
 
 async def make_api_request(
     url: str,
@@ -10,19 +11,19 @@ async def make_api_request(
     json: Optional[Dict[str, Any]] = None,
     timeout: int = 30
 ) -> Dict[str, Any]:
-    """Faz requisições HTTP com tratamento de erros"""
+    """Faz requisições HTTP com tratamento de erros (cliente compartilhado)"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.request(
-                method=method,
-                url=url,
-                headers=headers or {},
-                params=params or {},
-                json=json or {},
-                timeout=timeout
-            )
-            response.raise_for_status()
-            return response.json()
+        client = get_async_client()
+        response = await client.request(
+            method=method,
+            url=url,
+            headers=headers or {},
+            params=params or {},
+            json=json or {},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPStatusError as e:
         raise HTTPException(
             status_code=e.response.status_code,
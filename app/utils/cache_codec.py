@@ -0,0 +1,292 @@
+import base64
+import importlib
+import json
+import logging
+import pickle
+import struct
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depende do ambiente
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende do ambiente
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - depende do ambiente
+    lz4_frame = None
+
+# Cabeçalho: magic, versão do formato, serializador, compressão, versão do schema.
+# Entradas pickle (protocolo >= 2) começam com 0x80, então nunca colidem com o magic.
+MAGIC = b"SMC"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct(">3sBBBH")
+
+SERIALIZERS = {"orjson": 1, "msgpack": 2, "json": 3}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+# Marcador de tipos que os formatos não representam nativamente
+_TYPE_TAG = "__t__"
+_TYPE_TAG_BYTES = b'"__t__"'
+
+# Modelos só são reconstruídos a partir de módulos da aplicação
+_MODEL_MODULE_PREFIX = "app."
+
+class CodecError(ValueError):
+    """Entrada de cache ilegível ou gravada com outra versão de schema"""
+
+def _encode_default(value: Any) -> Any:
+    """Converte tipos não nativos em dicionários marcados"""
+    if isinstance(value, BaseModel):
+        cls = type(value)
+        return {
+            _TYPE_TAG: "model",
+            "cls": f"{cls.__module__}:{cls.__qualname__}",
+            "v": value.model_dump(mode="json")
+        }
+    if isinstance(value, datetime):
+        return {_TYPE_TAG: "datetime", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {_TYPE_TAG: "date", "v": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {_TYPE_TAG: "decimal", "v": str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {_TYPE_TAG: "bytes", "v": base64.b64encode(bytes(value)).decode()}
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Tipo não suportado pelo cache: {type(value).__name__}")
+
+def _load_model(path: str):
+    module_name, _, qualname = path.partition(":")
+    if not module_name.startswith(_MODEL_MODULE_PREFIX):
+        raise CodecError(f"Modelo fora da aplicação no cache: {path}")
+
+    target: Any = importlib.import_module(module_name)
+    for attr in qualname.split("."):
+        target = getattr(target, attr)
+    if not (isinstance(target, type) and issubclass(target, BaseModel)):
+        raise CodecError(f"Classe de cache inválida: {path}")
+    return target
+
+def _decode_tagged(value: Dict[str, Any]) -> Any:
+    tag = value.get(_TYPE_TAG)
+    if tag is None:
+        return value
+    if tag == "model":
+        return _load_model(value["cls"]).model_validate(value["v"])
+    if tag == "datetime":
+        return datetime.fromisoformat(value["v"])
+    if tag == "date":
+        return date.fromisoformat(value["v"])
+    if tag == "decimal":
+        return Decimal(value["v"])
+    if tag == "bytes":
+        return base64.b64decode(value["v"])
+    raise CodecError(f"Tipo desconhecido no cache: {tag}")
+
+def _restore(value: Any) -> Any:
+    """Percorre o resultado de formatos sem object_hook (orjson/json)"""
+    if isinstance(value, dict):
+        if _TYPE_TAG in value:
+            # Conteúdo marcado já é JSON puro (ex: model_dump) e não precisa ser percorrido
+            return _decode_tagged(value)
+        return {key: _restore(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore(item) for item in value]
+    return value
+
+def _orjson_dumps(value: Any) -> bytes:
+    # Datas passam pelo default para serem marcadas e reconstruídas na leitura
+    return orjson.dumps(
+        value,
+        default=_encode_default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    )
+
+def _orjson_loads(data: bytes) -> Any:
+    value = orjson.loads(data)
+    # Só percorre o resultado quando há tipos marcados no payload
+    return _restore(value) if _TYPE_TAG_BYTES in data else value
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=_encode_default, use_bin_type=True, datetime=False)
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, object_hook=_decode_tagged, raw=False, strict_map_key=False)
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_encode_default, separators=(",", ":")).encode()
+
+def _json_loads(data: bytes) -> Any:
+    value = json.loads(data)
+    return _restore(value) if _TYPE_TAG_BYTES in data else value
+
+def _serializer_functions(name: str) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    if name == "orjson" and orjson is not None:
+        return _orjson_dumps, _orjson_loads
+    if name == "msgpack" and msgpack is not None:
+        return _msgpack_dumps, _msgpack_loads
+    if name == "json":
+        return _json_dumps, _json_loads
+    raise CodecError(f"Serializador indisponível: {name}")
+
+def _compress(name: str, data: bytes, level: Optional[int]) -> bytes:
+    if name == "zstd":
+        return zstandard.ZstdCompressor(level=level or 3).compress(data)
+    if name == "lz4":
+        return lz4_frame.compress(data)
+    if name == "zlib":
+        return zlib.compress(data, level or 6)
+    return data
+
+def _decompress(name: str, data: bytes) -> bytes:
+    if name == "zstd":
+        if zstandard is None:
+            raise CodecError("Entrada comprimida com zstd, mas o pacote não está instalado")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if name == "lz4":
+        if lz4_frame is None:
+            raise CodecError("Entrada comprimida com lz4, mas o pacote não está instalado")
+        return lz4_frame.decompress(data)
+    if name == "zlib":
+        return zlib.decompress(data)
+    return data
+
+def available_serializer(preferred: str = "orjson") -> str:
+    """Serializador preferido se instalado, senão o melhor disponível"""
+    for name in (preferred, "orjson", "msgpack", "json"):
+        if name == "json" or (name == "orjson" and orjson) or (name == "msgpack" and msgpack):
+            return name
+    return "json"
+
+def available_compression(preferred: str = "auto") -> str:
+    """Compressão pedida se instalada; "auto" prefere zstd, depois lz4 e zlib"""
+    candidates = ("zstd", "lz4", "zlib") if preferred == "auto" else (preferred, "zlib")
+    for name in candidates:
+        if name == "none":
+            return "none"
+        if name == "zlib" or (name == "zstd" and zstandard) or (name == "lz4" and lz4_frame):
+            return name
+    return "zlib"
+
+_NAMES_BY_ID = {
+    "serializer": {code: name for name, code in SERIALIZERS.items()},
+    "compression": {code: name for name, code in COMPRESSIONS.items()},
+}
+
+class CacheCodec:
+    """
+    Codifica valores do cache num formato versionado
+
+    Cada entrada leva um cabeçalho com o serializador, a compressão e a
+    versão do schema usados, então leituras não dependem da configuração
+    atual do processo. Modelos Pydantic são gravados como dados e validados
+    de novo na leitura; alterar `schema_version` invalida entradas antigas.
+    """
+
+    def __init__(
+        self,
+        serializer: str = "orjson",
+        compression: str = "auto",
+        compression_threshold: int = 1024,
+        compression_level: Optional[int] = None,
+        schema_version: int = 1,
+        legacy_pickle: bool = True
+    ):
+        self.serializer = available_serializer(serializer)
+        if self.serializer != serializer:
+            logger.warning(f"Serializador {serializer} indisponível - usando {self.serializer}")
+
+        self.compression = available_compression(compression)
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self.schema_version = schema_version
+        self.legacy_pickle = legacy_pickle
+        self._dumps, _ = _serializer_functions(self.serializer)
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._dumps(value)
+
+        compression = "none"
+        if self.compression != "none" and len(payload) >= self.compression_threshold:
+            compressed = _compress(self.compression, payload, self.compression_level)
+            # Só mantém a compressão quando ela de fato reduz o payload
+            if len(compressed) < len(payload):
+                payload, compression = compressed, self.compression
+
+        header = _HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            SERIALIZERS[self.serializer],
+            COMPRESSIONS[compression],
+            self.schema_version
+        )
+        return header + payload
+
+    def decode(self, data: bytes) -> Any:
+        if not data.startswith(MAGIC):
+            return self._decode_legacy(data)
+
+        if len(data) < _HEADER.size:
+            raise CodecError("Cabeçalho de cache truncado")
+        _, format_version, serializer_id, compression_id, schema_version = (
+            _HEADER.unpack_from(data)
+        )
+        if format_version != FORMAT_VERSION:
+            raise CodecError(f"Versão de formato desconhecida: {format_version}")
+        if schema_version != self.schema_version:
+            raise CodecError(
+                f"Versão de schema {schema_version} difere da atual {self.schema_version}"
+            )
+
+        try:
+            serializer = _NAMES_BY_ID["serializer"][serializer_id]
+            compression = _NAMES_BY_ID["compression"][compression_id]
+        except KeyError:
+            raise CodecError("Serializador ou compressão desconhecidos no cabeçalho")
+
+        _, loads = _serializer_functions(serializer)
+        payload = _decompress(compression, data[_HEADER.size:])
+        try:
+            return loads(payload)
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f"Falha ao decodificar entrada de cache: {e}") from e
+
+    def _decode_legacy(self, data: bytes) -> Any:
+        """Entradas gravadas com pickle antes do codec versionado"""
+        if not self.legacy_pickle:
+            raise CodecError("Entrada sem cabeçalho e leitura de pickle desabilitada")
+        try:
+            return pickle.loads(data)
+        except Exception as e:
+            raise CodecError(f"Entrada legada ilegível: {e}") from e
+
+def get_codec() -> CacheCodec:
+    """Codec configurado via settings"""
+    return CacheCodec(
+        serializer=settings.CACHE_SERIALIZER,
+        compression=settings.CACHE_COMPRESSION,
+        compression_threshold=settings.CACHE_COMPRESSION_THRESHOLD,
+        schema_version=settings.CACHE_SCHEMA_VERSION,
+        legacy_pickle=settings.CACHE_LEGACY_PICKLE_READS
+    )
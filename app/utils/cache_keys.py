@@ -0,0 +1,126 @@
+import dataclasses
+import hashlib
+import inspect
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from pydantic import BaseModel
+
+# Argumentos que nunca fazem parte da chave (instâncias, sessões de banco)
+DEFAULT_IGNORE = ("self", "cls", "db", "session")
+
+# Limite de tamanho das chaves geradas por template
+MAX_KEY_LENGTH = 200
+
+class UnstableKeyError(TypeError):
+    """Argumento sem representação estável para a chave de cache"""
+
+def canonicalize(value: Any) -> Any:
+    """
+    Converte um argumento numa estrutura JSON estável
+
+    Dicionários e conjuntos são ordenados, para que a chave não dependa da
+    ordem de inserção. Dataclasses entram pelos campos e objetos com
+    __repr__ próprio pelo tipo + repr. Os demais geram UnstableKeyError em
+    vez de cair no repr padrão (que inclui endereços de memória).
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Enum):
+        return canonicalize(value.value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return canonicalize(value.model_dump(mode="json"))
+    if isinstance(value, dict):
+        return {str(key): canonicalize(item) for key, item in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((canonicalize(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, bytes):
+        return value.hex()
+
+    value_type = type(value)
+    type_name = f"{value_type.__module__}.{value_type.__qualname__}"
+    if dataclasses.is_dataclass(value):
+        return {"__type__": type_name, "fields": canonicalize(dataclasses.asdict(value))}
+    if value_type.__repr__ is not object.__repr__:
+        return {"__type__": type_name, "repr": repr(value)}
+    raise UnstableKeyError(
+        f"Argumento do tipo {type(value).__name__} não gera chave de cache estável; "
+        f"use `ignore` ou um `key_template`"
+    )
+
+def stable_hash(value: Any) -> str:
+    """Hash SHA-256 (hex, 32 caracteres) da forma canônica do valor"""
+    payload = json.dumps(canonicalize(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def _bound_length(key: str) -> str:
+    if len(key) <= MAX_KEY_LENGTH:
+        return key
+    return f"{key[:MAX_KEY_LENGTH - 33]}:{hashlib.sha256(key.encode()).hexdigest()[:32]}"
+
+class CacheKeyBuilder:
+    """
+    Gera chaves de cache determinísticas para uma função
+
+    Os argumentos são associados à assinatura (posicionais e nomeados geram
+    a mesma chave, com valores padrão aplicados) e os ignorados são removidos.
+    Sem template, a chave é `prefixo + módulo.função + hash dos argumentos`;
+    com template (ex: "twitter:user:{username}"), os argumentos são
+    formatados diretamente. Com `namespace`, a versão atual do namespace entra
+    na chave, permitindo invalidar todas as entradas de uma vez.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        key_prefix: str = "cache_",
+        template: Optional[str] = None,
+        ignore: Iterable[str] = DEFAULT_IGNORE,
+        namespace: Optional[str] = None,
+        version_getter: Optional[Callable[[str], int]] = None
+    ):
+        self.signature = inspect.signature(func)
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.key_prefix = key_prefix
+        self.template = template
+        self.ignore = frozenset(ignore)
+        self.namespace = namespace
+        self.version_getter = version_getter
+
+    def arguments(self, *args, **kwargs) -> Dict[str, Any]:
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+
+        arguments = {}
+        for name, value in bound.arguments.items():
+            if name in self.ignore:
+                continue
+            kind = self.signature.parameters[name].kind
+            if kind is inspect.Parameter.VAR_KEYWORD:
+                arguments.update({key: item for key, item in value.items() if key not in self.ignore})
+            else:
+                arguments[name] = value
+        return arguments
+
+    def __call__(self, *args, **kwargs) -> str:
+        arguments = self.arguments(*args, **kwargs)
+
+        if self.template:
+            body = self.template.format(**arguments)
+        else:
+            body = f"{self.name}:{stable_hash(arguments)}"
+
+        prefix = self.key_prefix
+        if self.namespace:
+            version = self.version_getter(self.namespace) if self.version_getter else 0
+            prefix = f"{prefix}{self.namespace}:v{version}:"
+        return _bound_length(f"{prefix}{body}")
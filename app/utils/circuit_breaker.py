@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.utils.api_cache import cache
+
+logger = logging.getLogger(__name__)
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Circuito aberto: a plataforma está falhando e a chamada nem é feita"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit breaker de {name} aberto; nova tentativa em {retry_after:.1f}s")
+
+# Máquina de estados do circuito, atômica entre processos.
+# KEYS[1]: estado (hash state/changed_at/probes/successes)
+# KEYS[2]: janela deslizante (hash "<bucket>:success|failure" -> contagem)
+# ARGV: modo (allow|record), abertura (ms), sondas em half-open, ttl do estado (ms),
+#       resultado (success|failure|ignore), sonda (0/1), bucket (ms),
+#       buckets na janela, taxa de falha, mínimo de chamadas
+# Retorna {permitida, sonda, ms até nova tentativa, estado}
+CIRCUIT_SCRIPT = """
+local mode = ARGV[1]
+local open_ms = tonumber(ARGV[2])
+local max_probes = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local changed_at = tonumber(redis.call('HGET', KEYS[1], 'changed_at') or '0')
+local probes = tonumber(redis.call('HGET', KEYS[1], 'probes') or '0')
+
+local function set_state(new_state)
+    redis.call('HSET', KEYS[1], 'state', new_state, 'changed_at', now, 'probes', 0, 'successes', 0)
+    redis.call('PEXPIRE', KEYS[1], ttl)
+    state = new_state
+    changed_at = now
+    probes = 0
+end
+
+local function result(allowed, probe)
+    local retry = 0
+    if state ~= 'closed' and allowed == 0 then
+        retry = math.max(changed_at + open_ms - now, 0)
+    end
+    return {allowed, probe, retry, state}
+end
+
+-- Fim do período aberto; em half-open, sondas sem resposta (processo
+-- encerrado) deixam de ocupar vaga após o mesmo período
+if state ~= 'closed' and now >= changed_at + open_ms then
+    set_state('half_open')
+end
+
+if mode == 'allow' then
+    if state == 'closed' then
+        return result(1, 0)
+    end
+    if state == 'half_open' and probes < max_probes then
+        redis.call('HINCRBY', KEYS[1], 'probes', 1)
+        return result(1, 1)
+    end
+    return result(0, 0)
+end
+
+local outcome = ARGV[5]
+local probe = ARGV[6] == '1'
+
+if state == 'half_open' then
+    if probe then
+        if outcome == 'failure' then
+            set_state('open')
+        elseif outcome == 'success' then
+            if redis.call('HINCRBY', KEYS[1], 'successes', 1) >= max_probes then
+                set_state('closed')
+                redis.call('DEL', KEYS[2])
+            end
+        elseif probes > 0 then
+            redis.call('HINCRBY', KEYS[1], 'probes', -1)
+        end
+    end
+    return result(0, 0)
+end
+
+if state == 'open' or outcome == 'ignore' then
+    return result(0, 0)
+end
+
+local bucket_ms = tonumber(ARGV[7])
+local buckets = tonumber(ARGV[8])
+local bucket = math.floor(now / bucket_ms)
+redis.call('HINCRBY', KEYS[2], bucket .. ':' .. outcome, 1)
+redis.call('PEXPIRE', KEYS[2], bucket_ms * (buckets + 1))
+
+local total, failures = 0, 0
+local fields = redis.call('HGETALL', KEYS[2])
+for i = 1, #fields, 2 do
+    local field_bucket, kind = string.match(fields[i], '^(%d+):(%a+)$')
+    if tonumber(field_bucket) <= bucket - buckets then
+        redis.call('HDEL', KEYS[2], fields[i])
+    else
+        local count = tonumber(fields[i + 1])
+        total = total + count
+        if kind == 'failure' then
+            failures = failures + count
+        end
+    end
+end
+
+if total >= tonumber(ARGV[10]) and failures / total >= tonumber(ARGV[9]) then
+    set_state('open')
+    redis.call('DEL', KEYS[2])
+end
+return result(0, 0)
+"""
+
+class DistributedCircuitBreaker:
+    """
+    Circuit breaker com estado compartilhado no Redis
+
+    Todos os workers (Celery e uvicorn) enxergam o mesmo circuito. Fechado,
+    registra os resultados numa janela deslizante de `window` segundos e abre
+    quando a taxa de falhas chega a `failure_rate` com ao menos `min_calls`
+    chamadas. Aberto, recusa chamadas por `open_seconds`; depois passa a
+    half-open e deixa `half_open_probes` sondas passarem: todas com sucesso
+    fecham o circuito, uma falha o reabre.
+
+    O último estado visto fica em memória (fechado por `local_ttl` segundos,
+    aberto até o fim do período) para não custar uma ida extra ao Redis por
+    chamada. Sem Redis o circuito fica fechado, como no rate limit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: Optional[float] = None,
+        min_calls: Optional[int] = None,
+        window: Optional[float] = None,
+        open_seconds: Optional[float] = None,
+        half_open_probes: Optional[int] = None,
+        window_buckets: int = 10,
+        redis_client=None,
+        local_ttl: float = 1.0
+    ):
+        self.name = name
+        self.failure_rate = failure_rate if failure_rate is not None else settings.CIRCUIT_BREAKER_FAILURE_RATE
+        self.min_calls = min_calls if min_calls is not None else settings.CIRCUIT_BREAKER_MIN_CALLS
+        self.window = window if window is not None else settings.CIRCUIT_BREAKER_WINDOW_SECONDS
+        self.open_seconds = open_seconds if open_seconds is not None else settings.CIRCUIT_BREAKER_OPEN_SECONDS
+        self.half_open_probes = (
+            half_open_probes if half_open_probes is not None else settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+        )
+        self.window_buckets = window_buckets
+        self.local_ttl = local_ttl
+        self._redis = redis_client
+        self._script = None
+        self._lock = threading.Lock()
+        self._local_state = CircuitState.CLOSED
+        self._local_until = 0.0
+        self.rejected = 0
+
+    @property
+    def redis(self):
+        return self._redis or cache.redis_client
+
+    @property
+    def keys(self):
+        return [f"circuit:{self.name}", f"circuit:{self.name}:window"]
+
+    def _run(self, mode: str, outcome: str = "ignore", probe: bool = False):
+        if self._script is None:
+            self._script = self.redis.register_script(CIRCUIT_SCRIPT)
+        open_ms = self.open_seconds * 1000
+        allowed, is_probe, retry_ms, state = self._script(
+            keys=self.keys,
+            args=[
+                mode,
+                open_ms,
+                self.half_open_probes,
+                # O estado sobrevive à janela e ao período aberto
+                int(max(self.window * 1000, open_ms) * 2),
+                outcome,
+                "1" if probe else "0",
+                max(int(self.window * 1000 / self.window_buckets), 1),
+                self.window_buckets,
+                self.failure_rate,
+                self.min_calls
+            ]
+        )
+        state = CircuitState(state.decode() if isinstance(state, bytes) else state)
+        self._remember(state, float(retry_ms) / 1000)
+        return bool(allowed), bool(is_probe), float(retry_ms) / 1000, state
+
+    def _remember(self, state: CircuitState, retry_after: float) -> None:
+        with self._lock:
+            self._local_state = state
+            if state is CircuitState.CLOSED:
+                self._local_until = time.monotonic() + self.local_ttl
+            elif state is CircuitState.OPEN:
+                self._local_until = time.monotonic() + (retry_after or self.open_seconds)
+            else:
+                # Em half-open cada chamada disputa as vagas de sonda no Redis
+                self._local_until = 0.0
+
+    def before_call(self) -> bool:
+        """
+        Verifica se a chamada pode seguir; retorna True se ela for uma sonda
+
+        Gera CircuitOpenError com o circuito aberto (ou sem vagas de sonda).
+        """
+        with self._lock:
+            remaining = self._local_until - time.monotonic()
+            local_state = self._local_state
+        if remaining > 0:
+            if local_state is CircuitState.CLOSED:
+                return False
+            if local_state is CircuitState.OPEN:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+
+        try:
+            allowed, probe, retry_after, state = self._run("allow")
+        except RedisError as e:
+            logger.error(f"Erro ao consultar circuit breaker de {self.name}: {str(e)}")
+            return False
+
+        if not allowed:
+            self.rejected += 1
+            raise CircuitOpenError(self.name, retry_after)
+        if probe:
+            logger.info(f"Circuit breaker de {self.name} em half-open: enviando sonda")
+        return probe
+
+    def record(self, outcome: str, probe: bool = False) -> Optional[CircuitState]:
+        """Registra o resultado de uma chamada: "success", "failure" ou "ignore" """
+        previous = self._local_state
+        try:
+            state = self._run("record", outcome, probe)[3]
+        except RedisError as e:
+            logger.error(f"Erro ao registrar resultado no circuit breaker de {self.name}: {str(e)}")
+            return None
+
+        if state is not previous:
+            log = logger.warning if state is CircuitState.OPEN else logger.info
+            log(f"Circuit breaker de {self.name}: {previous.value} -> {state.value}")
+        return state
+
+    def call(self, is_failure: Optional[Callable[[BaseException], bool]] = None) -> "_BreakerCall":
+        """
+        Context manager (`with`/`async with`) que protege uma chamada
+
+        `is_failure` decide quais exceções contam como falha da plataforma; as
+        demais (ex: erro do cliente, cota esgotada) não entram na taxa.
+        """
+        return _BreakerCall(self, is_failure)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado atual e contagens da janela (leitura, sem transições)"""
+        state_key, window_key = self.keys
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(state_key)
+        pipe.hgetall(window_key)
+        stored, window = pipe.execute()
+        stored = {
+            (field.decode() if isinstance(field, bytes) else field): (value.decode() if isinstance(value, bytes) else value)
+            for field, value in stored.items()
+        }
+
+        totals = {"success": 0, "failure": 0}
+        for field, count in window.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            kind = field.split(":", 1)[-1]
+            if kind in totals:
+                totals[kind] += int(count)
+        calls = totals["success"] + totals["failure"]
+        return {
+            "state": stored.get("state", CircuitState.CLOSED.value),
+            "changed_at": float(stored.get("changed_at", 0)) / 1000 or None,
+            "probes_in_flight": int(stored.get("probes", 0)),
+            "calls": calls,
+            "failures": totals["failure"],
+            "failure_rate": totals["failure"] / calls if calls else 0.0,
+            "rejected_local": self.rejected
+        }
+
+class _BreakerCall:
+    def __init__(self, breaker: DistributedCircuitBreaker, is_failure: Optional[Callable[[BaseException], bool]]):
+        self.breaker = breaker
+        self.is_failure = is_failure
+        self.probe = False
+
+    def _outcome(self, exc: Optional[BaseException]) -> str:
+        if exc is None:
+            return "success"
+        if isinstance(exc, Exception) and (self.is_failure is None or self.is_failure(exc)):
+            return "failure"
+        return "ignore"
+
+    def __enter__(self):
+        self.probe = self.breaker.before_call()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.breaker.record(self._outcome(exc), self.probe)
+        return False
+
+    # O cliente Redis é síncrono: as idas ao Redis rodam fora do event loop
+    async def __aenter__(self):
+        self.probe = await asyncio.to_thread(self.breaker.before_call)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.to_thread(self.breaker.record, self._outcome(exc), self.probe)
+        return False
+
+_breakers: Dict[str, DistributedCircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name: str) -> DistributedCircuitBreaker:
+    """Circuit breaker compartilhado de uma plataforma/API"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = DistributedCircuitBreaker(name)
+        return breaker
+
+def circuit_breaker_stats() -> Dict[str, Any]:
+    """Estado de todos os circuitos registrados neste processo"""
+    stats = {}
+    for name, breaker in list(_breakers.items()):
+        try:
+            stats[name] = breaker.stats()
+        except RedisError as e:
+            stats[name] = {"error": str(e)}
+    return stats
@@ -0,0 +1,232 @@
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.utils.api_cache import cache
+
+logger = logging.getLogger(__name__)
+
+_LOCK_PREFIX = "coalesce_lock:"
+_RESULT_PREFIX = "coalesce:"
+_POLL_INTERVAL = 0.05  # segundos
+
+# Remove o lock apenas se ainda pertencer a quem o obteve
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+def request_key(method: str, url: str, params: Optional[Dict[str, Any]], credential: Optional[str]) -> str:
+    """Chave de uma chamada: método, URL, parâmetros e credencial (hash)"""
+    raw = json.dumps(
+        [method.upper(), url, params or {}, credential or ""],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+class RequestCoalescer:
+    """
+    Deduplica chamadas idênticas em andamento
+
+    Chamadas concorrentes com a mesma chave compartilham uma única execução:
+    a primeira (líder) chama a plataforma e as demais recebem uma cópia do
+    resultado, ou a mesma exceção. Com `distributed`, a deduplicação vale
+    também entre processos: o líder de cada processo disputa um lock no Redis
+    e quem perde aguarda o resultado publicado por `result_ttl` segundos. Se
+    o líder falhar (lock liberado sem resultado) ou demorar mais que
+    `wait_timeout`, cada processo faz a própria chamada. Sem Redis vale só a
+    deduplicação em processo.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        distributed: Optional[bool] = None,
+        result_ttl: Optional[int] = None,
+        wait_timeout: Optional[float] = None,
+        lock_timeout: Optional[float] = None
+    ):
+        self._redis = redis_client
+        self._distributed = distributed
+        self.result_ttl = result_ttl or settings.REQUEST_COALESCING_RESULT_TTL
+        self.wait_timeout = wait_timeout or settings.REQUEST_COALESCING_WAIT_TIMEOUT
+        self.lock_timeout = lock_timeout or settings.REQUEST_COALESCING_LOCK_TIMEOUT
+        self._release_script = None
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_async: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    @property
+    def redis(self):
+        return self._redis or cache.redis_client
+
+    @property
+    def distributed(self) -> bool:
+        if self._distributed is not None:
+            return self._distributed
+        return settings.REQUEST_COALESCING_DISTRIBUTED
+
+    def _count(self) -> None:
+        with self._lock:
+            self.coalesced += 1
+
+    def _acquire(self, key: str) -> Optional[str]:
+        """Token do lock entre processos, ou None se outro processo é o líder"""
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.redis.set(
+                f"{_LOCK_PREFIX}{key}", token, nx=True, px=int(self.lock_timeout * 1000)
+            )
+            return token if acquired else None
+        except RedisError as e:
+            logger.warning(f"Lock de deduplicação indisponível: {str(e)}")
+            return token
+
+    def _release(self, key: str, token: str) -> None:
+        try:
+            if self._release_script is None:
+                self._release_script = self.redis.register_script(_RELEASE_SCRIPT)
+            self._release_script(keys=[f"{_LOCK_PREFIX}{key}"], args=[token])
+        except RedisError as e:
+            logger.warning(f"Erro ao liberar lock de deduplicação: {str(e)}")
+
+    def _publish(self, key: str, value: Any) -> None:
+        try:
+            self.redis.set(f"{_RESULT_PREFIX}{key}", json.dumps(value, default=str), ex=self.result_ttl)
+        except (RedisError, TypeError, ValueError) as e:
+            logger.warning(f"Erro ao publicar resultado compartilhado: {str(e)}")
+
+    def _poll(self, key: str) -> Tuple[str, Any]:
+        """("done", valor), ("running", None) ou ("gone", None) se o líder desistiu"""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(f"{_RESULT_PREFIX}{key}")
+            pipe.exists(f"{_LOCK_PREFIX}{key}")
+            raw, running = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Erro ao aguardar resultado compartilhado: {str(e)}")
+            return "gone", None
+        if raw is not None:
+            return "done", json.loads(raw)
+        return ("running" if running else "gone"), None
+
+    def _call_as_leader(self, key: str, call: Callable[[], Any]) -> Any:
+        if not self.distributed:
+            return call()
+
+        token = self._acquire(key)
+        if token is None:
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(_POLL_INTERVAL)
+                status, value = self._poll(key)
+                if status == "done":
+                    self._count()
+                    return value
+                if status == "gone":
+                    break
+            token = self._acquire(key)
+
+        try:
+            value = call()
+            self._publish(key, value)
+            return value
+        finally:
+            if token:
+                self._release(key, token)
+
+    def run(self, key: str, call: Callable[[], Any]) -> Any:
+        """Executa `call` ou aguarda a execução idêntica já em andamento"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            self._count()
+            # Cada chamador recebe a própria cópia do resultado
+            return copy.deepcopy(future.result())
+
+        try:
+            result = self._call_as_leader(key, call)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    # O cliente Redis é síncrono: as idas ao Redis rodam numa thread
+
+    async def _call_as_leader_async(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.distributed:
+            return await call()
+
+        token = await asyncio.to_thread(self._acquire, key)
+        if token is None:
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(_POLL_INTERVAL)
+                status, value = await asyncio.to_thread(self._poll, key)
+                if status == "done":
+                    self._count()
+                    return value
+                if status == "gone":
+                    break
+            token = await asyncio.to_thread(self._acquire, key)
+
+        try:
+            value = await call()
+            await asyncio.to_thread(self._publish, key, value)
+            return value
+        finally:
+            if token:
+                await asyncio.to_thread(self._release, key, token)
+
+    async def run_async(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Versão assíncrona de run (deduplicação por event loop)"""
+        loop = asyncio.get_running_loop()
+        inflight_key = (id(loop), key)
+        future = self._inflight_async.get(inflight_key)
+        if future is not None:
+            self._count()
+            # shield: o cancelamento de quem espera não cancela o líder
+            return copy.deepcopy(await asyncio.shield(future))
+
+        future = self._inflight_async[inflight_key] = loop.create_future()
+        try:
+            result = await self._call_as_leader_async(key, call)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # evita aviso de exceção não consumida sem seguidores
+            raise
+        finally:
+            self._inflight_async.pop(inflight_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            inflight = len(self._inflight)
+        return {
+            "coalesced": self.coalesced,
+            "inflight": inflight + len(self._inflight_async),
+            "distributed": self.distributed
+        }
+
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,251 @@
+import hashlib
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.utils.api_cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Retira as contas devidas de um shard e já as reagenda pelo próprio intervalo.
+# KEYS[1]: zset do shard membro -> próxima coleta (ms)
+# KEYS[2]: hash membro -> intervalo (ms)
+# ARGV: máximo de membros, intervalo padrão (ms)
+# Contas atrasadas mais de um intervalo pulam as coletas perdidas mantendo a fase.
+POP_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'WITHSCORES', 'LIMIT', 0, tonumber(ARGV[1]))
+local members = {}
+for i = 1, #due, 2 do
+    local member = due[i]
+    local score = tonumber(due[i + 1])
+    local interval = tonumber(redis.call('HGET', KEYS[2], member) or ARGV[2])
+    local missed = math.floor((now - score) / interval)
+    redis.call('ZADD', KEYS[1], score + (missed + 1) * interval, member)
+    members[#members + 1] = member
+end
+return members
+"""
+
+def _hash(value: str, salt: str) -> int:
+    return int.from_bytes(hashlib.sha256(f"{salt}:{value}".encode()).digest()[:8], "big")
+
+class CollectionScheduler:
+    """
+    Agenda de coleta periódica das contas acompanhadas
+
+    Roda de tempo no Redis: cada conta cai em um de `shards` sorted sets
+    pelo hash do ID e tem uma fase fixa dentro do próprio intervalo, também
+    pelo hash, com até um tick de jitter. N contas com o mesmo intervalo
+    ficam espalhadas uniformemente nele, em vez de vencerem todas no mesmo
+    minuto. Cada shard é drenado por uma tarefa independente, e a retirada
+    atômica reagenda a conta, então cada coleta devida sai para um único
+    worker. O intervalo é por conta (padrão por plataforma).
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        shards: Optional[int] = None,
+        tick: Optional[float] = None,
+        key: str = "collect"
+    ):
+        self._redis = redis_client
+        self.shards = shards or settings.COLLECT_SHARDS
+        self.tick = tick or settings.COLLECT_TICK_SECONDS
+        self.key = key
+        self._pop_script = None
+
+    @property
+    def redis(self):
+        return self._redis or cache.redis_client
+
+    @property
+    def intervals_key(self) -> str:
+        return f"{self.key}:intervals"
+
+    def shard_key(self, shard: int) -> str:
+        return f"{self.key}:wheel:{shard}"
+
+    def shard_of(self, member: str) -> int:
+        return _hash(member, "shard") % self.shards
+
+    def default_interval(self, platform: str) -> float:
+        return settings.COLLECT_INTERVALS.get(platform, settings.COLLECT_DEFAULT_INTERVAL)
+
+    def _first_due(self, member: str, interval_ms: int, now_ms: int) -> int:
+        """Próxima ocorrência da fase da conta após `now_ms`, com jitter de até um tick"""
+        phase = _hash(member, "phase") % interval_ms
+        due = now_ms - now_ms % interval_ms + phase
+        if due <= now_ms:
+            due += interval_ms
+        return due + random.randint(0, int(self.tick * 1000))
+
+    def sync(self, accounts: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+        """
+        Alinha a agenda às contas acompanhadas, como (plataforma, conta)
+
+        Contas novas entram na fase delas com o intervalo padrão da
+        plataforma; as que saíram da lista são removidas. Intervalos já
+        definidos (set_interval) são preservados.
+        """
+        now_ms = int(time.time() * 1000)
+        wanted: Dict[int, Dict[str, str]] = {shard: {} for shard in range(self.shards)}
+        for platform, account_id in accounts:
+            member = f"{platform}:{account_id}"
+            wanted[self.shard_of(member)][member] = platform
+
+        added = removed = 0
+        for shard, members in wanted.items():
+            key = self.shard_key(shard)
+            current = {
+                member.decode() if isinstance(member, bytes) else member
+                for member in self.redis.zrange(key, 0, -1)
+            }
+            pipe = self.redis.pipeline()
+            for member, platform in members.items():
+                if member in current:
+                    continue
+                interval_ms = int(self.default_interval(platform) * 1000)
+                pipe.hsetnx(self.intervals_key, member, interval_ms)
+                pipe.zadd(key, {member: self._first_due(member, interval_ms, now_ms)})
+                added += 1
+            stale = current - set(members)
+            if stale:
+                pipe.zrem(key, *stale)
+                pipe.hdel(self.intervals_key, *stale)
+                removed += len(stale)
+            pipe.execute()
+
+        if added or removed:
+            logger.info(f"Agenda de coleta: {added} contas adicionadas, {removed} removidas")
+        return {"added": added, "removed": removed}
+
+    def set_interval(self, platform: str, account_id: str, seconds: float) -> bool:
+        """Novo intervalo da conta; False se ela não estiver na agenda"""
+        member = f"{platform}:{account_id}"
+        if self.redis.zscore(self.shard_key(self.shard_of(member)), member) is None:
+            return False
+        self.set_intervals({(platform, account_id): seconds})
+        return True
+
+    def set_intervals(self, intervals: Dict[Tuple[str, str], float]) -> None:
+        """
+        Novos intervalos de contas já agendadas
+
+        O intervalo vale a partir da próxima coleta; se for menor que o tempo
+        até ela, a coleta é antecipada.
+        """
+        now_ms = int(time.time() * 1000)
+        pipe = self.redis.pipeline()
+        for (platform, account_id), seconds in intervals.items():
+            member = f"{platform}:{account_id}"
+            interval_ms = int(seconds * 1000)
+            pipe.hset(self.intervals_key, member, interval_ms)
+            # LT: só antecipa; XX: não recria conta removida da agenda
+            pipe.zadd(self.shard_key(self.shard_of(member)), {member: now_ms + interval_ms}, xx=True, lt=True)
+        pipe.execute()
+
+    def accounts(self) -> List[Tuple[str, str]]:
+        """Todas as contas agendadas, como (plataforma, conta)"""
+        pipe = self.redis.pipeline()
+        for shard in range(self.shards):
+            pipe.zrange(self.shard_key(shard), 0, -1)
+        members = [
+            member.decode() if isinstance(member, bytes) else member
+            for shard_members in pipe.execute()
+            for member in shard_members
+        ]
+        return [tuple(member.split(":", 1)) for member in members]
+
+    def pop_due(self, shard: int, limit: int) -> List[Tuple[str, str]]:
+        """Até `limit` contas devidas do shard, como (plataforma, conta)"""
+        if self._pop_script is None:
+            self._pop_script = self.redis.register_script(POP_SCRIPT)
+        due = self._pop_script(
+            keys=[self.shard_key(shard), self.intervals_key],
+            args=[limit, int(settings.COLLECT_DEFAULT_INTERVAL * 1000)]
+        )
+        members = [member.decode() if isinstance(member, bytes) else member for member in due]
+        return [tuple(member.split(":", 1)) for member in members]
+
+    def dispatch_due(
+        self,
+        shard: int,
+        dispatch: Callable[[str, List[str]], None],
+        chunk_size: Optional[int] = None
+    ) -> int:
+        """
+        Enfileira as coletas devidas do shard em lotes por plataforma
+
+        `dispatch(plataforma, contas)` recebe até `chunk_size` contas. As
+        contas já foram reagendadas: se o despacho falhar, a coleta fica para
+        o próximo intervalo. Retorna quantas contas foram despachadas.
+        """
+        chunk_size = chunk_size or settings.COLLECT_CHUNK_SIZE
+        dispatched = 0
+        while True:
+            try:
+                due = self.pop_due(shard, chunk_size * 10)
+            except RedisError as e:
+                logger.error(f"Erro ao ler a agenda de coleta (shard {shard}): {str(e)}")
+                return dispatched
+
+            by_platform: Dict[str, List[str]] = {}
+            for platform, account_id in due:
+                by_platform.setdefault(platform, []).append(account_id)
+
+            for platform, account_ids in by_platform.items():
+                for start in range(0, len(account_ids), chunk_size):
+                    chunk = account_ids[start:start + chunk_size]
+                    try:
+                        dispatch(platform, chunk)
+                        dispatched += len(chunk)
+                    except Exception as e:
+                        logger.error(f"Coleta de {len(chunk)} contas de {platform} não enfileirada: {str(e)}")
+
+            if len(due) < chunk_size * 10:
+                return dispatched
+
+    def entries(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Próximas `limit` coletas de todos os shards, com o intervalo de cada conta"""
+        pipe = self.redis.pipeline()
+        for shard in range(self.shards):
+            pipe.zrange(self.shard_key(shard), 0, limit - 1, withscores=True)
+        due = sorted(
+            (score, member.decode() if isinstance(member, bytes) else member)
+            for shard_due in pipe.execute()
+            for member, score in shard_due
+        )[:limit]
+        if not due:
+            return []
+
+        intervals = self.redis.hmget(self.intervals_key, [member for _, member in due])
+        entries = []
+        for (score, member), interval in zip(due, intervals):
+            platform, account_id = member.split(":", 1)
+            entries.append({
+                "platform": platform,
+                "account_id": account_id,
+                "next_due": score / 1000,
+                "interval": int(interval) / 1000 if interval else self.default_interval(platform)
+            })
+        return entries
+
+    def stats(self) -> Dict[str, Any]:
+        """Contas agendadas por shard"""
+        try:
+            pipe = self.redis.pipeline()
+            for shard in range(self.shards):
+                pipe.zcard(self.shard_key(shard))
+            sizes = pipe.execute()
+        except RedisError as e:
+            logger.error(f"Erro ao ler a agenda de coleta: {str(e)}")
+            return {}
+        return {"accounts": sum(sizes), "shards": sizes}
+
+collection_scheduler = CollectionScheduler()
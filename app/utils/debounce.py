@@ -0,0 +1,140 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.utils.api_cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Adia a atualização das contas, sem passar do atraso máximo.
+# KEYS[1]: zset membro -> instante devido (ms)
+# KEYS[2]: zset membro -> primeiro evento ainda não atendido (ms)
+# ARGV: janela (ms), atraso máximo (ms), membros
+TOUCH_SCRIPT = """
+local window = tonumber(ARGV[1])
+local max_delay = tonumber(ARGV[2])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+for i = 3, #ARGV do
+    local first = tonumber(redis.call('ZSCORE', KEYS[2], ARGV[i]))
+    if not first then
+        first = now
+        redis.call('ZADD', KEYS[2], now, ARGV[i])
+    end
+    redis.call('ZADD', KEYS[1], math.min(now + window, first + max_delay), ARGV[i])
+end
+return #ARGV - 2
+"""
+
+# Retira as contas devidas; cada uma sai para um único worker.
+# KEYS: as mesmas de TOUCH_SCRIPT; ARGV: máximo de membros
+POP_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[1]))
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    redis.call('ZREM', KEYS[2], unpack(due))
+end
+return due
+"""
+
+class RefreshDebouncer:
+    """
+    Agrupa os eventos de uma conta em uma única atualização
+
+    Cada evento de (plataforma, conta) adia a atualização para `window`
+    segundos depois dele; rajadas contínuas não a adiam além de `max_delay`
+    segundos após o primeiro evento ainda não atendido. O estado fica em
+    sorted sets do Redis, então eventos recebidos por workers diferentes
+    se somam e cada atualização devida é retirada por um único worker.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        window: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        key: str = "debounce:refresh"
+    ):
+        self._redis = redis_client
+        self.window = window if window is not None else settings.REFRESH_DEBOUNCE_WINDOW
+        self.max_delay = max_delay if max_delay is not None else settings.REFRESH_DEBOUNCE_MAX_DELAY
+        self.keys = [f"{key}:due", f"{key}:first"]
+        self._touch_script = None
+        self._pop_script = None
+
+    @property
+    def redis(self):
+        return self._redis or cache.redis_client
+
+    def touch(self, platform: str, account_ids: List[str]) -> None:
+        """Registra eventos das contas; erros do Redis sobem para o chamador"""
+        members = [f"{platform}:{account_id}" for account_id in dict.fromkeys(account_ids)]
+        if not members:
+            return
+        if self._touch_script is None:
+            self._touch_script = self.redis.register_script(TOUCH_SCRIPT)
+        self._touch_script(
+            keys=self.keys,
+            args=[int(self.window * 1000), int(self.max_delay * 1000), *members]
+        )
+
+    def pop_due(self, limit: int) -> List[Tuple[str, str]]:
+        """Até `limit` contas devidas, como (plataforma, conta)"""
+        if self._pop_script is None:
+            self._pop_script = self.redis.register_script(POP_SCRIPT)
+        due = self._pop_script(keys=self.keys, args=[limit])
+        members = [member.decode() if isinstance(member, bytes) else member for member in due]
+        return [tuple(member.split(":", 1)) for member in members]
+
+    def flush(self, dispatch: Callable[[str, List[str]], None], batch_size: Optional[int] = None) -> int:
+        """
+        Despacha as atualizações devidas, agrupadas por plataforma
+
+        `dispatch(plataforma, contas)` recebe até `batch_size` contas por
+        chamada. Se falhar, as contas voltam ao debounce para a próxima
+        rodada. Retorna quantas contas foram despachadas.
+        """
+        batch_size = batch_size or settings.REFRESH_DEBOUNCE_BATCH
+        dispatched = 0
+        while True:
+            try:
+                due = self.pop_due(batch_size)
+            except RedisError as e:
+                logger.error(f"Erro ao ler atualizações pendentes: {str(e)}")
+                return dispatched
+            if not due:
+                return dispatched
+
+            by_platform: Dict[str, List[str]] = {}
+            for platform, account_id in due:
+                by_platform.setdefault(platform, []).append(account_id)
+
+            for platform, account_ids in by_platform.items():
+                try:
+                    dispatch(platform, account_ids)
+                    dispatched += len(account_ids)
+                except Exception as e:
+                    logger.error(f"Erro ao despachar atualização de {platform}; reagendando: {str(e)}")
+                    try:
+                        self.touch(platform, account_ids)
+                    except RedisError as redis_error:
+                        logger.error(f"Atualizações de {platform} perdidas: {str(redis_error)}")
+                    return dispatched
+
+            if len(due) < batch_size:
+                return dispatched
+
+    def stats(self) -> Dict[str, Any]:
+        """Contas aguardando atualização"""
+        try:
+            return {"pending": self.redis.zcard(self.keys[0])}
+        except RedisError as e:
+            logger.error(f"Erro ao ler estatísticas do debounce: {str(e)}")
+            return {}
+
+refresh_debouncer = RefreshDebouncer()
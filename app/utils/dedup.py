@@ -0,0 +1,203 @@
+import hashlib
+import json
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.utils.api_cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Consulta ou registra um lote de IDs nos filtros da janela.
+# KEYS[1]: prefixo dos filtros de Bloom (um bitmap por geração da janela)
+# KEYS[2]: contadores (hash checked/exact/bloom)
+# KEYS[3..]: chave exata de cada ID
+# ARGV: modo (check|add), janela do filtro (s), ttl das chaves exatas (s),
+#       funções de hash (k), depois k posições de bit por ID
+# check retorna, por ID: 0 novo, 1 repetido (chave exata), 2 repetido (filtro)
+DEDUP_SCRIPT = """
+local mode = ARGV[1]
+local window = tonumber(ARGV[2])
+local exact_ttl = tonumber(ARGV[3])
+local k = tonumber(ARGV[4])
+
+local now = tonumber(redis.call('TIME')[1])
+local generation = math.floor(now / window)
+local current = KEYS[1] .. ':' .. generation
+local previous = KEYS[1] .. ':' .. (generation - 1)
+
+local function in_filter(bloom, offset)
+    for i = 1, k do
+        if redis.call('GETBIT', bloom, ARGV[offset + i]) == 0 then
+            return false
+        end
+    end
+    return true
+end
+
+local results = {}
+local exact, bloom = 0, 0
+for index = 3, #KEYS do
+    local offset = 4 + (index - 3) * k
+    if mode == 'add' then
+        redis.call('SET', KEYS[index], 1, 'EX', exact_ttl)
+        for i = 1, k do
+            redis.call('SETBIT', current, ARGV[offset + i], 1)
+        end
+    elseif redis.call('EXISTS', KEYS[index]) == 1 then
+        results[#results + 1] = 1
+        exact = exact + 1
+    elseif in_filter(current, offset) or in_filter(previous, offset) then
+        results[#results + 1] = 2
+        bloom = bloom + 1
+    else
+        results[#results + 1] = 0
+    end
+end
+
+if mode == 'add' then
+    -- A geração atual ainda é consultada como anterior na janela seguinte
+    redis.call('EXPIRE', current, window * 2)
+else
+    redis.call('HINCRBY', KEYS[2], 'checked', #KEYS - 2)
+    redis.call('HINCRBY', KEYS[2], 'exact', exact)
+    redis.call('HINCRBY', KEYS[2], 'bloom', bloom)
+end
+return results
+"""
+
+def webhook_event_id(platform: str, event: Dict[str, Any]) -> str:
+    """
+    ID de um evento de webhook derivado do conteúdo
+
+    A plataforma reenvia o mesmo payload em caso de timeout, então o hash
+    canônico do evento identifica a reentrega sem depender de campos
+    específicos de cada tipo de mudança.
+    """
+    raw = json.dumps([platform, event], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+class EventDeduplicator:
+    """
+    Descarta eventos já vistos antes de enfileirá-los
+
+    Cada ID é verificado primeiro em uma chave exata com TTL curto
+    (`exact_ttl`), que cobre sem erro as reentregas mais comuns, e depois em
+    um filtro de Bloom (bitmap no Redis) que lembra os IDs por `window` a
+    `2 * window` segundos em memória constante, com falsos positivos em
+    torno de `error_rate` para até `capacity` eventos por janela: um evento
+    novo pode, raramente, ser descartado como repetido. Sem Redis nenhum
+    evento é descartado.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_client=None,
+        window: Optional[int] = None,
+        exact_ttl: Optional[int] = None,
+        capacity: Optional[int] = None,
+        error_rate: Optional[float] = None
+    ):
+        self.name = name
+        self._redis = redis_client
+        self.window = window or settings.WEBHOOK_DEDUP_WINDOW
+        self.exact_ttl = exact_ttl or settings.WEBHOOK_DEDUP_EXACT_TTL
+        capacity = capacity or settings.WEBHOOK_DEDUP_CAPACITY
+        error_rate = error_rate or settings.WEBHOOK_DEDUP_ERROR_RATE
+        # Dimensionamento clássico: m = -n ln p / (ln 2)^2, k = m/n ln 2
+        self.bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._script = None
+
+    @property
+    def redis(self):
+        return self._redis or cache.redis_client
+
+    def _positions(self, event_id: str) -> List[int]:
+        # Hash duplo (Kirsch-Mitzenmacher) a partir de um único digest
+        digest = hashlib.sha256(event_id.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _run(self, mode: str, event_ids: List[str]) -> List[int]:
+        keys = [f"dedup:bloom:{self.name}", f"dedup:stats:{self.name}"]
+        args = [mode, self.window, self.exact_ttl, self.hashes]
+        for event_id in event_ids:
+            keys.append(f"dedup:seen:{self.name}:{event_id}")
+            args.extend(self._positions(event_id))
+
+        if self._script is None:
+            self._script = self.redis.register_script(DEDUP_SCRIPT)
+        return self._script(keys=keys, args=args)
+
+    def duplicates(self, event_ids: List[str]) -> List[bool]:
+        """True para os IDs já vistos; não registra os novos"""
+        if not event_ids:
+            return []
+        try:
+            return [bool(result) for result in self._run("check", event_ids)]
+        except RedisError as e:
+            logger.error(f"Erro na deduplicação {self.name}; eventos seguem sem verificação: {str(e)}")
+            return [False] * len(event_ids)
+
+    def mark_seen(self, event_ids: List[str]) -> None:
+        """Registra os IDs; chamado depois que os eventos foram enfileirados"""
+        if not event_ids:
+            return
+        try:
+            self._run("add", event_ids)
+        except RedisError as e:
+            logger.error(f"Erro ao registrar eventos vistos em {self.name}: {str(e)}")
+
+    def filter(self, items: List[Any], key: Callable[[Any], str]) -> List[Any]:
+        """
+        Itens ainda não vistos, na ordem original e sem repetições entre si
+
+        Não os registra: quem enfileira chama mark_seen em seguida, para que
+        uma falha no meio do caminho não faça a reentrega ser descartada.
+        """
+        unique: Dict[str, Any] = {}
+        for item in items:
+            unique.setdefault(key(item), item)
+
+        duplicates = self.duplicates(list(unique))
+        dropped = len(items) - len(unique) + sum(duplicates)
+        if dropped:
+            logger.info(f"{dropped} eventos repetidos descartados em {self.name}")
+        return [item for item, duplicate in zip(unique.values(), duplicates) if not duplicate]
+
+    def stats(self) -> Dict[str, Any]:
+        """Eventos verificados e taxa de repetidos (chave exata e filtro)"""
+        try:
+            counters = self.redis.hgetall(f"dedup:stats:{self.name}")
+        except RedisError as e:
+            logger.error(f"Erro ao ler estatísticas de deduplicação {self.name}: {str(e)}")
+            return {}
+        counters = {name.decode() if isinstance(name, bytes) else name: int(value) for name, value in counters.items()}
+        checked = counters.get("checked", 0)
+        exact = counters.get("exact", 0)
+        bloom = counters.get("bloom", 0)
+        return {
+            "name": self.name,
+            "checked": checked,
+            "duplicates": exact + bloom,
+            "exact_duplicates": exact,
+            "bloom_duplicates": bloom,
+            "duplicate_rate": (exact + bloom) / checked if checked else 0.0,
+            "filter_bits": self.bits,
+            "hashes": self.hashes
+        }
+
+_deduplicators: Dict[str, EventDeduplicator] = {}
+
+def get_deduplicator(name: str) -> EventDeduplicator:
+    """Deduplicador compartilhado por nome (ex: webhooks:facebook)"""
+    if name not in _deduplicators:
+        _deduplicators[name] = EventDeduplicator(name)
+    return _deduplicators[name]
+
+def deduplicator_stats() -> List[Dict[str, Any]]:
+    return [deduplicator.stats() for deduplicator in _deduplicators.values()]
@@ -0,0 +1,64 @@
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+from app.core.config import settings
+from app.utils.retry import RetryBudget
+
+class LatencyTracker:
+    """
+    Latências recentes por endpoint
+
+    Guarda as últimas `sample_size` latências de cada chave e expõe o
+    percentil usado como atraso do hedge. Abaixo de `min_samples` amostras
+    não há estimativa e a chamada não é duplicada.
+    """
+
+    def __init__(
+        self,
+        sample_size: Optional[int] = None,
+        percentile: Optional[float] = None,
+        min_samples: Optional[int] = None
+    ):
+        self.sample_size = sample_size or settings.HEDGE_SAMPLE_SIZE
+        self.percentile_rank = percentile if percentile is not None else settings.HEDGE_PERCENTILE
+        self.min_samples = min_samples if min_samples is not None else settings.HEDGE_MIN_SAMPLES
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.sample_size)
+            samples.append(seconds)
+
+    def percentile(self, key: str) -> Optional[float]:
+        """Latência no percentil configurado, ou None sem amostras suficientes"""
+        with self._lock:
+            samples = self._samples.get(key)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        index = min(int(len(ordered) * self.percentile_rank), len(ordered) - 1)
+        return ordered[index]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+latency_tracker = LatencyTracker()
+
+_hedge_budgets: Dict[str, RetryBudget] = {}
+_hedge_budgets_lock = threading.Lock()
+
+def get_hedge_budget(name: str) -> RetryBudget:
+    """Cota de chamadas duplicadas da plataforma (HEDGE_MAX_RATIO das requisições)"""
+    with _hedge_budgets_lock:
+        budget = _hedge_budgets.get(name)
+        if budget is None:
+            budget = _hedge_budgets[name] = RetryBudget(
+                ratio=settings.HEDGE_MAX_RATIO,
+                min_retries=0,
+                window=settings.RETRY_BUDGET_WINDOW_SECONDS
+            )
+        return budget
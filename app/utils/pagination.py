@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.utils.api_cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Tenant padrão dos backfills: na fila do rate limit eles dividem a vazão
+# com as chamadas interativas em vez de ocupá-la
+BACKFILL_TENANT = "backfill"
+
+# Busca uma página a partir do cursor (None = primeira): (itens, próximo cursor)
+PageFetcher = Callable[[Optional[str]], Awaitable[Tuple[List[Any], Optional[str]]]]
+
+class CursorStore:
+    """
+    Cursores de paginação persistidos no Redis
+
+    Permitem retomar um backfill interrompido (deploy, worker reiniciado) a
+    partir da última página consumida. Sem Redis a paginação segue, só não
+    é retomável.
+    """
+
+    def __init__(self, redis_client=None, ttl: Optional[int] = None):
+        self._redis = redis_client
+        self.ttl = ttl or settings.PAGINATION_CURSOR_TTL
+
+    @property
+    def redis(self):
+        return self._redis or cache.redis_client
+
+    def _key(self, name: str) -> str:
+        return f"cursor:{name}"
+
+    def get(self, name: str) -> Optional[str]:
+        try:
+            cursor = self.redis.get(self._key(name))
+        except RedisError as e:
+            logger.error(f"Erro ao ler cursor {name}: {str(e)}")
+            return None
+        return cursor.decode() if isinstance(cursor, bytes) else cursor
+
+    def save(self, name: str, cursor: str) -> None:
+        try:
+            self.redis.set(self._key(name), cursor, ex=self.ttl)
+        except RedisError as e:
+            logger.error(f"Erro ao salvar cursor {name}: {str(e)}")
+
+    def clear(self, name: str) -> None:
+        try:
+            self.redis.delete(self._key(name))
+        except RedisError as e:
+            logger.error(f"Erro ao remover cursor {name}: {str(e)}")
+
+cursor_store = CursorStore()
+
+async def iter_pages(
+    fetch_page: PageFetcher,
+    resume_key: Optional[str] = None,
+    resume: bool = True,
+    store: Optional[CursorStore] = None
+) -> AsyncIterator[Any]:
+    """
+    Percorre todas as páginas seguindo o cursor, item a item
+
+    A próxima página é buscada enquanto a atual é consumida, e nunca há mais
+    de duas páginas em memória. Com `resume_key`, o cursor de cada página é
+    salvo ao terminar a anterior e `resume` começa do cursor salvo: uma
+    interrupção retoma da página em andamento (seus itens podem se repetir).
+    O cursor é removido ao fim da paginação.
+    """
+    store = store or cursor_store
+    cursor = None
+    if resume_key and resume:
+        cursor = await asyncio.to_thread(store.get, resume_key)
+        if cursor:
+            logger.info(f"Retomando paginação {resume_key}")
+
+    items, next_cursor = await fetch_page(cursor)
+    prefetch = None
+    try:
+        while True:
+            if next_cursor:
+                prefetch = asyncio.ensure_future(fetch_page(next_cursor))
+            for item in items:
+                yield item
+
+            if not next_cursor:
+                break
+            if resume_key:
+                # Página atual consumida: uma retomada começa na próxima
+                await asyncio.to_thread(store.save, resume_key, next_cursor)
+            items, next_cursor = await prefetch
+            prefetch = None
+
+        if resume_key:
+            await asyncio.to_thread(store.clear, resume_key)
+    finally:
+        if prefetch is not None:
+            if not prefetch.done():
+                prefetch.cancel()
+            elif not prefetch.cancelled():
+                prefetch.exception()  # consome a falha da página que não será lida
@@ -0,0 +1,197 @@
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional
+from redis.exceptions import RedisError
+from app.core.config import settings
+from app.utils.api_cache import cache
+from app.utils.local_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Percentuais reportados pela Graph API (Facebook/Instagram)
+GRAPH_USAGE_FIELDS = ("call_count", "total_cputime", "total_time")
+
+@dataclass
+class RateBudget:
+    usage: float  # fração do orçamento consumida (1.0 = esgotado)
+    blocked_until: float = 0.0  # epoch até o qual a plataforma recusará chamadas
+
+def _lower_headers(headers: Mapping[str, Any]) -> Dict[str, Any]:
+    return {str(name).lower(): value for name, value in headers.items()}
+
+def parse_twitter_headers(headers: Mapping[str, Any]) -> Optional[RateBudget]:
+    """x-rate-limit-limit/remaining/reset (reset em epoch segundos)"""
+    headers = _lower_headers(headers)
+    limit = headers.get("x-rate-limit-limit")
+    remaining = headers.get("x-rate-limit-remaining")
+    if limit is None or remaining is None:
+        return None
+
+    limit, remaining = int(limit), int(remaining)
+    usage = 1 - remaining / limit if limit > 0 else 1.0
+    blocked_until = float(headers.get("x-rate-limit-reset") or 0) if remaining <= 0 else 0.0
+    return RateBudget(usage=min(max(usage, 0.0), 1.0), blocked_until=blocked_until)
+
+def parse_graph_headers(headers: Mapping[str, Any]) -> Optional[RateBudget]:
+    """X-App-Usage e X-Business-Use-Case-Usage (percentuais de uso da última hora)"""
+    headers = _lower_headers(headers)
+    usages = []
+    blocked_until = 0.0
+
+    app_usage = headers.get("x-app-usage")
+    if app_usage:
+        usage = json.loads(app_usage)
+        usages.extend(float(usage.get(field, 0)) for field in GRAPH_USAGE_FIELDS)
+
+    business_usage = headers.get("x-business-use-case-usage")
+    if business_usage:
+        for entries in json.loads(business_usage).values():
+            for entry in entries:
+                usages.extend(float(entry.get(field, 0)) for field in GRAPH_USAGE_FIELDS)
+                # Minutos até a plataforma voltar a aceitar chamadas
+                regain = float(entry.get("estimated_time_to_regain_access") or 0)
+                if regain > 0:
+                    blocked_until = max(blocked_until, time.time() + regain * 60)
+
+    if not usages:
+        return None
+
+    usage = max(usages) / 100
+    if usage >= 1 and not blocked_until:
+        blocked_until = time.time() + settings.RATE_BUDGET_BLOCK_SECONDS
+    return RateBudget(usage=min(usage, 1.0), blocked_until=blocked_until)
+
+HEADER_PARSERS: Dict[str, Callable[[Mapping[str, Any]], Optional[RateBudget]]] = {
+    "twitter": parse_twitter_headers,
+    "facebook": parse_graph_headers,
+    "instagram": parse_graph_headers,
+}
+
+# Plataformas cujos cabeçalhos descrevem a cota de um endpoint e credencial
+# específicos; na Graph API o uso informado é do app inteiro
+SCOPED_BUDGETS = {"twitter"}
+
+# Atualiza o fator de vazão da plataforma de forma atômica entre workers:
+# reduz imediatamente até o alvo calculado pelo uso e só volta a subir em
+# passos de `ramp` a cada resposta com folga.
+# ARGV: alvo, passo de subida, bloqueado até (epoch), uso, ttl (segundos)
+_OBSERVE_SCRIPT = """
+local target = tonumber(ARGV[1])
+local ramp = tonumber(ARGV[2])
+local scale = tonumber(redis.call('HGET', KEYS[1], 'scale')) or 1
+
+if target < scale then
+    scale = target
+else
+    scale = math.min(target, scale + ramp)
+end
+
+redis.call('HSET', KEYS[1], 'scale', scale, 'blocked_until', ARGV[3], 'usage', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return tostring(scale)
+"""
+
+class BudgetStore:
+    """
+    Orçamento de chamadas por plataforma, compartilhado via Redis
+
+    O escopo (`endpoint:credencial`, o mesmo sufixo da chave de rate limit)
+    separa orçamentos das plataformas em SCOPED_BUDGETS; nas demais ele é
+    ignorado e o orçamento vale para a plataforma inteira.
+
+    Alimentado pelos cabeçalhos de rate limit das respostas, expõe quanto
+    esperar antes da próxima chamada (`delay`) e o fator aplicado ao limite
+    configurado (`scale`, entre RATE_BUDGET_MIN_SCALE e 1). Leituras ficam em
+    cache local por 1 segundo para não custar uma ida ao Redis por chamada.
+    """
+
+    def __init__(self, redis_client=None, local_ttl: float = 1.0):
+        self._redis = redis_client
+        self._script = None
+        self.local = LRUCache(maxsize=64, ttl=local_ttl)
+
+    @property
+    def redis(self):
+        return self._redis or cache.redis_client
+
+    def _key(self, platform: str, scope: Optional[str] = None) -> str:
+        if scope and platform in SCOPED_BUDGETS:
+            return f"rate_budget:{platform}:{scope}"
+        return f"rate_budget:{platform}"
+
+    def target_scale(self, usage: float) -> float:
+        """Fator alvo: 1 até a marca d'água, caindo linearmente até o mínimo"""
+        low = settings.RATE_BUDGET_LOW_WATERMARK
+        if usage <= low:
+            return 1.0
+        return max(settings.RATE_BUDGET_MIN_SCALE, (1 - usage) / (1 - low))
+
+    def observe(self, platform: str, headers: Mapping[str, Any], scope: Optional[str] = None) -> Optional[RateBudget]:
+        """Registra o orçamento informado nos cabeçalhos de uma resposta"""
+        parser = HEADER_PARSERS.get(platform)
+        if parser is None:
+            return None
+
+        try:
+            budget = parser(headers)
+        except (AttributeError, TypeError, ValueError) as e:
+            logger.warning(f"Cabeçalhos de rate limit inválidos ({platform}): {str(e)}")
+            return None
+        if budget is None:
+            return None
+
+        key = self._key(platform, scope)
+        try:
+            if self._script is None:
+                self._script = self.redis.register_script(_OBSERVE_SCRIPT)
+            scale = float(self._script(
+                keys=[key],
+                args=[
+                    self.target_scale(budget.usage),
+                    settings.RATE_BUDGET_RAMP_STEP,
+                    budget.blocked_until,
+                    budget.usage,
+                    settings.RATE_BUDGET_TTL
+                ]
+            ))
+        except RedisError as e:
+            logger.error(f"Erro ao registrar orçamento de {platform}: {str(e)}")
+            return budget
+
+        self.local.set(key, {"scale": scale, "blocked_until": budget.blocked_until, "usage": budget.usage})
+        if budget.usage >= settings.RATE_BUDGET_LOW_WATERMARK:
+            logger.info(f"Orçamento de {key} em {budget.usage:.0%}; vazão reduzida para {scale:.0%}")
+        return budget
+
+    def state(self, platform: str, scope: Optional[str] = None) -> Dict[str, float]:
+        """Fator de vazão, bloqueio e último uso observado da plataforma"""
+        key = self._key(platform, scope)
+        state = self.local.get(key)
+        if state is not None:
+            return state
+
+        state = {"scale": 1.0, "blocked_until": 0.0, "usage": 0.0}
+        try:
+            stored = self.redis.hgetall(key)
+        except RedisError as e:
+            logger.error(f"Erro ao ler orçamento de {platform}: {str(e)}")
+            self.local.set(key, state)
+            return state
+
+        for field, value in stored.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field in state:
+                state[field] = float(value)
+        self.local.set(key, state)
+        return state
+
+    def delay(self, platform: str, scope: Optional[str] = None) -> float:
+        """Segundos até a plataforma voltar a aceitar chamadas"""
+        return max(self.state(platform, scope)["blocked_until"] - time.time(), 0.0)
+
+    def scale(self, platform: str, scope: Optional[str] = None) -> float:
+        return self.state(platform, scope)["scale"]
+
+budget_store = BudgetStore()
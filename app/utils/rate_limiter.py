@@ -1,11 +1,20 @@
 from functools import wraps
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import heapq
+import itertools
+import threading
 import time
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Dict, List, Optional, Tuple
 from enum import Enum, auto
 from app.core.config import settings
 from app.utils.api_cache import cache
+from app.utils.rate_budget import budget_store
 import logging
 from collections import deque
+from redis.exceptions import RedisError
 
 logger = logging.getLogger(__name__)
 
@@ -28,61 +37,636 @@ PLATFORM_LIMITS = {
     Platform.TIKTOK: 4
 }
 
-request_queue = deque()
+class RateLimiter:
+    """
+    Limitador em processo com janela deslizante
+
+    Usado como context manager síncrono (`with`) ou assíncrono (`async with`):
+    aguarda até haver vaga para no máximo `max_calls` chamadas por `period`.
+    """
+
+    def __init__(self, max_calls: int, period: float):
+        self.max_calls = max_calls
+        self.period = period
+        self.calls = deque()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Reserva uma vaga; retorna 0 ou o tempo de espera necessário"""
+        with self._lock:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0] >= self.period:
+                self.calls.popleft()
+
+            if len(self.calls) < self.max_calls:
+                self.calls.append(now)
+                return 0.0
+            return self.calls[0] + self.period - now
+
+    def __enter__(self):
+        wait = self._reserve()
+        while wait > 0:
+            time.sleep(wait)
+            wait = self._reserve()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        wait = self._reserve()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self._reserve()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+class RateLimitExceeded(Exception):
+    """Limite atingido; `retry_after` indica em quantos segundos haverá vaga"""
+
+    def __init__(self, key: str, retry_after: float):
+        self.key = key
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit excedido para {key}. Tente novamente em {retry_after:.3f}s")
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    retry_after: float  # segundos até haver vaga (0 quando permitido)
+    remaining: int  # chamadas ainda disponíveis na rajada
+
+# GCRA (Generic Cell Rate Algorithm) atômico: guarda apenas o TAT
+# (theoretical arrival time) da chave, em ms, usando o relógio do Redis
+# para que todos os workers compartilhem a mesma referência de tempo.
+# ARGV: intervalo de emissão (ms), tolerância de rajada (ms), custo,
+# consulta sem consumo ("1"), membro do índice de cotas (KEYS[2], opcional)
+GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local dry_run = ARGV[4] == '1'
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission * cost
+local allow_at = new_tat - tolerance
+local available = math.floor((tolerance - (tat - now)) / emission)
+if KEYS[2] and not dry_run then
+    redis.call('ZADD', KEYS[2], now, ARGV[5])
+end
+if allow_at > now then
+    return {0, math.ceil(allow_at - now), available}
+end
+if dry_run then
+    return {1, 0, available}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, 0, math.floor((tolerance - (new_tat - now)) / emission)}
+"""
+
+def credential_hash(token: Optional[str]) -> str:
+    """Identificador estável da credencial, sem expor o token nas chaves"""
+    if not token:
+        return "app"
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+# Índice (zset) das cotas em uso, "tenant|chave" -> último acesso em ms
+QUOTA_INDEX_KEY = "rate_limit:index"
+
+class DistributedRateLimiter:
+    """
+    Limitador distribuído (GCRA) executado num único script Lua no Redis
+
+    Permite `limit` chamadas por `period` segundos, com rajadas de até
+    `limit` chamadas, sem janelas fixas. Cada verificação é uma única ida ao
+    Redis e é atômica entre processos.
+    """
+
+    def __init__(self, limit: int, period: float = 1.0, redis_client=None):
+        self.limit = limit
+        self.period = period
+        self.redis = redis_client or cache.redis_client
+        self._script = None
+
+    @property
+    def emission_ms(self) -> float:
+        return self.period * 1000 / self.limit
+
+    def acquire(
+        self,
+        key: str,
+        cost: int = 1,
+        scale: float = 1.0,
+        tenant: Optional[str] = None,
+        dry_run: bool = False
+    ) -> RateLimitResult:
+        """
+        Tenta consumir `cost` chamadas da chave sem bloquear
+
+        `scale` reduz o limite configurado (ex: 0.5 = metade da vazão e da
+        rajada), conforme o orçamento reportado pela plataforma. Com `tenant`,
+        a chave é registrada no índice de cotas usado pela introspecção.
+        """
+        if self._script is None:
+            self._script = self.redis.register_script(GCRA_SCRIPT)
+
+        emission = self.emission_ms / scale
+        # A rajada nunca fica abaixo de uma chamada
+        tolerance = max(self.period * 1000, emission)
+        keys = [key, QUOTA_INDEX_KEY] if tenant else [key]
+        allowed, retry_after_ms, remaining = self._script(
+            keys=keys,
+            args=[emission, tolerance, cost, "1" if dry_run else "0", f"{tenant}|{key}"]
+        )
+        return RateLimitResult(
+            allowed=bool(allowed),
+            retry_after=max(float(retry_after_ms), 0.0) / 1000,
+            remaining=max(int(remaining), 0)
+        )
+
+    def peek(self, key: str, scale: float = 1.0) -> RateLimitResult:
+        """Vagas disponíveis na chave, sem consumir"""
+        return self.acquire(key, scale=scale, dry_run=True)
+
+    def wait(self, key: str, cost: int = 1, max_wait: Optional[float] = None) -> RateLimitResult:
+        """Aguarda vaga; gera RateLimitExceeded se a espera passar de `max_wait`"""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            result = self.acquire(key, cost)
+            if result.allowed:
+                return result
+            if deadline is not None and time.monotonic() + result.retry_after > deadline:
+                raise RateLimitExceeded(key, result.retry_after)
+            time.sleep(result.retry_after)
+
+    async def wait_async(self, key: str, cost: int = 1, max_wait: Optional[float] = None) -> RateLimitResult:
+        """Versão assíncrona de wait"""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            result = self.acquire(key, cost)
+            if result.allowed:
+                return result
+            if deadline is not None and time.monotonic() + result.retry_after > deadline:
+                raise RateLimitExceeded(key, result.retry_after)
+            await asyncio.sleep(result.retry_after)
+
+_limiters: Dict[Platform, DistributedRateLimiter] = {}
+
+def get_platform_limiter(platform: Platform) -> DistributedRateLimiter:
+    """Limitador compartilhado da plataforma (limite de PLATFORM_LIMITS)"""
+    limiter = _limiters.get(platform)
+    if limiter is None:
+        limiter = _limiters[platform] = DistributedRateLimiter(PLATFORM_LIMITS[platform])
+    return limiter
+
+def rate_limit_key(platform: Platform, endpoint: str, token: Optional[str] = None) -> str:
+    return f"rate_limit:{platform.name}:{endpoint}:{credential_hash(token)}"
+
+def quota_scope(key: str) -> str:
+    """Parte `endpoint:credencial` da chave de rate limit (escopo do orçamento)"""
+    return key.split(":", 2)[-1]
+
+class _Waiter:
+    """Requisição aguardando vaga na fila do agendador"""
+
+    __slots__ = ("key", "priority", "tenant", "enqueued_at", "notify", "granted", "cancelled")
+
+    def __init__(self, key: str, priority: Priority, tenant: Optional[str], notify: Callable[[], None]):
+        self.key = key
+        self.priority = priority
+        self.tenant = tenant
+        self.enqueued_at = time.monotonic()
+        self.notify = notify
+        self.granted = False
+        self.cancelled = False
+
+def _resolve(future: "asyncio.Future") -> None:
+    if not future.done():
+        future.set_result(None)
+
+class PriorityScheduler:
+    """
+    Fila de prioridade (heap) das chamadas de uma plataforma
+
+    Chamadas sem fila passam direto pelo limitador; quando o limite é
+    atingido, entram no heap e uma thread despachante libera uma por vez,
+    conforme o limitador distribuído devolve vagas. A ordem é pelo prazo
+    virtual `entrada + prioridade * aging`: uma chamada LOW que espera mais
+    de 2 * aging passa à frente de uma HIGH recém-chegada, evitando inanição.
+
+    Cada chave (cota) é liberada de forma independente: uma chave esgotada
+    não segura as chamadas de outras chaves da mesma plataforma.
+
+    Chamadas com `tenant` dividem a vazão de forma justa (start-time fair
+    queuing): cada nova chamada de um tenant entra `fair_share_spacing`
+    segundos depois da anterior dele, então um tenant com fila longa é
+    intercalado com os demais em vez de ocupar todas as vagas.
+    """
+
+    def __init__(
+        self,
+        platform: Platform,
+        limiter: Optional[DistributedRateLimiter] = None,
+        aging: Optional[float] = None,
+        fair_share_spacing: Optional[float] = None
+    ):
+        self.platform = platform
+        self._limiter = limiter
+        self.aging = settings.RATE_LIMIT_AGING_SECONDS if aging is None else aging
+        self._fair_share_spacing = fair_share_spacing
+        self._tenant_tags: Dict[str, float] = {}
+        self.tenants: Dict[str, Dict[str, int]] = {}
+        self._heap = []
+        self._queued: Dict[str, int] = {}  # chamadas na fila por chave
+        self._blocked: Dict[str, float] = {}  # chave -> instante (monotonic) da próxima vaga
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._retry_after = 0.0
+
+        self.depth = {priority: 0 for priority in Priority}
+        self.granted = {priority: 0 for priority in Priority}
+        self.wait_total = {priority: 0.0 for priority in Priority}
+        self.wait_max = {priority: 0.0 for priority in Priority}
+        self.timeouts = 0
+
+    @property
+    def limiter(self) -> DistributedRateLimiter:
+        return self._limiter or get_platform_limiter(self.platform)
 
-def rate_limited(platform: Platform, priority: Priority = Priority.MEDIUM):
+    @property
+    def fair_share_spacing(self) -> float:
+        """Intervalo entre chamadas de um mesmo tenant na fila (padrão: 1 vaga)"""
+        if self._fair_share_spacing is not None:
+            return self._fair_share_spacing
+        return self.limiter.emission_ms / 1000
+
+    def _acquire(self, key: str, tenant: Optional[str] = None) -> RateLimitResult:
+        """Consulta o orçamento da plataforma e o limitador distribuído"""
+        platform = self.platform.name.lower()
+        scope = quota_scope(key)
+        delay = budget_store.delay(platform, scope)
+        if delay > 0:
+            return RateLimitResult(allowed=False, retry_after=delay, remaining=0)
+
+        try:
+            return self.limiter.acquire(key, scale=budget_store.scale(platform, scope), tenant=tenant)
+        except RedisError as e:
+            # Sem Redis a chamada segue, como no cache
+            logger.error(f"Erro ao consultar rate limit de {self.platform.name}: {str(e)}")
+            return RateLimitResult(allowed=True, retry_after=0.0, remaining=0)
+
+    def slot(
+        self,
+        key: str,
+        priority: Priority = Priority.MEDIUM,
+        max_wait: Optional[float] = None,
+        tenant: Optional[str] = None
+    ) -> "_SchedulerSlot":
+        """Context manager (`with`/`async with`) que aguarda vaga na fila"""
+        return _SchedulerSlot(self, key, priority, max_wait, tenant)
+
+    def acquire(
+        self,
+        key: str,
+        priority: Priority = Priority.MEDIUM,
+        max_wait: Optional[float] = None,
+        tenant: Optional[str] = None
+    ) -> float:
+        """Bloqueia até haver vaga; retorna o tempo de espera em segundos"""
+        if self._try_now(key, priority, max_wait, tenant):
+            return 0.0
+
+        event = threading.Event()
+        waiter = _Waiter(key, priority, tenant, event.set)
+        self._enqueue(waiter)
+        if not event.wait(max_wait) and self._cancel(waiter):
+            raise RateLimitExceeded(key, self._retry_after)
+        return time.monotonic() - waiter.enqueued_at
+
+    async def acquire_async(
+        self,
+        key: str,
+        priority: Priority = Priority.MEDIUM,
+        max_wait: Optional[float] = None,
+        tenant: Optional[str] = None
+    ) -> float:
+        """Versão assíncrona de acquire (não bloqueia o event loop)"""
+        loop = asyncio.get_running_loop()
+        # O EVAL do limitador é síncrono: roda fora do event loop
+        if await loop.run_in_executor(None, self._try_now, key, priority, max_wait, tenant):
+            return 0.0
+
+        future = loop.create_future()
+        waiter = _Waiter(key, priority, tenant, lambda: loop.call_soon_threadsafe(_resolve, future))
+        self._enqueue(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), max_wait)
+        except asyncio.TimeoutError:
+            if self._cancel(waiter):
+                raise RateLimitExceeded(key, self._retry_after)
+            await future
+        except asyncio.CancelledError:
+            self._cancel(waiter)
+            raise
+        return time.monotonic() - waiter.enqueued_at
+
+    def _try_now(self, key: str, priority: Priority, max_wait: Optional[float], tenant: Optional[str]) -> bool:
+        """
+        Caminho rápido: sem fila, consulta o limitador direto
+
+        Gera RateLimitExceeded sem entrar na fila quando a espera informada já
+        passa de `max_wait` (ex: plataforma bloqueada até o reset).
+        """
+        with self._cond:
+            if self._queued.get(key):
+                return False
+
+        result = self._acquire(key, tenant)
+        if not result.allowed:
+            self._retry_after = result.retry_after
+            if max_wait is not None and result.retry_after > max_wait:
+                with self._cond:
+                    self.timeouts += 1
+                    self._count_tenant(tenant, "rejected")
+                raise RateLimitExceeded(key, result.retry_after)
+            return False
+
+        with self._cond:
+            self.granted[priority] += 1
+            self._count_tenant(tenant, "granted")
+            self._fair_share_start(tenant, time.monotonic())
+        return True
+
+    def _count_tenant(self, tenant: Optional[str], field: str, amount: int = 1) -> None:
+        if tenant is None:
+            return
+        counters = self.tenants.setdefault(tenant, {"queued": 0, "granted": 0, "rejected": 0})
+        counters[field] += amount
+
+    def _fair_share_start(self, tenant: Optional[str], now: float) -> float:
+        """Início virtual da chamada do tenant; avança a marca dele em uma vaga"""
+        if tenant is None:
+            return now
+        start = max(now, self._tenant_tags.get(tenant, now))
+        self._tenant_tags[tenant] = start + self.fair_share_spacing
+        if len(self._tenant_tags) > 1000:
+            self._tenant_tags = {name: tag for name, tag in self._tenant_tags.items() if tag > now}
+        return start
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        with self._cond:
+            start = self._fair_share_start(waiter.tenant, waiter.enqueued_at)
+            deadline = start + waiter.priority.value * self.aging
+            heapq.heappush(self._heap, (deadline, next(self._seq), waiter))
+            self._queued[waiter.key] = self._queued.get(waiter.key, 0) + 1
+            self.depth[waiter.priority] += 1
+            self._count_tenant(waiter.tenant, "queued")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._dispatch, name=f"rate-limit-{self.platform.name.lower()}", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def _cancel(self, waiter: _Waiter) -> bool:
+        """Desiste da vaga; False se ela já foi concedida"""
+        with self._cond:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            self._dequeue(waiter)
+            self.timeouts += 1
+            self._count_tenant(waiter.tenant, "queued", -1)
+            self._count_tenant(waiter.tenant, "rejected")
+            return True
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        self.depth[waiter.priority] -= 1
+        remaining = self._queued.get(waiter.key, 0) - 1
+        if remaining > 0:
+            self._queued[waiter.key] = remaining
+        else:
+            self._queued.pop(waiter.key, None)
+
+    def _pending(self) -> List[_Waiter]:
+        """Chamadas ainda na fila, na ordem do heap"""
+        while self._heap and (self._heap[0][2].cancelled or self._heap[0][2].granted):
+            heapq.heappop(self._heap)
+        return [entry[2] for entry in sorted(self._heap) if not entry[2].cancelled and not entry[2].granted]
+
+    def _next_waiter(self, now: float) -> Tuple[Optional[_Waiter], Optional[float]]:
+        """
+        Primeira chamada da fila cuja chave pode ter vaga
+
+        Chaves esgotadas ficam de fora até a vaga prevista; sem candidatos,
+        retorna quanto esperar pela próxima (None = até chegar chamada nova).
+        """
+        wait = None
+        for waiter in self._pending():
+            available_at = self._blocked.get(waiter.key, 0.0)
+            if available_at <= now:
+                return waiter, None
+            wait = available_at - now if wait is None else min(wait, available_at - now)
+        return None, wait
+
+    def _grant(self, waiter: _Waiter) -> None:
+        waited = time.monotonic() - waiter.enqueued_at
+        waiter.granted = True
+        self._dequeue(waiter)
+        self.granted[waiter.priority] += 1
+        self._count_tenant(waiter.tenant, "queued", -1)
+        self._count_tenant(waiter.tenant, "granted")
+        self.wait_total[waiter.priority] += waited
+        self.wait_max[waiter.priority] = max(self.wait_max[waiter.priority], waited)
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                waiter, wait = self._next_waiter(time.monotonic())
+                while waiter is None:
+                    self._cond.wait(wait)
+                    waiter, wait = self._next_waiter(time.monotonic())
+
+            try:
+                result = self._acquire(waiter.key, waiter.tenant)
+            except Exception as e:
+                # A thread despachante não pode morrer com a fila cheia
+                logger.error(f"Erro ao liberar fila de {self.platform.name}: {str(e)}")
+                result = RateLimitResult(allowed=False, retry_after=1.0, remaining=0)
+
+            with self._cond:
+                now = time.monotonic()
+                if not result.allowed:
+                    self._retry_after = result.retry_after
+                    self._blocked[waiter.key] = now + result.retry_after
+                    if len(self._blocked) > 1000:
+                        self._blocked = {key: at for key, at in self._blocked.items() if at > now}
+                    continue
+
+                self._blocked.pop(waiter.key, None)
+                if waiter.cancelled:
+                    # A vaga já foi consumida: passa para a próxima chamada da mesma chave
+                    waiter = next((item for item in self._pending() if item.key == waiter.key), None)
+                    if waiter is None:
+                        continue
+                self._grant(waiter)
+
+            try:
+                waiter.notify()
+            except RuntimeError:
+                # Event loop do chamador já foi fechado
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidade da fila e tempos de espera por prioridade"""
+        with self._cond:
+            return {
+                "platform": self.platform.name,
+                "queue_depth": {priority.name: self.depth[priority] for priority in Priority},
+                "granted": {priority.name: self.granted[priority] for priority in Priority},
+                "wait_time": {
+                    priority.name: {
+                        "avg": round(self.wait_total[priority] / self.granted[priority], 4) if self.granted[priority] else 0.0,
+                        "max": round(self.wait_max[priority], 4)
+                    }
+                    for priority in Priority
+                },
+                "timeouts": self.timeouts,
+                "retry_after": round(self._retry_after, 4),
+                "tenants": {tenant: dict(counters) for tenant, counters in self.tenants.items()}
+            }
+
+class _SchedulerSlot:
+    def __init__(
+        self,
+        scheduler: PriorityScheduler,
+        key: str,
+        priority: Priority,
+        max_wait: Optional[float],
+        tenant: Optional[str]
+    ):
+        self.scheduler = scheduler
+        self.key = key
+        self.priority = priority
+        self.max_wait = max_wait
+        self.tenant = tenant
+
+    def __enter__(self):
+        self.scheduler.acquire(self.key, self.priority, self.max_wait, self.tenant)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        await self.scheduler.acquire_async(self.key, self.priority, self.max_wait, self.tenant)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+_schedulers: Dict[Platform, PriorityScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(platform: Platform) -> PriorityScheduler:
+    """Agendador compartilhado da plataforma"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(platform)
+        if scheduler is None:
+            scheduler = _schedulers[platform] = PriorityScheduler(platform)
+        return scheduler
+
+def scheduler_stats() -> Dict[str, Any]:
+    """Métricas de todos os agendadores ativos"""
+    return {platform.name: scheduler.stats() for platform, scheduler in list(_schedulers.items())}
+
+def quota_report(platform: Optional[Platform] = None, tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Orçamento restante de cada cota (plataforma, credencial, endpoint) por tenant
+
+    Lê o índice de cotas compartilhado entre os workers; entradas sem uso há
+    mais de RATE_LIMIT_QUOTA_INDEX_TTL segundos são descartadas.
+    """
+    redis_client = cache.redis_client
+    cutoff = (time.time() - settings.RATE_LIMIT_QUOTA_INDEX_TTL) * 1000
+    redis_client.zremrangebyscore(QUOTA_INDEX_KEY, "-inf", cutoff)
+
+    report = []
+    for member, last_seen in redis_client.zrange(QUOTA_INDEX_KEY, 0, -1, withscores=True):
+        member = member.decode() if isinstance(member, bytes) else member
+        member_tenant, key = member.split("|", 1)
+        _, platform_name, endpoint, credential = key.split(":", 3)
+        member_platform = Platform.__members__.get(platform_name)
+        if member_platform is None:
+            continue
+        if (platform and member_platform is not platform) or (tenant and member_tenant != tenant):
+            continue
+
+        limiter = get_platform_limiter(member_platform)
+        scale = budget_store.scale(member_platform.name.lower(), quota_scope(key))
+        current = limiter.peek(key, scale=scale)
+        scheduler = _schedulers.get(member_platform)
+        report.append({
+            "platform": member_platform.name.lower(),
+            "tenant": member_tenant,
+            "endpoint": endpoint,
+            "credential": credential,
+            "limit": limiter.limit,
+            "period": limiter.period,
+            "scale": scale,
+            "remaining": current.remaining,
+            "retry_after": current.retry_after,
+            "last_seen": datetime.fromtimestamp(last_seen / 1000, tz=timezone.utc).isoformat(),
+            "local": scheduler.tenants.get(member_tenant) if scheduler else None
+        })
+    return report
+
+def rate_limited(
+    platform: Platform,
+    priority: Priority = Priority.MEDIUM,
+    endpoint: Optional[str] = None,
+    token: Optional[str] = None,
+    max_wait: Optional[float] = None,
+    tenant: Optional[str] = None
+):
     """
     Decorator avançado para limitar chamadas à API por plataforma
-    
+
     Args:
         platform: Plataforma da API (enum Platform)
         priority: Prioridade da requisição (enum Priority)
+        endpoint: Nome do endpoint na chave do limite (padrão: nome da função)
+        token: Credencial usada nas chamadas (o limite é por credencial)
+        max_wait: Espera máxima por vaga antes de gerar RateLimitExceeded
+        tenant: Dono da cota na divisão justa (padrão: hash da credencial)
+
+    Chamadas acima do limite aguardam na fila de prioridade da plataforma.
     """
     def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs) -> Any:
-            platform_limit = PLATFORM_LIMITS[platform]
-            key = f"rate_limit:{platform.name}:{func.__name__}"
+        key = rate_limit_key(platform, endpoint or func.__name__, token)
+        wait_limit = settings.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        owner = tenant or credential_hash(token)
 
-            # Adiciona à fila de espera se necessário
-            if not _check_limit(key, platform_limit):
-                wait_time = _calculate_wait_time(key, platform_limit)
-                request_queue.append((priority, func, args, kwargs))
-                logger.warning(f"Requisição enfileirada. Prioridade: {priority.name}")
-                return _process_queue()
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                await get_scheduler(platform).acquire_async(key, priority, wait_limit, owner)
+                return await func(*args, **kwargs)
+            return async_wrapper
 
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            get_scheduler(platform).acquire(key, priority, wait_limit, owner)
             return func(*args, **kwargs)
         return wrapper
     return decorator
-
-def _check_limit(key: str, limit: int) -> bool:
-    """Verifica se o limite de chamadas foi atingido"""
-    current = cache.get(key) or {'count': 0, 'start_time': time.time()}
-    
-    if time.time() - current['start_time'] > 1:  # Janela de 1 segundo
-        current = {'count': 0, 'start_time': time.time()}
-    
-    if current['count'] >= limit:
-        return False
-    
-    current['count'] += 1
-    cache.set(key, current, 1)
-    return True
-
-def _calculate_wait_time(key: str, limit: int) -> float:
-    """Calcula tempo de espera estimado"""
-    current = cache.get(key) or {'count': 0, 'start_time': time.time()}
-    elapsed = time.time() - current['start_time']
-    return max(0, 1 - elapsed)  # Espera até o próximo segundo
-
-def _process_queue():
-    """Processa a fila de requisições por prioridade"""
-    if not request_queue:
-        return None
-        
-    # Ordena fila por prioridade
-    request_queue = sorted(request_queue, key=lambda x: x[0].value)
-    
-    # Processa requisição mais prioritária
-    priority, func, args, kwargs = request_queue.popleft()
-    return func(*args, **kwargs)
\ No newline at end of file
@@ -1,10 +1,13 @@
 from functools import wraps
 import asyncio
+import threading
 import time
 from datetime import timedelta
-from typing import Callable, Optional, Union
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import httpx
 import random
+import requests
 from fastapi import HTTPException
 from app.core.config import settings
 import logging
@@ -19,6 +22,8 @@ class BackoffStrategy(Enum):
     FIBONACCI = auto()
 
 class CircuitBreaker:
+    """Circuito em memória do processo; integrações usam app.utils.circuit_breaker"""
+
     def __init__(self, max_failures=5, reset_timeout=60):
         self.max_failures = max_failures
         self.reset_timeout = reset_timeout
@@ -51,6 +56,263 @@ class CircuitBreaker:
             self.is_open = True
             logger.error(f"Circuit breaker aberto após {self.failure_count} falhas")
 
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+def _status_code(error: Exception) -> Optional[int]:
+    if isinstance(error, HTTPException):
+        return error.status_code
+    if isinstance(error, (requests.exceptions.HTTPError, httpx.HTTPStatusError)) and error.response is not None:
+        return error.response.status_code
+    return None
+
+def _error_headers(error: Exception) -> Dict[str, Any]:
+    if isinstance(error, HTTPException):
+        headers = error.headers
+    elif isinstance(error, (requests.exceptions.HTTPError, httpx.HTTPStatusError)) and error.response is not None:
+        headers = error.response.headers
+    else:
+        headers = None
+    return {str(name).lower(): value for name, value in (headers or {}).items()}
+
+def is_retryable_error(error: Exception, retry_on: Tuple[int, ...] = RETRYABLE_STATUS) -> bool:
+    """Falhas transitórias: rede, timeout e os códigos HTTP de `retry_on`"""
+    status = _status_code(error)
+    if status is not None:
+        return status in retry_on
+    return isinstance(error, (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        httpx.TransportError
+    ))
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Segundos de espera pedidos pela plataforma na resposta de erro
+
+    Lê Retry-After (segundos ou data HTTP) e, quando a cota está esgotada,
+    x-rate-limit-reset (epoch, Twitter).
+    """
+    headers = _error_headers(error)
+    try:
+        value = headers.get("retry-after")
+        if value is not None:
+            value = str(value).strip()
+            try:
+                return max(float(value), 0.0)
+            except ValueError:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+
+        reset = headers.get("x-rate-limit-reset")
+        if reset is not None and (_status_code(error) == 429 or str(headers.get("x-rate-limit-remaining")) == "0"):
+            return max(float(reset) - time.time(), 0.0)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Cabeçalho de espera inválido: {str(e)}")
+    return None
+
+class RetryBudget:
+    """
+    Limita as retentativas a uma fração das requisições recentes
+
+    Janela deslizante em buckets de 1 segundo: uma retentativa só é liberada
+    se as retentativas da janela ficarem abaixo de `ratio` das requisições
+    mais `min_retries`. Como a fração vale para cada processo, vale também
+    para a frota inteira, sem ida ao Redis por chamada.
+    """
+
+    def __init__(
+        self,
+        ratio: Optional[float] = None,
+        min_retries: Optional[int] = None,
+        window: Optional[int] = None
+    ):
+        self.ratio = ratio if ratio is not None else settings.RETRY_BUDGET_RATIO
+        self.min_retries = min_retries if min_retries is not None else settings.RETRY_BUDGET_MIN_RETRIES
+        self.window = window if window is not None else settings.RETRY_BUDGET_WINDOW_SECONDS
+        self._buckets: Dict[int, List[int]] = {}  # segundo -> [requisições, retentativas]
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _bucket(self) -> List[int]:
+        now = int(time.monotonic())
+        for second in [second for second in self._buckets if second <= now - self.window]:
+            del self._buckets[second]
+        return self._buckets.setdefault(now, [0, 0])
+
+    def _totals(self) -> Tuple[int, int]:
+        requests_, retries = 0, 0
+        for bucket_requests, bucket_retries in self._buckets.values():
+            requests_ += bucket_requests
+            retries += bucket_retries
+        return requests_, retries
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._bucket()[0] += 1
+
+    def try_spend(self) -> bool:
+        """Reserva uma retentativa; False quando o orçamento está esgotado"""
+        with self._lock:
+            bucket = self._bucket()
+            requests_, retries = self._totals()
+            if retries >= self.ratio * requests_ + self.min_retries:
+                self.rejected += 1
+                return False
+            bucket[1] += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._bucket()
+            requests_, retries = self._totals()
+        return {"requests": requests_, "retries": retries, "rejected": self.rejected}
+
+_retry_budgets: Dict[str, RetryBudget] = {}
+_retry_budgets_lock = threading.Lock()
+
+def get_retry_budget(name: str) -> RetryBudget:
+    """Orçamento de retentativas compartilhado de uma plataforma/API"""
+    with _retry_budgets_lock:
+        budget = _retry_budgets.get(name)
+        if budget is None:
+            budget = _retry_budgets[name] = RetryBudget()
+        return budget
+
+class RetryPolicy:
+    """
+    Política de retentativas para funções síncronas e assíncronas
+
+    Só repete falhas classificadas como transitórias (`is_retryable`, padrão
+    is_retryable_error), respeita a espera pedida pela plataforma
+    (Retry-After / x-rate-limit-reset) e consome o orçamento de retentativas
+    (`budget`: um RetryBudget ou uma função que o obtém dos argumentos da
+    chamada). HTTP 429 sem indicação de espera e esperas acima de
+    `max_retry_after` não são repetidos. Esgotadas as tentativas, relança a
+    última exceção original.
+
+    Uso:
+        @RetryPolicy(max_retries=2, budget=get_retry_budget("facebook"))
+        def chamar_api(): ...
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        initial_delay: float = 1.0,
+        max_delay: float = 10.0,
+        backoff_factor: float = 2.0,
+        strategy: BackoffStrategy = BackoffStrategy.EXPONENTIAL,
+        retry_on: Tuple[int, ...] = RETRYABLE_STATUS,
+        is_retryable: Optional[Callable[[Exception], bool]] = None,
+        budget: Union[RetryBudget, Callable[..., Optional[RetryBudget]], None] = None,
+        max_retry_after: Optional[float] = None,
+        exceptions: tuple = (Exception,),
+        log_level: int = logging.WARNING
+    ):
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.strategy = strategy
+        self.retry_on = retry_on
+        self._is_retryable = is_retryable
+        self.budget = budget
+        self.max_retry_after = max_retry_after if max_retry_after is not None else settings.RETRY_MAX_RETRY_AFTER
+        self.exceptions = exceptions
+        self.log_level = log_level
+
+    def is_retryable(self, error: Exception) -> bool:
+        if self._is_retryable is not None:
+            return self._is_retryable(error)
+        return is_retryable_error(error, self.retry_on)
+
+    def _resolve_budget(self, args: tuple, kwargs: dict) -> Optional[RetryBudget]:
+        if callable(self.budget):
+            return self.budget(*args, **kwargs)
+        return self.budget
+
+    def next_delay(self, error: Exception, attempt: int, budget: Optional[RetryBudget] = None) -> Optional[float]:
+        """Espera antes da próxima tentativa, ou None se a falha não deve ser repetida"""
+        if attempt >= self.max_retries or not self.is_retryable(error):
+            return None
+
+        wait = retry_after(error)
+        if wait is None and _status_code(error) == 429:
+            # Cota esgotada sem previsão de retorno: repetir só consumiria mais cota
+            return None
+        if wait is not None and wait > self.max_retry_after:
+            logger.warning(f"Plataforma pediu {wait:.0f}s de espera; sem nova tentativa")
+            return None
+
+        if budget is not None and not budget.try_spend():
+            logger.warning(f"Orçamento de retentativas esgotado: {str(error)}")
+            return None
+
+        delay = _calculate_delay(attempt, self.initial_delay, self.max_delay, self.backoff_factor, self.strategy)
+        if wait is not None:
+            delay = max(delay, wait)
+        logger.log(
+            self.log_level,
+            f"Tentativa {attempt + 1}/{self.max_retries + 1} falhou. "
+            f"Tentando novamente em {delay:.2f}s. Erro: {str(error)}"
+        )
+        return delay
+
+    def __call__(self, func: Callable):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                budget = self._resolve_budget(args, kwargs)
+                if budget is not None:
+                    budget.record_request()
+                attempt = 0
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except self.exceptions as e:
+                        delay = self.next_delay(e, attempt, budget)
+                        if delay is None:
+                            raise
+                    attempt += 1
+                    await asyncio.sleep(delay)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            budget = self._resolve_budget(args, kwargs)
+            if budget is not None:
+                budget.record_request()
+            attempt = 0
+            while True:
+                try:
+                    return func(*args, **kwargs)
+                except self.exceptions as e:
+                    delay = self.next_delay(e, attempt, budget)
+                    if delay is None:
+                        raise
+                attempt += 1
+                time.sleep(delay)
+        return wrapper
+
+def retry(
+    max_retries: int = 3,
+    delay: float = 1.0,
+    exceptions: tuple = (Exception,),
+    giveup: Optional[Callable[[Exception], bool]] = None
+):
+    """
+    Decorator simples de retentativa com atraso fixo
+
+    `max_retries` é o total de tentativas. Repete qualquer exceção de
+    `exceptions`, exceto aquelas para as quais `giveup` retorna True.
+    """
+    return RetryPolicy(
+        max_retries=max_retries - 1,
+        initial_delay=delay,
+        strategy=BackoffStrategy.CONSTANT,
+        is_retryable=lambda error: not (giveup and giveup(error)),
+        exceptions=exceptions
+    )
+
 def retry_request(
     max_retries: int = 3,
     initial_delay: float = 1.0,
@@ -59,13 +321,17 @@ def retry_request(
     retry_on: tuple = (500, 502, 503, 504),
     circuit_breaker: Optional[CircuitBreaker] = None,
     strategy: BackoffStrategy = BackoffStrategy.EXPONENTIAL,
-    log_level: int = logging.WARNING
+    log_level: int = logging.WARNING,
+    budget: Optional[RetryBudget] = None
 ):
     """
     Decorator avançado para retentativas com múltiplas estratégias
-    
+
+    Aplica RetryPolicy a funções assíncronas; esgotadas as tentativas de uma
+    falha transitória, gera HTTPException 503.
+
     Args:
-        max_retries: Número máximo de tentativas
+        max_retries: Número máximo de retentativas
         initial_delay: Atraso inicial em segundos
         max_delay: Atraso máximo em segundos
         backoff_factor: Fator de multiplicação para backoff
@@ -73,11 +339,40 @@ def retry_request(
         circuit_breaker: Instância de CircuitBreaker
         strategy: Estratégia de backoff (EXPONENTIAL, LINEAR, CONSTANT, FIBONACCI)
         log_level: Nível de log para tentativas
+        budget: Orçamento de retentativas (RetryBudget)
     """
+    def is_retryable(error: Exception) -> bool:
+        # Erros sem status HTTP são tratados como transitórios
+        status = _status_code(error)
+        return status is None or status in retry_on
+
+    policy = RetryPolicy(
+        max_retries=max_retries,
+        initial_delay=initial_delay,
+        max_delay=max_delay,
+        backoff_factor=backoff_factor,
+        strategy=strategy,
+        retry_on=retry_on,
+        is_retryable=is_retryable,
+        budget=budget,
+        log_level=log_level
+    )
+
     def decorator(func: Callable):
+        @policy
+        async def attempt(*args, **kwargs):
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if circuit_breaker and is_retryable(e):
+                    circuit_breaker.record_failure()
+                raise
+            if circuit_breaker:
+                circuit_breaker.failure_count = 0
+            return result
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            last_error = None
             if circuit_breaker and not circuit_breaker.check_state():
                 logger.error("Circuit breaker aberto - requisição bloqueada")
                 raise HTTPException(
@@ -85,39 +380,16 @@ def retry_request(
                     detail="Serviço temporariamente indisponível (circuit breaker)"
                 )
 
-            for attempt in range(max_retries + 1):
-                try:
-                    result = await func(*args, **kwargs)
-                    if circuit_breaker:
-                        circuit_breaker.failure_count = 0
-                    return result
-                except httpx.HTTPStatusError as e:
-                    if e.response.status_code not in retry_on:
-                        raise
-                    last_error = e
-                    if circuit_breaker:
-                        circuit_breaker.record_failure()
-                except Exception as e:
-                    last_error = e
-                    if circuit_breaker:
-                        circuit_breaker.record_failure()
-
-                if attempt < max_retries:
-                    delay = _calculate_delay(
-                        attempt, initial_delay, max_delay, backoff_factor, strategy
-                    )
-                    logger.log(
-                        log_level,
-                        f"Tentativa {attempt + 1}/{max_retries} falhou. "
-                        f"Tentando novamente em {delay:.2f}s. Erro: {str(last_error)}"
-                    )
-                    await asyncio.sleep(delay)
-
-            logger.error(f"Todas as {max_retries} tentativas falharam")
-            raise HTTPException(
-                status_code=503,
-                detail=f"Serviço indisponível após {max_retries} tentativas"
-            ) from last_error
+            try:
+                return await attempt(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                logger.error(f"Todas as {max_retries} tentativas falharam")
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Serviço indisponível após {max_retries} tentativas"
+                ) from e
         return wrapper
     return decorator
 
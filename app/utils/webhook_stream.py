@@ -0,0 +1,107 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from redis.exceptions import RedisError, ResponseError
+from app.core.config import settings
+from app.utils.api_cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Entrada lida do stream: (id, campos)
+StreamEntry = Tuple[str, Dict[str, Any]]
+
+def _decode(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+class WebhookStream:
+    """
+    Buffer durável de webhooks em um Redis Stream
+
+    O endpoint grava o payload bruto já verificado com um único XADD e
+    responde; os workers do consumer group leem as entradas em lotes e só as
+    confirmam (XACK) depois de enfileirar o processamento. Entradas de um
+    worker que parou sem confirmar são reassumidas por outro após
+    `claim_idle` segundos, então cada webhook é processado ao menos uma vez.
+    O stream é limitado a cerca de `maxlen` entradas: um atraso maior que
+    isso nos workers descarta os payloads mais antigos.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        key: Optional[str] = None,
+        group: Optional[str] = None,
+        maxlen: Optional[int] = None,
+        claim_idle: Optional[int] = None
+    ):
+        self._redis = redis_client
+        self.key = key or settings.WEBHOOK_STREAM_KEY
+        self.group = group or settings.WEBHOOK_STREAM_GROUP
+        self.maxlen = maxlen or settings.WEBHOOK_STREAM_MAXLEN
+        self.claim_idle = claim_idle if claim_idle is not None else settings.WEBHOOK_STREAM_CLAIM_IDLE
+
+    @property
+    def redis(self):
+        return self._redis or cache.redis_client
+
+    def append(self, platform: str, body: bytes) -> str:
+        """Grava o payload no stream; erros do Redis sobem para o chamador"""
+        entry_id = self.redis.xadd(
+            self.key,
+            {"platform": platform, "body": body},
+            maxlen=self.maxlen,
+            approximate=True
+        )
+        return _decode(entry_id)
+
+    def ensure_group(self) -> None:
+        """Cria o consumer group (e o stream) se ainda não existirem"""
+        try:
+            self.redis.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read(self, consumer: str, count: int, block_ms: Optional[int] = None) -> List[StreamEntry]:
+        """
+        Próximo lote do consumidor
+
+        Entradas abandonadas por outros workers têm prioridade sobre as novas.
+        Entradas removidas do stream antes do ack voltam com campos vazios.
+        """
+        claimed = self.redis.xautoclaim(
+            self.key,
+            self.group,
+            consumer,
+            min_idle_time=self.claim_idle * 1000,
+            start_id="0-0",
+            count=count
+        )
+        entries = claimed[1]
+        if entries:
+            logger.warning(f"Reassumindo {len(entries)} webhooks sem confirmação em {self.key}")
+        else:
+            response = self.redis.xreadgroup(self.group, consumer, {self.key: ">"}, count=count, block=block_ms)
+            entries = response[0][1] if response else []
+
+        return [
+            (_decode(entry_id), {_decode(name): value for name, value in (fields or {}).items()})
+            for entry_id, fields in entries
+        ]
+
+    def ack(self, entry_ids: List[str]) -> None:
+        if entry_ids:
+            self.redis.xack(self.key, self.group, *entry_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamanho do stream e entradas lidas ainda sem confirmação"""
+        try:
+            length = self.redis.xlen(self.key)
+            pending = self.redis.xpending(self.key, self.group)["pending"]
+        except ResponseError:
+            pending = 0  # consumer group ainda não criado
+        except RedisError as e:
+            logger.error(f"Erro ao ler estatísticas do stream {self.key}: {str(e)}")
+            return {}
+        return {"key": self.key, "length": length, "pending": pending}
+
+webhook_stream = WebhookStream()
@@ -1,9 +1,21 @@
+import logging
 from celery import Celery
 from datetime import timedelta
+from redis.exceptions import RedisError
 from app.core.config import settings
+from app.core.graph_api import GraphBatchError
+from app.db import crud
+from app.db.database import SessionLocal
 from app.services.facebook_service import FacebookService
+from app.services import polling_service
+from app.services.instagram_service import InstagramService
+from app.utils.api_cache import cache
+from app.utils.collection_schedule import collection_scheduler
+from app.utils.debounce import refresh_debouncer
 from scripts.refresh_tokens import TokenRefresher
 
+logger = logging.getLogger(__name__)
+
 app = Celery('tasks', broker=settings.CELERY_BROKER_URL)
 
 # Configuração de agendamento
@@ -13,6 +25,25 @@ app.conf.beat_schedule = {
         'schedule': timedelta(days=1),
         'options': {'queue': 'maintenance'}
     },
+    'flush-debounced-refreshes': {
+        'task': 'app.workers.tasks.flush_refreshes',
+        'schedule': timedelta(seconds=settings.REFRESH_DEBOUNCE_FLUSH_INTERVAL),
+    },
+    'sync-collection-schedule': {
+        'task': 'app.workers.tasks.sync_collection_schedule',
+        'schedule': timedelta(seconds=settings.COLLECT_SYNC_SECONDS),
+        'options': {'queue': 'maintenance'}
+    },
+    # Uma rodada da roda de tempo; os shards são drenados em tarefas separadas
+    'collection-tick': {
+        'task': 'app.workers.tasks.collection_tick',
+        'schedule': timedelta(seconds=settings.COLLECT_TICK_SECONDS),
+    },
+    'adapt-collection-intervals': {
+        'task': 'app.workers.tasks.adapt_collection_intervals',
+        'schedule': timedelta(seconds=settings.ADAPTIVE_UPDATE_SECONDS),
+        'options': {'queue': 'maintenance'}
+    },
 }
 
 @app.task(bind=True, max_retries=3)
@@ -24,22 +55,125 @@ def refresh_tokens(self):
     except Exception as e:
         self.retry(exc=e, countdown=300)
 
-@app.task
-def process_facebook_event(event_type: str, event_data: dict, page_id: str):
+def _schedule_refresh(platform: str, account_ids: list):
+    """Atualização das contas pelo debounce; sem Redis, imediata"""
+    try:
+        refresh_debouncer.touch(platform, account_ids)
+    except RedisError as e:
+        logger.error(f"Debounce indisponível; atualizando {platform} agora: {str(e)}")
+        refresh_accounts.delay(platform, account_ids)
+
+    # Atividade recente: coleta periódica no intervalo mínimo por um tempo
+    if settings.ADAPTIVE_POLLING:
+        try:
+            polling_service.boost(platform, account_ids)
+        except RedisError as e:
+            logger.error(f"Erro ao reforçar a coleta de {platform}: {str(e)}")
+
+def _handle_facebook_event(fb_service: FacebookService, event_type: str, event_data: dict, page_id: str):
+    if event_type == "feed":
+        # Novos posts/comentários: uma coleta da página por janela de debounce
+        _schedule_refresh("facebook", [page_id])
+    elif event_type == "mention":
+        # Processar menções
+        fb_service.process_mention(event_data, page_id)
+    elif event_type == "messages":
+        # Processar mensagens
+        fb_service.process_message(event_data, page_id)
+
+@app.task(bind=True, max_retries=3)
+def process_facebook_event(self, event_type: str, event_data: dict, page_id: str):
     """Processa eventos do Facebook de forma assíncrona"""
     fb_service = FacebookService()
     
     try:
-        if event_type == "feed":
-            # Processar novos posts/comentários
-            fb_service.process_feed_event(event_data, page_id)
-        elif event_type == "mention":
-            # Processar menções
-            fb_service.process_mention(event_data, page_id)
-        elif event_type == "messages":
-            # Processar mensagens
-            fb_service.process_message(event_data, page_id)
-            
+        _handle_facebook_event(fb_service, event_type, event_data, page_id)
     except Exception as e:
         # TODO: Implementar retry e logging
-        raise self.retry(exc=e, countdown=60)
\ No newline at end of file
+        raise self.retry(exc=e, countdown=60)
+
+@app.task
+def process_facebook_events(events: list):
+    """
+    Processa um lote de eventos do Facebook vindo do stream de webhooks
+
+    Um evento que falha é reenfileirado sozinho em process_facebook_event,
+    com as retentativas dela, sem repetir os demais do lote.
+    """
+    fb_service = FacebookService()
+
+    # Mudanças de feed do lote inteiro agendam uma atualização por página
+    feed_pages = [event["page_id"] for event in events if event["event_type"] == "feed"]
+    if feed_pages:
+        _schedule_refresh("facebook", feed_pages)
+
+    for event in events:
+        if event["event_type"] == "feed":
+            continue
+        try:
+            _handle_facebook_event(fb_service, **event)
+        except Exception:
+            process_facebook_event.delay(**event)
+
+# Coletor em lote de cada plataforma atualizada por webhooks
+REFRESH_COLLECTORS = {
+    "facebook": lambda account_ids: FacebookService().get_facebook_metrics_many(account_ids),
+    "instagram": lambda account_ids: InstagramService().get_instagram_metrics_many(account_ids),
+}
+
+@app.task(bind=True, max_retries=3)
+def refresh_accounts(self, platform: str, account_ids: list):
+    """Coleta as métricas das contas em uma chamada batch e guarda a mais recente no cache"""
+    try:
+        results = REFRESH_COLLECTORS[platform](account_ids)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60)
+
+    for account_id, result in results.items():
+        if isinstance(result, GraphBatchError):
+            logger.warning(f"Falha ao atualizar {platform}:{account_id}: {str(result)}")
+            continue
+        cache.set(f"metrics:latest:{platform}:{account_id}", result.model_dump(mode="json"))
+
+@app.task
+def flush_refreshes():
+    """Enfileira as atualizações cujo debounce venceu"""
+    refresh_debouncer.flush(lambda platform, account_ids: refresh_accounts.delay(platform, account_ids))
+
+@app.task
+def sync_collection_schedule():
+    """Alinha a agenda de coleta às contas acompanhadas no banco"""
+    db = SessionLocal()
+    try:
+        accounts = [
+            (platform, account_id)
+            for platform, account_id in crud.get_tracked_accounts(db)
+            if platform in REFRESH_COLLECTORS
+        ]
+    finally:
+        db.close()
+    collection_scheduler.sync(accounts)
+
+@app.task
+def collection_tick():
+    for shard in range(collection_scheduler.shards):
+        collect_shard.delay(shard)
+
+@app.task
+def collect_shard(shard: int):
+    """Enfileira as coletas devidas do shard, em lotes por plataforma"""
+    collection_scheduler.dispatch_due(
+        shard,
+        lambda platform, account_ids: refresh_accounts.delay(platform, account_ids)
+    )
+
+@app.task
+def adapt_collection_intervals():
+    """Ajusta o intervalo de coleta de cada conta à variação do histórico"""
+    if not settings.ADAPTIVE_POLLING:
+        return
+    db = SessionLocal()
+    try:
+        polling_service.adapt_intervals(db)
+    finally:
+        db.close()
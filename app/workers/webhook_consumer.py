@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import socket
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.utils.dedup import get_deduplicator, webhook_event_id
+from app.utils.webhook_stream import WebhookStream, webhook_stream
+
+logger = logging.getLogger(__name__)
+
+def extract_events(platform: str, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Eventos a processar de um payload de webhook (mudanças de páginas do Facebook)"""
+    if platform != "facebook" or payload.get("object") != "page":
+        return []
+    return [
+        {
+            "event_type": change.get("field"),
+            "event_data": change.get("value"),
+            "page_id": entry.get("id")
+        }
+        for entry in payload.get("entry", [])
+        for change in entry.get("changes", [])
+    ]
+
+def enqueue_deduplicated(
+    platform: str,
+    events: List[Dict[str, Any]],
+    enqueue: Callable[[List[Dict[str, Any]]], None]
+) -> int:
+    """
+    Enfileira só os eventos ainda não vistos (reentregas da plataforma)
+
+    Os eventos são registrados como vistos depois de enfileirados; se o
+    enfileiramento falhar, a nova tentativa não os descarta. Retorna
+    quantos foram enfileirados.
+    """
+    if not settings.WEBHOOK_DEDUP or not events:
+        enqueue(events)
+        return len(events)
+
+    deduplicator = get_deduplicator(f"webhooks:{platform}")
+    key = partial(webhook_event_id, platform)
+    events = deduplicator.filter(events, key=key)
+    enqueue(events)
+    deduplicator.mark_seen([key(event) for event in events])
+    return len(events)
+
+def _enqueue_facebook_events(events: List[Dict[str, Any]]) -> None:
+    from app.workers.tasks import process_facebook_events
+    process_facebook_events.delay(events)
+
+class WebhookConsumer:
+    """
+    Worker do consumer group do stream de webhooks
+
+    Cada lote lido do stream, sem as reentregas já vistas, vira poucas
+    tarefas Celery com até `fanout_batch` eventos cada, em vez de uma por
+    mudança. As entradas só
+    são confirmadas depois de enfileiradas; se o broker falhar no meio do
+    lote, o lote inteiro é reassumido mais tarde (eventos podem se repetir).
+    Payloads que não são JSON válido são descartados.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[WebhookStream] = None,
+        consumer: Optional[str] = None,
+        dispatch: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        batch_size: Optional[int] = None,
+        fanout_batch: Optional[int] = None,
+        block_ms: Optional[int] = None
+    ):
+        self.stream = stream or webhook_stream
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.dispatch = dispatch or _enqueue_facebook_events
+        self.batch_size = batch_size or settings.WEBHOOK_STREAM_BATCH
+        self.fanout_batch = fanout_batch or settings.WEBHOOK_FANOUT_BATCH
+        self.block_ms = block_ms if block_ms is not None else settings.WEBHOOK_STREAM_BLOCK_MS
+
+    def process_batch(self) -> int:
+        """Lê, distribui e confirma um lote; retorna quantas entradas foram lidas"""
+        entries = self.stream.read(self.consumer, self.batch_size, self.block_ms)
+
+        events: Dict[str, List[Dict[str, Any]]] = {}
+        for entry_id, fields in entries:
+            try:
+                platform = fields["platform"]
+                if isinstance(platform, bytes):
+                    platform = platform.decode()
+                events.setdefault(platform, []).extend(extract_events(platform, json.loads(fields["body"])))
+            except (KeyError, ValueError, AttributeError) as e:
+                logger.error(f"Webhook {entry_id} descartado: {str(e)}")
+
+        for platform, platform_events in events.items():
+            enqueue_deduplicated(platform, platform_events, self._fan_out)
+
+        self.stream.ack([entry_id for entry_id, _ in entries])
+        return len(entries)
+
+    def _fan_out(self, events: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(events), self.fanout_batch):
+            self.dispatch(events[start:start + self.fanout_batch])
+
+    def run(self) -> None:
+        self.stream.ensure_group()
+        logger.info(f"Consumidor {self.consumer} lendo {self.stream.key}")
+        while True:
+            try:
+                self.process_batch()
+            except Exception as e:
+                logger.error(f"Erro ao processar lote de webhooks: {str(e)}")
+                time.sleep(1)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    WebhookConsumer().run()
@@ -0,0 +1,116 @@
+import sys
+import argparse
+import logging
+import pickle
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from app.schemas.social import SocialMediaResponse
+from app.utils.cache_codec import CacheCodec, available_compression, available_serializer
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def facebook_insights_payload(days: int = 30) -> dict:
+    """Resposta típica de /{page-id}/insights com valores diários"""
+    start = datetime(2025, 5, 1)
+    metrics = ["page_impressions", "page_engaged_users", "page_fans", "page_views_total"]
+    return {
+        "data": [
+            {
+                "name": metric,
+                "period": "day",
+                "title": metric.replace("_", " ").title(),
+                "description": f"Daily: {metric}",
+                "values": [
+                    {
+                        "value": random.randint(0, 50000),
+                        "end_time": (start + timedelta(days=day)).strftime("%Y-%m-%dT%H:%M:%S+0000")
+                    }
+                    for day in range(days)
+                ],
+                "id": f"1234567890/insights/{metric}/day"
+            }
+            for metric in metrics
+        ],
+        "paging": {"previous": "https://graph.facebook.com/...", "next": "https://graph.facebook.com/..."}
+    }
+
+def twitter_timeline_payload(tweets: int = 100) -> dict:
+    """Resposta típica de /users/{id}/tweets com public_metrics"""
+    return {
+        "data": [
+            {
+                "id": str(1790000000000000000 + index),
+                "text": f"Post {index}: lorem ipsum dolor sit amet, consectetur adipiscing elit #metrics {random.random()}",
+                "created_at": f"2025-05-{1 + index % 28:02d}T12:00:00.000Z",
+                "public_metrics": {
+                    "retweet_count": random.randint(0, 500),
+                    "reply_count": random.randint(0, 100),
+                    "like_count": random.randint(0, 5000),
+                    "quote_count": random.randint(0, 50),
+                    "impression_count": random.randint(0, 100000)
+                }
+            }
+            for index in range(tweets)
+        ],
+        "meta": {"result_count": tweets, "next_token": "7140dibdnow9c7btw3z2vwioavpvutgzrzm9icis4ndix"}
+    }
+
+def social_response_payload() -> SocialMediaResponse:
+    """SocialMediaResponse com raw_data, como gravado pelos serviços"""
+    raw = facebook_insights_payload()
+    return SocialMediaResponse(
+        id="1234567890",
+        platform="facebook",
+        account_id="1234567890",
+        timestamp=datetime(2025, 5, 31, 12, 0),
+        metrics={"impressions": 120000, "engagement": 0.034, "followers": 45210},
+        raw_data=raw
+    )
+
+def build_payloads() -> dict:
+    random.seed(42)
+    return {
+        "token": {"access_token": "EAAB" + "x" * 180, "token_type": "bearer", "expires_in": 3600},
+        "facebook_insights": facebook_insights_payload(),
+        "twitter_timeline": twitter_timeline_payload(),
+        "social_response": social_response_payload(),
+    }
+
+def measure(encode, decode, value, number: int):
+    encoded = encode(value)
+    encode_us = timeit.timeit(lambda: encode(value), number=number) / number * 1e6
+    decode_us = timeit.timeit(lambda: decode(encoded), number=number) / number * 1e6
+    return len(encoded), encode_us, decode_us
+
+def run(number: int) -> None:
+    codecs = {"pickle": (pickle.dumps, pickle.loads)}
+    for serializer in sorted({available_serializer(name) for name in ("orjson", "msgpack", "json")}):
+        for compression in sorted({"none", available_compression("auto"), "zlib"}):
+            codec = CacheCodec(
+                serializer=serializer,
+                compression=compression,
+                compression_threshold=0 if compression != "none" else 1024
+            )
+            codecs[f"{serializer}+{compression}"] = (codec.encode, codec.decode)
+
+    print(f"{'payload':<20} {'codec':<20} {'bytes':>9} {'encode µs':>11} {'decode µs':>11}")
+    for payload_name, value in build_payloads().items():
+        for codec_name, (encode, decode) in codecs.items():
+            size, encode_us, decode_us = measure(encode, decode, value, number)
+            print(f"{payload_name:<20} {codec_name:<20} {size:>9} {encode_us:>11.1f} {decode_us:>11.1f}")
+        print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara codecs do cache de respostas")
+    parser.add_argument("--number", type=int, default=500, help="Repetições por medição")
+    args = parser.parse_args()
+
+    try:
+        run(args.number)
+    except Exception as e:
+        logger.error(f"❌ Erro no benchmark: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,40 @@
+import sys
+import argparse
+import logging
+from datetime import datetime
+
+from app.db.database import SessionLocal
+from app.services.rollup_service import rebuild_rollups
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Reconstrói os rollups de métricas a partir da tabela metrics"
+    )
+    parser.add_argument("--start", type=datetime.fromisoformat,
+                        help="Início do período (ISO 8601); padrão: primeira métrica")
+    parser.add_argument("--end", type=datetime.fromisoformat,
+                        help="Fim do período (ISO 8601); padrão: última métrica")
+    return parser.parse_args()
+
+def backfill(start=None, end=None):
+    session = SessionLocal()
+    try:
+        logger.info("Iniciando backfill dos rollups...")
+        processed = rebuild_rollups(session, start, end)
+        logger.info(f"✅ Backfill concluído: {processed} métricas processadas")
+        return True
+    except Exception as e:
+        session.rollback()
+        logger.error(f"❌ Erro no backfill dos rollups: {str(e)}")
+        return False
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    args = parse_args()
+    success = backfill(args.start, args.end)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,225 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.utils.api_cache import APICache, _freshness
+from app.utils.cache_codec import CacheCodec
+from app.utils.local_cache import LRUCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def _fake_server():
+    server = fakeredis.FakeServer()
+    # Cria o db 0 antes das threads de invalidação: o FakeServer cria dbs sob demanda sem lock
+    fakeredis.FakeRedis(server=server).ping()
+    return server
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize=2, ttl=60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        assert lru.get("b") is None
+        assert lru.get("a") == 1
+        assert lru.stats()["evictions"] == 1
+
+    def test_entries_expire(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("app.utils.local_cache.time.monotonic", lambda: now[0])
+        lru = LRUCache(maxsize=10, ttl=5)
+        lru.set("a", 1)
+        lru.set("b", 2, ttl=60)  # limitado ao TTL da instância
+
+        now[0] += 6
+
+        assert lru.get("a") is None
+        assert lru.get("b") is None
+        assert lru.stats()["expirations"] == 2
+
+class TestTwoTierCache:
+    @pytest.fixture
+    def server(self):
+        return _fake_server()
+
+    def _make_cache(self, server):
+        api_cache = APICache(
+            codec=CacheCodec(serializer="json"),
+            local_cache=LRUCache(maxsize=100, ttl=60)
+        )
+        api_cache.redis_client = fakeredis.FakeRedis(server=server)
+        api_cache._local_enabled()
+        assert _wait_for(api_cache._subscribed.is_set)
+        return api_cache
+
+    def test_hot_key_served_from_local_tier(self, server):
+        api_cache = self._make_cache(server)
+        api_cache.set("twitter_oauth_token", {"access_token": "abc"})
+
+        for _ in range(3):
+            assert api_cache.get("twitter_oauth_token") == {"access_token": "abc"}
+
+        stats = api_cache.stats()
+        assert stats["l1"]["hits"] == 3
+        assert stats["redis"]["hits"] == 0
+
+    def test_writes_invalidate_other_processes(self, server):
+        first = self._make_cache(server)
+        second = self._make_cache(server)
+
+        first.set("tiktok_access_token", "v1")
+        assert second.get("tiktok_access_token") == "v1"
+        assert second.stats()["redis"]["hits"] == 1
+
+        first.set("tiktok_access_token", "v2")
+        assert _wait_for(lambda: second.invalidations_received >= 2)
+        assert second.get("tiktok_access_token") == "v2"
+
+        first.delete("tiktok_access_token")
+        assert _wait_for(lambda: second.invalidations_received >= 3)
+        assert second.get("tiktok_access_token") is None
+
+    def test_local_copy_never_outlives_redis_ttl(self, server, monkeypatch):
+        writer = self._make_cache(server)
+        reader = self._make_cache(server)
+        writer.set("instagram_metrics", {"followers": 10}, timeout=2, local=False)
+
+        now = [time.monotonic()]
+        monkeypatch.setattr("app.utils.local_cache.time.monotonic", lambda: now[0])
+        assert reader.get("instagram_metrics") == {"followers": 10}
+
+        # A L1 tem TTL de 60s, mas a chave no Redis expira em 2s
+        now[0] += 2.5
+        assert reader.local.get("instagram_metrics") is None
+
+    def test_local_false_bypasses_local_tier(self, server):
+        api_cache = self._make_cache(server)
+        api_cache.set("rate_limit:FACEBOOK:call", {"count": 1}, local=False)
+
+        assert api_cache.get("rate_limit:FACEBOOK:call", local=False) == {"count": 1}
+        assert api_cache.stats()["l1"]["size"] == 0
+
+    def test_cached_decorator_uses_both_tiers(self, server):
+        api_cache = self._make_cache(server)
+        calls = []
+
+        @api_cache.cached(timeout=60)
+        def fetch(value):
+            calls.append(value)
+            return value * 2
+
+        assert fetch(2) == 4
+        assert fetch(2) == 4
+        assert calls == [2]
+        assert api_cache.stats()["l1"]["hits"] == 1
+
+class TestStampedeProtection:
+    @pytest.fixture
+    def server(self):
+        return _fake_server()
+
+    def _make_cache(self, server):
+        api_cache = APICache(codec=CacheCodec(serializer="json"), local_cache=None)
+        api_cache.redis_client = fakeredis.FakeRedis(server=server)
+        return api_cache
+
+    def test_single_flight_across_threads_and_instances(self, server):
+        caches = [self._make_cache(server), self._make_cache(server)]
+        calls = []
+
+        def platform_call(account_id):
+            calls.append(account_id)
+            time.sleep(0.2)
+            return {"followers": 10}
+
+        decorated = [api_cache.cached(timeout=60)(platform_call) for api_cache in caches]
+        results = []
+        threads = [
+            threading.Thread(target=lambda fn=decorated[i % 2]: results.append(fn("123")))
+            for i in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == ["123"]
+        assert results == [{"followers": 10}] * 10
+
+    def test_stale_while_revalidate(self, server):
+        api_cache = self._make_cache(server)
+        calls = []
+
+        @api_cache.cached(timeout=1, stale_ttl=60, xfetch_beta=0)
+        def platform_call():
+            calls.append(1)
+            return len(calls)
+
+        assert platform_call() == 1
+        time.sleep(1.1)
+
+        # Valor vencido é servido enquanto uma única revalidação roda em segundo plano
+        assert platform_call() == 1
+        assert _wait_for(lambda: platform_call() == 2)
+        assert len(calls) == 2
+
+    def test_xfetch_refreshes_early_near_expiry(self, monkeypatch):
+        now = time.time()
+        monkeypatch.setattr("app.utils.api_cache.random.random", lambda: 0.99)
+
+        assert _freshness(now + 1000, delta=0.5, stale_ttl=0, beta=1.0) == "fresh"
+        assert _freshness(now + 1, delta=0.5, stale_ttl=0, beta=1.0) == "refresh"
+        assert _freshness(now + 1, delta=0.5, stale_ttl=0, beta=0) == "fresh"
+        assert _freshness(now - 1, delta=0.5, stale_ttl=0, beta=1.0) == "expired"
+
+    @pytest.mark.asyncio
+    async def test_async_single_flight(self, server):
+        api_cache = self._make_cache(server)
+        calls = []
+
+        @api_cache.cached(timeout=60)
+        async def platform_call(account_id):
+            calls.append(account_id)
+            await asyncio.sleep(0.1)
+            return {"reach": 5}
+
+        results = await asyncio.gather(*(platform_call("abc") for _ in range(10)))
+
+        assert calls == ["abc"]
+        assert results == [{"reach": 5}] * 10
+        assert await platform_call("abc") == {"reach": 5}
+        assert calls == ["abc"]
+
+    @pytest.mark.asyncio
+    async def test_async_paths_do_not_block_the_event_loop(self, server, monkeypatch):
+        api_cache = self._make_cache(server)
+        loop_thread = threading.get_ident()
+        redis_threads = []
+
+        for name in ("get", "set", "pipeline", "register_script"):
+            original = getattr(api_cache.redis_client, name)
+
+            def tracked(*args, _original=original, **kwargs):
+                redis_threads.append(threading.get_ident())
+                return _original(*args, **kwargs)
+            monkeypatch.setattr(api_cache.redis_client, name, tracked)
+
+        @api_cache.cached(timeout=60, namespace="instagram")
+        async def platform_call(account_id):
+            return {"reach": 5}
+
+        assert await platform_call("abc") == {"reach": 5}
+        assert await platform_call("abc") == {"reach": 5}
+
+        assert redis_threads
+        assert loop_thread not in redis_threads
@@ -0,0 +1,97 @@
+import pickle
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from app.schemas.metric import PlatformMetrics
+from app.utils.api_cache import APICache
+from app.utils.cache_codec import MAGIC, CacheCodec, CodecError
+from app.utils.local_cache import LRUCache
+
+class TestCacheCodec:
+    @pytest.fixture
+    def codec(self):
+        return CacheCodec(serializer="json", compression="zlib", compression_threshold=256)
+
+    def test_roundtrip_preserves_types(self, codec):
+        value = {
+            "token": "abc",
+            "count": 3,
+            "expires_at": datetime(2025, 5, 12, 10, 30),
+            "amount": Decimal("10.50"),
+            "items": [1, 2.5, None, {"nested": True}]
+        }
+
+        encoded = codec.encode(value)
+
+        assert encoded.startswith(MAGIC)
+        assert codec.decode(encoded) == value
+
+    def test_roundtrip_pydantic_model(self, codec):
+        metrics = PlatformMetrics(engagement_rate=0.5, reach=100, impressions=200)
+
+        decoded = codec.decode(codec.encode({"facebook": metrics}))
+
+        assert decoded == {"facebook": metrics}
+        assert isinstance(decoded["facebook"], PlatformMetrics)
+
+    def test_compression_only_above_threshold(self, codec):
+        small = codec.encode({"token": "abc"})
+        large_value = {"data": [{"name": "page_impressions", "value": i} for i in range(200)]}
+        large = codec.encode(large_value)
+
+        assert small[5] == 0  # byte de compressão no cabeçalho
+        assert large[5] != 0
+        assert len(large) < len(CacheCodec(serializer="json", compression="none").encode(large_value))
+        assert codec.decode(large) == large_value
+
+    def test_reads_entries_written_with_other_settings(self, codec):
+        other = CacheCodec(serializer="json", compression="none")
+
+        assert codec.decode(other.encode([1, 2, 3])) == [1, 2, 3]
+
+    def test_legacy_pickle_fallback(self, codec):
+        legacy = pickle.dumps({"count": 1})
+
+        assert codec.decode(legacy) == {"count": 1}
+
+        strict = CacheCodec(serializer="json", legacy_pickle=False)
+        with pytest.raises(CodecError):
+            strict.decode(legacy)
+
+    def test_schema_version_mismatch(self, codec):
+        newer = CacheCodec(serializer="json", schema_version=2)
+
+        with pytest.raises(CodecError):
+            newer.decode(codec.encode({"count": 1}))
+
+    def test_unsupported_type(self, codec):
+        with pytest.raises(TypeError):
+            codec.encode({"value": object()})
+
+class TestAPICacheCodec:
+    @pytest.fixture
+    def api_cache(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        api_cache = APICache(codec=CacheCodec(serializer="json"), local_cache=LRUCache())
+        api_cache.redis_client = fakeredis.FakeRedis()
+        return api_cache
+
+    def test_set_and_get(self, api_cache):
+        assert api_cache.set("twitter_oauth_token", {"access_token": "abc"}) is True
+        assert api_cache.redis_client.get("twitter_oauth_token").startswith(MAGIC)
+        assert api_cache.get("twitter_oauth_token") == {"access_token": "abc"}
+
+    def test_get_legacy_pickle_entry(self, api_cache):
+        api_cache.redis_client.set("tiktok_access_token", pickle.dumps("legacy-token"))
+
+        assert api_cache.get("tiktok_access_token") == "legacy-token"
+
+    def test_unreadable_entry_is_a_miss(self, api_cache):
+        api_cache.redis_client.set(
+            "key", CacheCodec(serializer="json", schema_version=99).encode(1)
+        )
+
+        assert api_cache.get("key") is None
+
+    def test_set_unserializable_value(self, api_cache):
+        assert api_cache.set("key", object()) is False
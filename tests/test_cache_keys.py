@@ -0,0 +1,165 @@
+import pytest
+from dataclasses import dataclass
+from datetime import datetime
+from app.utils.api_cache import APICache
+from app.utils.cache_codec import CacheCodec
+from app.utils.cache_keys import MAX_KEY_LENGTH, CacheKeyBuilder, UnstableKeyError, stable_hash
+from app.utils.local_cache import LRUCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def _fake_server():
+    server = fakeredis.FakeServer()
+    # Cria o db 0 antes das threads de invalidação: o FakeServer cria dbs sob demanda sem lock
+    fakeredis.FakeRedis(server=server).ping()
+    return server
+
+def get_metrics(account_id, date_from=None, fields=("reach",), **options):
+    pass
+
+class TestCacheKeyBuilder:
+    def test_positional_keyword_and_defaults_are_equivalent(self):
+        build_key = CacheKeyBuilder(get_metrics)
+
+        assert build_key("123") == build_key(account_id="123")
+        assert build_key("123") == build_key("123", None, ("reach",))
+        assert build_key("123", a=1, b=2) == build_key("123", b=2, a=1)
+        assert build_key("123") != build_key("456")
+
+    def test_key_is_stable_and_readable(self):
+        build_key = CacheKeyBuilder(get_metrics, key_prefix="cache_")
+        key = build_key("123", date_from=datetime(2025, 5, 1))
+
+        assert key == f"cache_{get_metrics.__module__}.get_metrics:" + stable_hash({
+            "account_id": "123", "date_from": "2025-05-01T00:00:00", "fields": ["reach"]
+        })
+
+    def test_stable_hash_ignores_ordering(self):
+        assert stable_hash({"a": 1, "b": {2, 3}}) == stable_hash({"b": {3, 2}, "a": 1})
+
+    def test_ignored_arguments(self):
+        def handler(self, db, account_id):
+            pass
+
+        build_key = CacheKeyBuilder(handler)
+
+        assert build_key(object(), object(), "123") == build_key(object(), object(), "123")
+
+    def test_unstable_arguments_are_rejected(self):
+        build_key = CacheKeyBuilder(get_metrics)
+
+        with pytest.raises(UnstableKeyError):
+            build_key(object())
+
+    def test_dataclasses_and_custom_repr_have_stable_keys(self):
+        @dataclass
+        class Period:
+            days: int
+
+        class Account:
+            def __init__(self, account_id):
+                self.account_id = account_id
+
+            def __repr__(self):
+                return f"Account({self.account_id!r})"
+
+        build_key = CacheKeyBuilder(get_metrics)
+
+        assert build_key(Period(7)) == build_key(Period(7))
+        assert build_key(Period(7)) != build_key(Period(30))
+        assert build_key(Account("1")) == build_key(Account("1"))
+        assert build_key(Account("1")) != build_key(Account("2"))
+
+    def test_template_and_length_bound(self):
+        build_key = CacheKeyBuilder(get_metrics, key_prefix="", template="metrics:{account_id}")
+
+        assert build_key("123") == "metrics:123"
+        assert len(build_key("x" * 500)) == MAX_KEY_LENGTH
+        assert build_key("x" * 500) != build_key("x" * 499 + "y")
+
+def make_service_class(api_cache):
+    """Mesma classe de serviço carregada em processos (caches) diferentes"""
+    class TwitterLikeService:
+        def __init__(self):
+            self.calls = 0
+
+        @api_cache.cached(timeout=60, namespace="twitter")
+        def get_user_metrics(self, username):
+            self.calls += 1
+            return {"username": username, "followers": 42}
+
+    return TwitterLikeService
+
+class TestCachedAcrossInstances:
+    @pytest.fixture
+    def server(self):
+        return _fake_server()
+
+    def _make_cache(self, server):
+        api_cache = APICache(codec=CacheCodec(serializer="json"), local_cache=LRUCache())
+        api_cache.redis_client = fakeredis.FakeRedis(server=server)
+        return api_cache
+
+    def test_hits_across_service_instances_and_workers(self, server):
+        worker_a = make_service_class(self._make_cache(server))
+        worker_b = make_service_class(self._make_cache(server))
+        first, second, third = worker_a(), worker_a(), worker_b()
+
+        assert first.get_user_metrics("jack") == {"username": "jack", "followers": 42}
+        assert second.get_user_metrics(username="jack")["followers"] == 42
+        assert third.get_user_metrics("jack")["followers"] == 42
+
+        assert (first.calls, second.calls, third.calls) == (1, 0, 0)
+
+    def test_method_with_unstable_argument_runs_without_cache(self, server, caplog):
+        api_cache = self._make_cache(server)
+
+        class InstagramLikeService:
+            def __init__(self):
+                self.calls = 0
+
+            @api_cache.cached(timeout=60)
+            def get_media(self, client):
+                self.calls += 1
+                return {"media": 3}
+
+        service = InstagramLikeService()
+        assert service.get_media(object()) == {"media": 3}
+        assert service.get_media(object()) == {"media": 3}
+
+        assert service.calls == 2
+        assert sum("sem cache" in record.message for record in caplog.records) == 1
+
+    def test_namespace_version_is_cached_without_l1(self, server, monkeypatch):
+        api_cache = self._make_cache(server)
+        api_cache.local = None
+        service = make_service_class(api_cache)()
+        version_reads = []
+        original_get = api_cache.redis_client.get
+
+        def tracked_get(key):
+            if key.startswith("cache_ns:"):
+                version_reads.append(key)
+            return original_get(key)
+        monkeypatch.setattr(api_cache.redis_client, "get", tracked_get)
+
+        for _ in range(5):
+            service.get_user_metrics("jack")
+        assert len(version_reads) == 1
+
+        # A invalidação local descarta a versão guardada
+        api_cache.invalidate_namespace("twitter")
+        service.get_user_metrics("jack")
+        assert service.calls == 2
+
+    def test_namespace_version_invalidates_in_bulk(self, server):
+        api_cache = self._make_cache(server)
+        service = make_service_class(api_cache)()
+
+        service.get_user_metrics("jack")
+        service.get_user_metrics("jack")
+        assert service.calls == 1
+
+        assert api_cache.invalidate_namespace("twitter") == 1
+        service.get_user_metrics("jack")
+        assert service.calls == 2
@@ -0,0 +1,151 @@
+import time
+import pytest
+import requests
+from unittest.mock import Mock, patch
+from redis.exceptions import RedisError
+from app.core.social_api import SocialAPI
+from app.utils.circuit_breaker import CircuitOpenError, CircuitState, DistributedCircuitBreaker
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def _breaker(server, name="test", **kwargs):
+    options = {
+        "failure_rate": 0.5, "min_calls": 4, "window": 10,
+        "open_seconds": 0.1, "half_open_probes": 2, "local_ttl": 0
+    }
+    options.update(kwargs)
+    return DistributedCircuitBreaker(name, redis_client=fakeredis.FakeRedis(server=server), **options)
+
+def _fail(breaker):
+    with pytest.raises(RuntimeError):
+        with breaker.call():
+            raise RuntimeError("boom")
+
+def _succeed(breaker):
+    with breaker.call():
+        pass
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+class TestDistributedCircuitBreaker:
+    def test_trips_for_every_worker(self, server):
+        worker_a, worker_b = _breaker(server), _breaker(server)
+
+        _succeed(worker_a)
+        _fail(worker_b)
+        _succeed(worker_b)
+        _fail(worker_a)
+
+        assert worker_b.stats()["state"] == CircuitState.OPEN.value
+        with pytest.raises(CircuitOpenError) as exc_info:
+            _succeed(worker_b)
+        assert 0 < exc_info.value.retry_after <= 0.1
+
+    def test_stays_closed_below_min_calls_or_rate(self, server):
+        breaker = _breaker(server)
+
+        _fail(breaker)
+        _fail(breaker)
+        _fail(breaker)
+        assert breaker.stats()["state"] == CircuitState.CLOSED.value
+        breaker.redis.delete(*breaker.keys)
+
+        for _ in range(4):
+            _succeed(breaker)
+        for _ in range(3):
+            _fail(breaker)
+        stats = breaker.stats()
+        assert stats["state"] == CircuitState.CLOSED.value
+        assert stats["calls"] == 7 and stats["failures"] == 3
+
+    def test_ignored_errors_do_not_count(self, server):
+        breaker = _breaker(server)
+
+        for _ in range(5):
+            with pytest.raises(ValueError):
+                with breaker.call(is_failure=lambda exc: not isinstance(exc, ValueError)):
+                    raise ValueError("4xx")
+
+        assert breaker.stats()["calls"] == 0
+
+    def test_half_open_lets_probes_through_and_closes(self, server):
+        worker_a, worker_b = _breaker(server), _breaker(server)
+        for _ in range(4):
+            _fail(worker_a)
+        time.sleep(0.15)
+
+        probe_a = worker_a.call().__enter__()
+        probe_b = worker_b.call().__enter__()
+        assert probe_a.probe and probe_b.probe
+        # Vagas de sonda esgotadas: as demais chamadas seguem recusadas
+        with pytest.raises(CircuitOpenError):
+            _succeed(worker_a)
+
+        probe_a.__exit__(None, None, None)
+        assert worker_a.stats()["state"] == CircuitState.HALF_OPEN.value
+        probe_b.__exit__(None, None, None)
+
+        stats = worker_a.stats()
+        assert stats["state"] == CircuitState.CLOSED.value
+        assert stats["calls"] == 0
+        _succeed(worker_b)
+
+    def test_probe_failure_reopens(self, server):
+        breaker = _breaker(server)
+        for _ in range(4):
+            _fail(breaker)
+        time.sleep(0.15)
+
+        _fail(breaker)
+
+        assert breaker.stats()["state"] == CircuitState.OPEN.value
+        with pytest.raises(CircuitOpenError):
+            _succeed(breaker)
+
+    def test_fails_open_without_redis(self):
+        redis_client = Mock()
+        redis_client.register_script.return_value = Mock(side_effect=RedisError("down"))
+        breaker = DistributedCircuitBreaker("test", min_calls=1, redis_client=redis_client)
+
+        _fail(breaker)
+        _succeed(breaker)
+
+class TestSocialAPIIntegration:
+    @pytest.fixture
+    def api(self, server):
+        api = SocialAPI("test")
+        api.base_url = "http://test.com"
+        api.session = Mock()
+        api.circuit_breaker = _breaker(server, min_calls=3, open_seconds=30)
+        return api
+
+    def _response(self, status):
+        response = requests.Response()
+        response.status_code = status
+        return response
+
+    def test_server_errors_open_the_circuit(self, api):
+        api.session.request.return_value = self._response(503)
+
+        with patch("app.utils.retry.time.sleep"):
+            with pytest.raises(requests.exceptions.HTTPError):
+                api._make_request("GET", "/test")
+
+        # Três falhas abrem o circuito; a próxima chamada nem sai
+        assert api.session.request.call_count == 3
+        with pytest.raises(CircuitOpenError):
+            api._make_request("GET", "/test")
+        assert api.session.request.call_count == 3
+
+    def test_client_errors_do_not_count(self, api):
+        api.session.request.return_value = self._response(404)
+
+        with patch("app.utils.retry.time.sleep"):
+            for _ in range(3):
+                with pytest.raises(requests.exceptions.HTTPError):
+                    api._make_request("GET", "/test")
+
+        assert api.circuit_breaker.stats()["state"] == CircuitState.CLOSED.value
+        assert api.circuit_breaker.stats()["calls"] == 0
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+from app.core.social_api import SocialAPI
+from app.utils.coalescing import RequestCoalescer, request_key
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def api():
+    api = SocialAPI("coalesce-test")
+    api.base_url = "http://test.com"
+    api.session = Mock()
+    return api
+
+def _slow_response(payload, delay=0.1):
+    def request(**kwargs):
+        time.sleep(delay)
+        return Mock(headers={}, json=Mock(return_value=dict(payload)))
+    return request
+
+def test_request_key_ignores_param_order_and_separates_credentials():
+    key = request_key("get", "http://test.com/1", {"a": 1, "b": 2}, "token")
+
+    assert key == request_key("GET", "http://test.com/1", {"b": 2, "a": 1}, "token")
+    assert key != request_key("GET", "http://test.com/1", {"a": 1, "b": 2}, "other")
+
+def test_concurrent_identical_gets_share_one_call(api):
+    api.session.request.side_effect = _slow_response({"fans": 10})
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(
+            lambda _: api._make_request("GET", "/page-1", params={"access_token": "t"}), range(5)
+        ))
+
+    assert api.session.request.call_count == 1
+    assert results == [{"fans": 10}] * 5
+    # Cada chamador recebe a própria cópia
+    assert len({id(result) for result in results}) == 5
+
+def test_different_credentials_and_writes_are_not_shared(api):
+    api.session.request.side_effect = _slow_response({"ok": True})
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda call: call(), [
+            lambda: api._make_request("GET", "/page-1", params={"access_token": "a"}),
+            lambda: api._make_request("GET", "/page-1", params={"access_token": "b"}),
+            lambda: api._make_request("POST", "/page-1", data={"x": 1}),
+            lambda: api._make_request("POST", "/page-1", data={"x": 1}),
+        ]))
+
+    assert api.session.request.call_count == 4
+
+def test_followers_receive_the_leader_error():
+    coalescer = RequestCoalescer(distributed=False)
+    started = threading.Event()
+
+    def leader_call():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("json inválido")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(coalescer.run, "key", leader_call)
+        started.wait()
+        follower = executor.submit(coalescer.run, "key", Mock())
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert coalescer.coalesced == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_async_gets_share_one_call(api):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"fans": 10})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch("app.core.social_api.get_async_client", return_value=client):
+        results = await asyncio.gather(*[
+            api._make_request_async("GET", "/page-1", params={"access_token": "t"}) for _ in range(5)
+        ])
+    await client.aclose()
+
+    assert len(calls) == 1
+    assert results == [{"fans": 10}] * 5
+
+def test_result_is_shared_across_processes():
+    server = fakeredis.FakeServer()
+    process_a = RequestCoalescer(redis_client=fakeredis.FakeRedis(server=server), distributed=True)
+    process_b = RequestCoalescer(redis_client=fakeredis.FakeRedis(server=server), distributed=True)
+    upstream = Mock(return_value={"fans": 10})
+    started = threading.Event()
+
+    def slow_call():
+        started.set()
+        time.sleep(0.2)
+        return upstream()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(process_a.run, "key", slow_call)
+        started.wait()
+        follower = executor.submit(process_b.run, "key", upstream)
+        assert leader.result() == follower.result() == {"fans": 10}
+
+    assert upstream.call_count == 1
+    assert process_b.coalesced == 1
+
+def test_followers_call_upstream_when_leader_process_fails():
+    server = fakeredis.FakeServer()
+    process_a = RequestCoalescer(redis_client=fakeredis.FakeRedis(server=server), distributed=True)
+    process_b = RequestCoalescer(redis_client=fakeredis.FakeRedis(server=server), distributed=True)
+    started = threading.Event()
+
+    def failing_call():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("timeout")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(process_a.run, "key", failing_call)
+        started.wait()
+        follower = executor.submit(process_b.run, "key", Mock(return_value={"ok": True}))
+        with pytest.raises(RuntimeError):
+            leader.result()
+        assert follower.result() == {"ok": True}
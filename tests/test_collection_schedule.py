@@ -0,0 +1,77 @@
+import time
+import pytest
+from unittest.mock import Mock
+from app.utils.collection_schedule import CollectionScheduler
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def scheduler():
+    return CollectionScheduler(redis_client=fakeredis.FakeRedis(), shards=4, tick=0.01)
+
+def _due_times(scheduler):
+    return {
+        member.decode(): score / 1000
+        for shard in range(scheduler.shards)
+        for member, score in scheduler.redis.zrange(scheduler.shard_key(shard), 0, -1, withscores=True)
+    }
+
+def test_accounts_are_spread_across_interval_and_shards(scheduler, monkeypatch):
+    monkeypatch.setattr("app.utils.collection_schedule.settings.COLLECT_INTERVALS", {"facebook": 600.0})
+    now = time.time()
+    scheduler.sync([("facebook", f"page-{n}") for n in range(2000)])
+
+    due = _due_times(scheduler)
+    assert len(due) == 2000
+    assert all(now < at <= now + 601 for at in due.values())
+
+    # Nenhum minuto concentra mais que o dobro da média (200 por minuto)
+    per_minute = [0] * 10
+    for at in due.values():
+        per_minute[min(int((at - now) / 60), 9)] += 1
+    assert max(per_minute) < 400
+
+    sizes = scheduler.stats()["shards"]
+    assert sum(sizes) == 2000
+    assert min(sizes) > 400
+
+def test_sync_removes_untracked_accounts_and_keeps_phase(scheduler):
+    scheduler.sync([("facebook", "a"), ("instagram", "b")])
+    first = _due_times(scheduler)
+
+    assert scheduler.sync([("facebook", "a")]) == {"added": 0, "removed": 1}
+    assert _due_times(scheduler) == {"facebook:a": first["facebook:a"]}
+
+def test_due_accounts_are_dispatched_in_chunks_and_rescheduled(scheduler, monkeypatch):
+    monkeypatch.setattr("app.utils.collection_schedule.settings.COLLECT_INTERVALS", {"facebook": 0.2, "instagram": 0.2})
+    scheduler.sync([("facebook", f"page-{n}") for n in range(7)] + [("instagram", "ig-1")])
+    before = _due_times(scheduler)
+    time.sleep(0.25)
+
+    dispatch = Mock()
+    started = time.time()
+    total = sum(scheduler.dispatch_due(shard, dispatch, chunk_size=3) for shard in range(scheduler.shards))
+    assert total == 8
+    assert all(len(call.args[1]) <= 3 for call in dispatch.call_args_list)
+    assert {call.args[0] for call in dispatch.call_args_list} == {"facebook", "instagram"}
+
+    # Reagendadas na mesma fase, pulando os intervalos já perdidos
+    for member, at in _due_times(scheduler).items():
+        steps = (at - before[member]) / 0.2
+        assert at > started - 0.01
+        assert steps == pytest.approx(round(steps))
+
+def test_per_account_interval(scheduler, monkeypatch):
+    monkeypatch.setattr("app.utils.collection_schedule.settings.COLLECT_INTERVALS", {"facebook": 600.0})
+    scheduler.sync([("facebook", "slow"), ("facebook", "fast")])
+    scheduler.set_interval("facebook", "fast", 0.1)
+    # Contas fora da agenda não são incluídas
+    scheduler.set_interval("facebook", "unknown", 0.1)
+    time.sleep(0.15)
+
+    due = []
+    for shard in range(scheduler.shards):
+        due.extend(scheduler.pop_due(shard, 10))
+    assert due == [("facebook", "fast")]
+    assert "facebook:unknown" not in _due_times(scheduler)
+    assert scheduler.redis.hget(scheduler.intervals_key, "facebook:unknown") is None
@@ -0,0 +1,63 @@
+import time
+import pytest
+from unittest.mock import Mock
+from redis.exceptions import RedisError
+from app.utils.debounce import RefreshDebouncer
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+def test_burst_becomes_one_refresh_after_quiet_window(redis_client):
+    debouncer = RefreshDebouncer(redis_client=redis_client, window=0.2, max_delay=5)
+    for _ in range(20):
+        debouncer.touch("facebook", ["page-1", "page-1"])
+    debouncer.touch("instagram", ["ig-1"])
+
+    assert debouncer.stats()["pending"] == 2
+    assert debouncer.pop_due(10) == []
+
+    time.sleep(0.25)
+    assert sorted(debouncer.pop_due(10)) == [("facebook", "page-1"), ("instagram", "ig-1")]
+    # Retirada atômica: outro worker não recebe as mesmas contas
+    assert debouncer.pop_due(10) == []
+
+def test_continuous_events_respect_max_delay(redis_client):
+    debouncer = RefreshDebouncer(redis_client=redis_client, window=0.2, max_delay=0.3)
+    start = time.monotonic()
+    due = []
+    while not due and time.monotonic() - start < 2:
+        debouncer.touch("facebook", ["page-1"])
+        time.sleep(0.05)
+        due = debouncer.pop_due(10)
+
+    assert due == [("facebook", "page-1")]
+    assert time.monotonic() - start < 0.5
+
+def test_flush_groups_by_platform_and_reschedules_failures(redis_client):
+    debouncer = RefreshDebouncer(redis_client=redis_client, window=0, max_delay=0)
+    debouncer.touch("facebook", [f"page-{n}" for n in range(5)])
+    debouncer.touch("instagram", ["ig-1"])
+    time.sleep(0.01)
+
+    dispatch = Mock()
+    assert debouncer.flush(dispatch, batch_size=3) == 6
+    batches = [(call.args[0], len(call.args[1])) for call in dispatch.call_args_list]
+    assert all(size <= 3 for _, size in batches)
+    assert sum(size for platform, size in batches if platform == "facebook") == 5
+
+    debouncer.touch("facebook", ["page-1"])
+    time.sleep(0.01)
+    assert debouncer.flush(Mock(side_effect=ConnectionError)) == 0
+    # A conta volta ao debounce para a próxima rodada
+    assert debouncer.stats()["pending"] == 1
+
+def test_flush_without_redis_dispatches_nothing():
+    redis_client = Mock()
+    redis_client.register_script.return_value = Mock(side_effect=RedisError("down"))
+    dispatch = Mock()
+
+    assert RefreshDebouncer(redis_client=redis_client).flush(dispatch) == 0
+    dispatch.assert_not_called()
@@ -0,0 +1,64 @@
+import pytest
+from unittest.mock import Mock
+from redis.exceptions import RedisError
+from app.utils.dedup import EventDeduplicator, webhook_event_id
+from app.workers.webhook_consumer import enqueue_deduplicated
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+@pytest.fixture
+def deduplicator(redis_client):
+    return EventDeduplicator("test", redis_client=redis_client, window=3600, exact_ttl=60, capacity=1000, error_rate=0.01)
+
+def test_event_id_is_stable_for_redelivered_payloads():
+    event = {"event_type": "feed", "event_data": {"post_id": "1_2", "verb": "add"}, "page_id": "1"}
+    redelivered = {"page_id": "1", "event_data": {"verb": "add", "post_id": "1_2"}, "event_type": "feed"}
+    assert webhook_event_id("facebook", event) == webhook_event_id("facebook", redelivered)
+    assert webhook_event_id("facebook", event) != webhook_event_id("instagram", event)
+
+def test_duplicates_are_detected_only_after_mark_seen(deduplicator):
+    assert deduplicator.filter(["a", "b", "a"], key=str) == ["a", "b"]
+    # Sem mark_seen (enfileiramento falhou) a reentrega passa de novo
+    assert deduplicator.filter(["a", "b"], key=str) == ["a", "b"]
+
+    deduplicator.mark_seen(["a", "b"])
+    assert deduplicator.filter(["a", "c"], key=str) == ["c"]
+
+    stats = deduplicator.stats()
+    assert stats["checked"] == 6
+    assert stats["exact_duplicates"] == 1
+    assert stats["duplicate_rate"] == pytest.approx(1 / 6)
+
+def test_bloom_filter_remembers_after_exact_key_expires(deduplicator, redis_client):
+    deduplicator.mark_seen(["a"])
+    redis_client.delete("dedup:seen:test:a")
+
+    assert deduplicator.duplicates(["a", "z"]) == [True, False]
+    assert deduplicator.stats()["bloom_duplicates"] == 1
+
+def test_redis_failure_lets_events_through():
+    redis_client = Mock()
+    redis_client.register_script.return_value = Mock(side_effect=RedisError("down"))
+    deduplicator = EventDeduplicator("test", redis_client=redis_client)
+
+    assert deduplicator.filter(["a"], key=str) == ["a"]
+    deduplicator.mark_seen(["a"])
+
+def test_enqueue_deduplicated_drops_redeliveries(deduplicator, monkeypatch):
+    monkeypatch.setattr("app.workers.webhook_consumer.get_deduplicator", lambda name: deduplicator)
+    events = [{"event_type": "feed", "event_data": {"n": n}, "page_id": "1"} for n in range(3)]
+    enqueue = Mock()
+
+    assert enqueue_deduplicated("facebook", events, enqueue) == 3
+    assert enqueue_deduplicated("facebook", events[1:] + [{"event_type": "feed", "event_data": {"n": 9}, "page_id": "1"}], enqueue) == 1
+    assert [len(call.args[0]) for call in enqueue.call_args_list] == [3, 1]
+
+    # Falha ao enfileirar: os eventos não são registrados como vistos
+    new_event = {"event_type": "feed", "event_data": {"n": 10}, "page_id": "1"}
+    with pytest.raises(ConnectionError):
+        enqueue_deduplicated("facebook", [new_event], Mock(side_effect=ConnectionError))
+    assert enqueue_deduplicated("facebook", [new_event], enqueue) == 1
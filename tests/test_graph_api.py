@@ -0,0 +1,90 @@
+import json
+import httpx
+import pytest
+from unittest.mock import Mock, patch
+from app.core.graph_api import GRAPH_BATCH_LIMIT, GraphBatchError
+from app.schemas.social import SocialMediaResponse
+from app.services.facebook_service import FacebookService
+from app.services.instagram_service import InstagramService
+
+def _batch_response(batch):
+    """Resposta da Graph API: página "bad" falha, "slow" não é processada"""
+    items = []
+    for item in batch:
+        page_id = item["relative_url"].split("?", 1)[0]
+        if page_id == "bad":
+            items.append({"code": 400, "body": json.dumps({"error": {"message": "Página inexistente"}})})
+        elif page_id == "slow":
+            items.append(None)
+        else:
+            items.append({"code": 200, "body": json.dumps({"fan_count": 1, "followers_count": len(page_id)})})
+    return items
+
+@pytest.fixture
+def facebook_service():
+    service = FacebookService()
+    service.session = Mock()
+    service.session.request.side_effect = lambda **kwargs: Mock(
+        headers={}, json=Mock(return_value=_batch_response(kwargs["json"]["batch"]))
+    )
+    return service
+
+def test_pages_are_grouped_in_batches_of_50(facebook_service):
+    page_ids = [f"page{index}" for index in range(GRAPH_BATCH_LIMIT * 2 + 20)]
+    costs = []
+    original_slot = facebook_service._quota_slot
+
+    def quota_slot(key, credential, tenant=None, max_wait=None, cost=1):
+        costs.append(cost)
+        return original_slot(key, credential, tenant, max_wait, cost)
+
+    with patch.object(facebook_service, "_quota_slot", side_effect=quota_slot), \
+         patch("app.core.social_api.get_scheduler") as get_scheduler:
+        results = facebook_service.get_facebook_metrics_many(page_ids)
+
+    calls = facebook_service.session.request.call_args_list
+    assert [len(call.kwargs["json"]["batch"]) for call in calls] == [50, 50, 20]
+    assert calls[0].kwargs["method"] == "POST"
+    assert calls[0].kwargs["params"] == {"access_token": facebook_service.access_token}
+    assert calls[0].kwargs["json"]["batch"][0]["relative_url"].startswith("page0?fields=")
+    # Cada item do batch consome uma vaga da cota da plataforma
+    assert costs == [50, 50, 20]
+    assert get_scheduler.return_value.slot.return_value.__enter__.call_count == len(page_ids)
+
+    assert list(results) == page_ids
+    assert all(isinstance(result, SocialMediaResponse) for result in results.values())
+    assert results["page7"].metrics["followers_count"] == 5
+
+def test_item_errors_do_not_fail_the_batch(facebook_service):
+    results = facebook_service.get_facebook_metrics_many(["ok", "bad", "slow", "ok"])
+
+    assert facebook_service.session.request.call_count == 1
+    assert isinstance(results["ok"], SocialMediaResponse)
+    assert isinstance(results["bad"], GraphBatchError)
+    assert results["bad"].code == 400
+    assert "Página inexistente" in str(results["bad"])
+    assert isinstance(results["slow"], GraphBatchError)
+    assert results["slow"].code is None
+
+@pytest.mark.asyncio
+async def test_instagram_batch_async():
+    service = InstagramService()
+    seen = []
+
+    def handler(request):
+        payload = json.loads(request.content)
+        seen.append(request)
+        return httpx.Response(200, json=[
+            {"code": 200, "body": json.dumps({"followers_count": 10, "media": {"data": []}})}
+            for _ in payload["batch"]
+        ])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch("app.core.social_api.get_async_client", return_value=client), \
+         patch.object(service, "_quota_slot", return_value=service.rate_limiter):
+        results = await service.get_instagram_metrics_many_async(["ig-1", "ig-2"])
+    await client.aclose()
+
+    assert len(seen) == 1
+    assert seen[0].headers["Authorization"].startswith("Basic ")
+    assert results["ig-2"].metrics["followers"] == 10
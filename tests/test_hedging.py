@@ -0,0 +1,95 @@
+import asyncio
+import time
+import httpx
+import pytest
+from unittest.mock import patch
+from app.core.social_api import SocialAPI
+from app.utils.hedging import LatencyTracker, _hedge_budgets, get_hedge_budget, latency_tracker
+from app.utils.rate_limiter import RateLimitExceeded
+from app.utils.retry import RetryBudget
+
+@pytest.fixture
+def api():
+    api = SocialAPI("hedge-test")
+    api.base_url = "http://test.com"
+    latency_tracker.clear()
+    for _ in range(latency_tracker.min_samples):
+        latency_tracker.record("hedge-test:items/{id}", 0.01)
+    _hedge_budgets["hedge-test"] = RetryBudget(ratio=0.05, min_retries=1, window=10)
+    yield api
+    latency_tracker.clear()
+
+def _client(delays):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(delays[len(calls) - 1])
+        return httpx.Response(200, json={"call": len(calls)})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+def test_latency_percentile():
+    tracker = LatencyTracker(sample_size=100, percentile=0.9, min_samples=10)
+    for value in range(9):
+        tracker.record("key", value / 100)
+    assert tracker.percentile("key") is None
+
+    for value in range(9, 100):
+        tracker.record("key", value / 100)
+    assert tracker.percentile("key") == pytest.approx(0.9)
+
+@pytest.mark.asyncio
+async def test_slow_get_is_hedged_and_first_answer_wins(api):
+    client, calls = _client([1.0, 0.0])
+
+    started = time.monotonic()
+    with patch("app.core.social_api.get_async_client", return_value=client):
+        result = await api._make_request_async("GET", "/items/1", hedge=True)
+    await client.aclose()
+
+    assert result == {"call": 2}
+    assert len(calls) == 2
+    assert time.monotonic() - started < 0.5
+
+@pytest.mark.asyncio
+async def test_fast_calls_and_writes_are_not_hedged(api):
+    client, calls = _client([0.0, 1.0, 0.0])
+
+    with patch("app.core.social_api.get_async_client", return_value=client):
+        await api._make_request_async("GET", "/items/1", hedge=True)
+        await api._make_request_async("POST", "/items/1", hedge=True)
+    await client.aclose()
+
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_hedge_respects_ratio_cap(api):
+    budget = get_hedge_budget("hedge-test")
+    budget.ratio, budget.min_retries = 0.0, 0
+    client, calls = _client([0.2, 0.0])
+
+    with patch("app.core.social_api.get_async_client", return_value=client):
+        result = await api._make_request_async("GET", "/items/1", hedge=True)
+    await client.aclose()
+
+    assert result == {"call": 1}
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_hedge_without_quota_waits_for_original(api):
+    client, calls = _client([0.2])
+    original_slot = api._quota_slot
+
+    def quota_slot(key, credential, tenant=None, max_wait=None, cost=1):
+        if max_wait == 0:
+            raise RateLimitExceeded("rate_limit:hedge-test", 1.0)
+        return original_slot(key, credential, tenant, max_wait, cost)
+
+    with patch("app.core.social_api.get_async_client", return_value=client), \
+         patch.object(api, "_quota_slot", side_effect=quota_slot):
+        result = await api._make_request_async("GET", "/items/1", hedge=True)
+    await client.aclose()
+
+    assert result == {"call": 1}
+    assert len(calls) == 1
@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.db.models import Metric
+from app.db.aggregations import aggregate_metrics
+from app.services.metric_service import calculate_metrics
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    rows = [
+        (1, 1, "followers", 10, datetime(2025, 5, 12, 10, 5)),
+        (1, 1, "followers", 20, datetime(2025, 5, 12, 10, 45)),
+        (1, 1, "followers", 30, datetime(2025, 5, 12, 11, 15)),
+        (1, 2, "likes", 5, datetime(2025, 5, 13, 9, 0)),
+        (2, 2, "likes", 15, datetime(2025, 5, 19, 9, 0)),
+    ]
+    for user_id, platform_id, name, value, collected_at in rows:
+        session.add(Metric(
+            user_id=user_id,
+            platform_id=platform_id,
+            metric_name=name,
+            value=value,
+            collected_at=collected_at
+        ))
+    session.commit()
+
+    yield session
+    session.close()
+
+def test_aggregate_without_grouping(db):
+    result = aggregate_metrics(db, stats=("count", "sum", "avg", "min", "max"))
+
+    assert result == [{
+        "count": 5, "sum": 80.0, "avg": 16.0, "min": 5.0, "max": 30.0
+    }]
+
+def test_aggregate_group_by_metric_name(db):
+    result = aggregate_metrics(db, group_by=["metric_name"], stats=("count", "sum"))
+
+    assert result == [
+        {"metric_name": "followers", "count": 3, "sum": 60.0},
+        {"metric_name": "likes", "count": 2, "sum": 20.0},
+    ]
+
+def test_aggregate_time_buckets(db):
+    hourly = aggregate_metrics(
+        db, metric_name="followers", bucket="hour", stats=("count", "max")
+    )
+    assert [(r["bucket"], r["count"], r["max"]) for r in hourly] == [
+        (datetime(2025, 5, 12, 10), 2, 20.0),
+        (datetime(2025, 5, 12, 11), 1, 30.0),
+    ]
+
+    # Semanas começam na segunda-feira (12/05 e 19/05 de 2025)
+    weekly = aggregate_metrics(db, bucket="week", stats=("count",))
+    assert [(r["bucket"], r["count"]) for r in weekly] == [
+        (datetime(2025, 5, 12), 4),
+        (datetime(2025, 5, 19), 1),
+    ]
+
+def test_aggregate_stddev_and_percentiles_on_sqlite(db):
+    result = aggregate_metrics(
+        db, metric_name="followers", stats=("stddev", "p95")
+    )
+
+    assert result[0]["stddev"] == pytest.approx(10.0)
+    # SQLite não possui percentile_cont
+    assert result[0]["p95"] is None
+
+def test_aggregate_rejects_unknown_fields(db):
+    with pytest.raises(ValueError):
+        aggregate_metrics(db, group_by=["value"])
+    with pytest.raises(ValueError):
+        aggregate_metrics(db, stats=("median",))
+
+def test_calculate_metrics_uses_sql_aggregation(db):
+    result = calculate_metrics(
+        db,
+        start_date=datetime(2025, 5, 12),
+        end_date=datetime(2025, 5, 13, 23, 59),
+    )
+
+    assert result == {
+        "total": 4, "sum": 65.0, "average": 16.25, "min": 5.0, "max": 30.0
+    }
+
+def test_calculate_metrics_empty_period(db):
+    result = calculate_metrics(
+        db, start_date=datetime(2024, 1, 1), end_date=datetime(2024, 1, 2)
+    )
+
+    assert result == {"total": 0, "sum": 0, "average": 0, "min": 0, "max": 0}
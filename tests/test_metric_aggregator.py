@@ -1,71 +1,180 @@
+import asyncio
+import httpx
 import pytest
-from datetime import datetime, timedelta
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi import HTTPException
 from app.services.metric_aggregator import MetricAggregator
 from app.schemas.metric import SocialMetrics
+from app.schemas.social import WhatsAppMetrics
+
+ACCOUNTS = {"facebook": "page-1", "instagram": "ig-1", "twitter": "tw-1"}
 
 @pytest.fixture
-def aggregator():
-    return MetricAggregator()
+def services():
+    return {
+        "facebook": MagicMock(get_facebook_metrics_async=AsyncMock()),
+        "instagram": MagicMock(get_instagram_metrics_async=AsyncMock()),
+        "twitter": MagicMock(get_twitter_metrics_async=AsyncMock()),
+        "whatsapp": MagicMock(get_whatsapp_metrics=AsyncMock())
+    }
+
+@pytest.fixture
+def aggregator(services):
+    return MetricAggregator(services=services)
 
 @pytest.mark.asyncio
-async def test_get_all_metrics_success(aggregator):
+async def test_get_all_metrics_success(aggregator, services):
     mock_data = {
-        "engagement": 0.5,
+        "engagement_rate": 0.5,
         "reach": 1000,
         "impressions": 1500,
         "interactions": 500
     }
-    
-    with patch("app.services.facebook_service.FacebookService.get_metrics",
-               new_callable=AsyncMock) as mock_fb, \
-         patch("app.services.instagram_service.InstagramService.get_metrics",
-               new_callable=AsyncMock) as mock_ig, \
-         patch("app.services.twitter_service.TwitterService.get_metrics",
-               new_callable=AsyncMock) as mock_tw, \
-         patch("app.services.whatsapp_service.WhatsAppService.get_whatsapp_metrics",
-               new_callable=AsyncMock) as mock_wa:
-        
-        mock_fb.return_value = mock_data
-        mock_ig.return_value = mock_data
-        mock_tw.return_value = mock_data
-        mock_wa.return_value = {"messages_sent": 100, "messages_received": 150}
-        
-        result = await aggregator.get_all_metrics()
-        assert isinstance(result, SocialMetrics)
-        assert "facebook" in result.platforms
-        assert "whatsapp" in result.platforms
+    services["facebook"].get_facebook_metrics_async.return_value = mock_data
+    services["instagram"].get_instagram_metrics_async.return_value = mock_data
+    services["twitter"].get_twitter_metrics_async.return_value = mock_data
+    services["whatsapp"].get_whatsapp_metrics.return_value = WhatsAppMetrics(
+        messages_sent=100, messages_received=150
+    )
+
+    result = await aggregator.get_all_metrics(accounts=ACCOUNTS)
+    assert isinstance(result, SocialMetrics)
+    assert "facebook" in result.platforms
+    assert result.platforms["whatsapp"]["messages_sent"] == 100
+    services["facebook"].get_facebook_metrics_async.assert_awaited_once_with("page-1")
+    services["whatsapp"].get_whatsapp_metrics.assert_awaited_once()
 
 @pytest.mark.asyncio
-async def test_get_all_metrics_with_platform_filter(aggregator):
-    mock_data = {"engagement": 0.5, "reach": 1000}
-    
-    with patch("app.services.facebook_service.FacebookService.get_metrics",
-               new_callable=AsyncMock) as mock_fb:
-        mock_fb.return_value = mock_data
-        
-        result = await aggregator.get_all_metrics(platforms=["facebook"])
-        assert list(result.platforms.keys()) == ["facebook"]
+async def test_get_all_metrics_with_platform_filter(aggregator, services):
+    services["facebook"].get_facebook_metrics_async.return_value = {"engagement_rate": 0.5, "reach": 1000}
+
+    result = await aggregator.get_all_metrics(platforms=["facebook"], accounts=ACCOUNTS)
+    assert list(result.platforms.keys()) == ["facebook"]
 
 @pytest.mark.asyncio
-async def test_normalization_logic(aggregator):
-    mock_data = {"engagement_rate": 0.5, "reach": 1000}
-    
-    with patch("app.services.facebook_service.FacebookService.get_metrics",
-               new_callable=AsyncMock) as mock_fb:
-        mock_fb.return_value = mock_data
-        
-        result = await aggregator.get_all_metrics(platforms=["facebook"])
-        assert "engagement" in result.platforms["facebook"]
-        assert result.platforms["facebook"]["engagement"] == 0.5
+async def test_normalization_logic(aggregator, services):
+    services["facebook"].get_facebook_metrics_async.return_value = {"engagement_rate": 0.5, "reach": 1000}
+
+    result = await aggregator.get_all_metrics(platforms=["facebook"], accounts=ACCOUNTS)
+    assert "engagement" in result.platforms["facebook"]
+    assert result.platforms["facebook"]["engagement"] == 0.5
 
 @pytest.mark.asyncio
-async def test_service_failure_handling(aggregator):
-    with patch("app.services.facebook_service.FacebookService.get_metrics",
-               new_callable=AsyncMock) as mock_fb:
-        mock_fb.side_effect = Exception("API Error")
-        
-        with pytest.raises(HTTPException) as exc_info:
-            await aggregator.get_all_metrics(platforms=["facebook"])
-        assert exc_info.value.status_code == 500
\ No newline at end of file
+async def test_service_failure_handling(aggregator, services):
+    services["facebook"].get_facebook_metrics_async.side_effect = Exception("API Error")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await aggregator.get_all_metrics(platforms=["facebook"], accounts=ACCOUNTS)
+    assert exc_info.value.status_code == 500
+
+@pytest.mark.asyncio
+async def test_partial_results_with_platform_status(aggregator, services):
+    services["facebook"].get_facebook_metrics_async.return_value = {"engagement_rate": 0.5, "reach": 1000}
+    services["instagram"].get_instagram_metrics_async.side_effect = Exception("API Error")
+
+    result = await aggregator.get_all_metrics(platforms=["facebook", "instagram"], accounts=ACCOUNTS)
+
+    assert list(result.platforms.keys()) == ["facebook"]
+    assert result.status["facebook"].status == "ok"
+    assert result.status["instagram"].status == "error"
+    assert "API Error" in result.status["instagram"].error
+
+@pytest.mark.asyncio
+async def test_missing_account_is_reported(aggregator, services):
+    services["twitter"].get_twitter_metrics_async.return_value = {"reach": 10}
+
+    result = await aggregator.get_all_metrics(platforms=["facebook", "twitter"], accounts={"twitter": "tw-1"})
+
+    assert result.status["facebook"].status == "error"
+    assert "não informada" in result.status["facebook"].error
+    services["facebook"].get_facebook_metrics_async.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_slow_platform_times_out_without_blocking_others(aggregator, services):
+    cancelled = asyncio.Event()
+
+    async def slow_metrics(account_id):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    services["facebook"].get_facebook_metrics_async = slow_metrics
+    services["instagram"].get_instagram_metrics_async.return_value = {"reach": 10}
+
+    result = await aggregator.get_all_metrics(
+        platforms=["facebook", "instagram"],
+        timeout=0.05,
+        accounts=ACCOUNTS
+    )
+
+    assert result.status["facebook"].status == "timeout"
+    assert result.platforms["instagram"]["reach"] == 10
+    # A chamada lenta é cancelada, não fica presa em segundo plano
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_zero_timeout_is_not_replaced_by_default(aggregator, services):
+    services["facebook"].get_facebook_metrics_async.return_value = {"reach": 10}
+
+    with pytest.raises(HTTPException) as exc_info:
+        await aggregator.get_all_metrics(platforms=["facebook"], timeout=0, accounts=ACCOUNTS)
+
+    assert "Tempo limite de 0s" in exc_info.value.detail
+
+@pytest.mark.asyncio
+async def test_real_services_with_mocked_http(monkeypatch):
+    from app.services.facebook_service import FacebookService
+    from app.services.instagram_service import InstagramService
+    from app.services.twitter_service import TwitterService
+    from app.services.whatsapp_service import WhatsAppService
+
+    monkeypatch.setattr(TwitterService, "_setup_oauth", lambda self: setattr(
+        self, "oauth", MagicMock(token={"access_token": "tw-token"})
+    ))
+
+    def handler(request):
+        path = request.url.path
+        if path.endswith("/page-1"):
+            return httpx.Response(200, json={"fan_count": 10, "followers_count": 200})
+        if path.endswith("/ig-1"):
+            return httpx.Response(200, json={
+                "followers_count": 100,
+                "media": {"data": [{"id": "m1", "like_count": 7, "comments_count": 3}]}
+            })
+        if path.endswith("/users/tw-1"):
+            return httpx.Response(200, json={"data": {"public_metrics": {"followers_count": 50}}})
+        if path.endswith("/users/tw-1/tweets"):
+            return httpx.Response(200, json={"data": [{
+                "id": "t1", "text": "oi",
+                "public_metrics": {"like_count": 2, "retweet_count": 1, "reply_count": 2}
+            }]})
+        if path.endswith("/metrics"):
+            return httpx.Response(200, json={"messages_sent": 4, "messages_received": 6})
+        return httpx.Response(404)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    scheduler_slot = MagicMock()
+    scheduler_slot.__aenter__ = AsyncMock()
+    scheduler_slot.__aexit__ = AsyncMock(return_value=False)
+
+    with patch("app.core.social_api.get_async_client", return_value=client), \
+         patch("app.utils.api_utils.get_async_client", return_value=client), \
+         patch("app.core.social_api.SocialAPI._quota_slot", return_value=scheduler_slot), \
+         patch("app.core.social_api.budget_store"):
+        aggregator = MetricAggregator(services={
+            "facebook": FacebookService(),
+            "instagram": InstagramService(),
+            "twitter": TwitterService(),
+            "whatsapp": WhatsAppService()
+        })
+        result = await aggregator.get_all_metrics(accounts=ACCOUNTS)
+    await client.aclose()
+
+    assert {status.status for status in result.status.values()} == {"ok"}
+    assert result.platforms["facebook"]["reach"] == 200
+    assert result.platforms["instagram"]["interactions"] == 10
+    assert result.platforms["instagram"]["engagement"] == pytest.approx(0.1)
+    assert result.platforms["twitter"]["interactions"] == 5
+    assert result.platforms["whatsapp"]["messages_received"] == 6
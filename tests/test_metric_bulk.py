@@ -0,0 +1,84 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.db.models import Metric, Platform, User
+from app.services.metric_service import create_metrics_bulk
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Platform(id=1, name="facebook"))
+    session.add(User(id=1, username="test", email="test@test.com", hashed_password="x"))
+    session.commit()
+    yield session
+    session.close()
+
+def _row(value, minute=0, **overrides):
+    row = {
+        "user_id": 1,
+        "platform_id": 1,
+        "metric_name": "followers",
+        "value": value,
+        "collected_at": datetime(2025, 5, 12, 10, minute).isoformat()
+    }
+    row.update(overrides)
+    return row
+
+def test_bulk_insert_writes_all_valid_rows(db):
+    rows = [_row(value, minute=value) for value in range(50)]
+
+    result = create_metrics_bulk(db, rows, chunk_size=20)
+
+    assert result.received == 50
+    assert result.written == 50
+    assert result.skipped == 0
+    assert result.rejected == []
+    assert result.rows_per_second > 0
+    assert db.query(Metric).count() == 50
+
+def test_bulk_insert_reports_rejects_per_row(db):
+    rows = [
+        _row(10),
+        {"user_id": 1, "metric_name": "followers"},  # campos obrigatórios ausentes
+        _row(20),  # mesma chave do índice 0
+        _row(30, minute=1, user_id=99),
+        _row(40, minute=2, platform_id=99),
+    ]
+
+    result = create_metrics_bulk(db, rows)
+
+    assert result.written == 1
+    assert [reject.index for reject in result.rejected] == [1, 2, 3, 4]
+    assert "índice 0" in result.rejected[1].error
+    assert "Usuário 99" in result.rejected[2].error
+    assert "Plataforma 99" in result.rejected[3].error
+
+def test_bulk_dedup_compares_instants_in_utc(db):
+    rows = [
+        _row(10, collected_at="2025-05-12T10:00:00+00:00"),
+        _row(20, collected_at="2025-05-12T07:00:00-03:00"),  # mesmo instante
+        _row(30, collected_at="2025-05-12T10:00:00"),  # sem fuso: tratado como UTC
+    ]
+
+    result = create_metrics_bulk(db, rows)
+
+    assert result.written == 1
+    assert [reject.index for reject in result.rejected] == [1, 2]
+    assert all("índice 0" in reject.error for reject in result.rejected)
+
+def test_bulk_insert_conflicts(db):
+    create_metrics_bulk(db, [_row(10), _row(20, minute=1)])
+
+    ignored = create_metrics_bulk(db, [_row(99), _row(30, minute=2)])
+    assert ignored.written == 1
+    assert ignored.skipped == 1
+    assert db.query(Metric).filter(Metric.value == 99).count() == 0
+
+    updated = create_metrics_bulk(db, [_row(99)], on_conflict="update")
+    assert updated.written == 1
+    assert db.query(Metric).filter(Metric.value == 99).count() == 1
+    assert db.query(Metric).count() == 3
@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.db.models import Metric
+from app.services.metric_service import (
+    decode_cursor,
+    encode_cursor,
+    get_metrics_page,
+    iter_metrics_csv,
+    iter_metrics_ndjson,
+    stream_metrics
+)
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    # Pares de linhas com o mesmo collected_at para exercitar o desempate por id
+    for i in range(10):
+        session.add(Metric(
+            user_id=1,
+            platform_id=1,
+            metric_name="followers" if i % 2 == 0 else "likes",
+            value=i,
+            collected_at=datetime(2025, 5, 12, 10, i // 2)
+        ))
+    session.commit()
+
+    yield session
+    session.close()
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor(datetime(2025, 5, 12, 10, 30), 42)
+    assert decode_cursor(cursor) == (datetime(2025, 5, 12, 10, 30), 42)
+
+    with pytest.raises(ValueError):
+        decode_cursor("invalido")
+
+def test_keyset_pagination_visits_every_row_once(db):
+    seen = []
+    cursor = None
+    pages = 0
+
+    while True:
+        rows, cursor = get_metrics_page(db, limit=3, cursor=cursor)
+        seen.extend(row.id for row in rows)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 4
+    assert sorted(seen) == list(range(1, 11))
+    assert len(seen) == len(set(seen))
+    # Ordem decrescente por (collected_at, id)
+    assert seen == sorted(seen, reverse=True)
+
+def test_pagination_filters(db):
+    rows, cursor = get_metrics_page(
+        db,
+        limit=10,
+        metric_name="likes",
+        start_date=datetime(2025, 5, 12, 10, 2)
+    )
+
+    assert [row.value for row in rows] == [9, 7, 5]
+    assert cursor is None
+
+def test_stream_metrics_ndjson(db):
+    chunks = list(iter_metrics_ndjson(stream_metrics(db, batch_size=4)))
+    lines = "".join(chunks).splitlines()
+
+    # Linhas agrupadas em pedaços, não um write por métrica
+    assert len(chunks) == 1
+    assert len(lines) == 10
+    first = json.loads(lines[0])
+    assert first["id"] == 10
+    assert first["collected_at"] == "2025-05-12T10:04:00"
+
+def test_stream_metrics_csv(db):
+    content = "".join(iter_metrics_csv(stream_metrics(db, metric_name="followers")))
+    rows = list(csv.reader(io.StringIO(content)))
+
+    assert rows[0][:3] == ["id", "user_id", "platform_id"]
+    assert len(rows) == 6
+
+def test_stream_metrics_csv_chunks(db):
+    chunks = list(iter_metrics_csv(stream_metrics(db), chunk_size=200))
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+
+    assert len(rows) == 11
+    assert 1 < len(chunks) < 11
+    assert all(chunk.endswith("\r\n") for chunk in chunks)
+
+def test_stream_metrics_csv_empty(db):
+    content = "".join(iter_metrics_csv(stream_metrics(db, metric_name="unknown")))
+    assert content.strip() == "id,user_id,platform_id,metric_name,value,collected_at,created_at"
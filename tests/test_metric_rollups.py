@@ -0,0 +1,188 @@
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import Mock
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from app.db import crud
+from app.db.database import Base
+from app.db.models import Metric, MetricRollup, Platform, User
+from app.schemas.metric import MetricCreate
+from app.services import metric_service, rollup_service
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(metric_service.settings, "METRIC_ROLLUPS_ENABLED", True)
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Platform(id=1, name="facebook"), Platform(id=2, name="twitter")])
+    session.add_all([
+        User(id=1, username="a", email="a@test.com", hashed_password="x"),
+        User(id=2, username="b", email="b@test.com", hashed_password="x"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+def _row(value, collected_at, user_id=1, platform_id=1, metric_name="followers"):
+    return {
+        "user_id": user_id,
+        "platform_id": platform_id,
+        "metric_name": metric_name,
+        "value": value,
+        "collected_at": collected_at.isoformat()
+    }
+
+ROWS = [
+    _row(10, datetime(2025, 5, 12, 10, 5)),
+    _row(20, datetime(2025, 5, 12, 10, 45)),
+    _row(30, datetime(2025, 5, 12, 11, 15)),
+    _row(5, datetime(2025, 5, 13, 9, 0), platform_id=2, metric_name="likes"),
+    _row(15, datetime(2025, 5, 19, 9, 0), user_id=2, platform_id=2, metric_name="likes"),
+]
+
+def _rollup(db, granularity, bucket, metric_name="followers"):
+    return db.query(MetricRollup).filter_by(
+        granularity=granularity, bucket_start=bucket, metric_name=metric_name
+    ).one()
+
+def test_bucket_start_truncates_in_utc():
+    ts = datetime(2025, 5, 14, 13, 37, 12)
+
+    assert rollup_service.bucket_start(ts, "hour").hour == 13
+    assert rollup_service.bucket_start(ts, "day").day == 14
+    # Semanas começam na segunda-feira
+    assert rollup_service.bucket_start(ts, "week").day == 12
+    with pytest.raises(ValueError):
+        rollup_service.bucket_start(ts, "month")
+
+def test_bulk_insert_updates_rollups_incrementally(db):
+    metric_service.create_metrics_bulk(db, ROWS[:2])
+    metric_service.create_metrics_bulk(db, ROWS[2:])
+
+    hour = _rollup(db, "hour", datetime(2025, 5, 12, 10))
+    assert (hour.count, float(hour.sum_value)) == (2, 30.0)
+    assert (float(hour.min_value), float(hour.max_value), float(hour.last_value)) == (10.0, 20.0, 20.0)
+
+    week = _rollup(db, "week", datetime(2025, 5, 12))
+    assert (week.count, float(week.sum_value), float(week.last_value)) == (3, 60.0, 30.0)
+
+def test_create_metric_updates_rollups(db):
+    metric_service.create_metric(db, MetricCreate(**ROWS[0]))
+    metric_service.create_metric(db, MetricCreate(**ROWS[1]))
+
+    day = _rollup(db, "day", datetime(2025, 5, 12))
+    assert (day.count, float(day.sum_value)) == (2, 30.0)
+
+def test_bulk_conflicts_keep_rollups_consistent(db):
+    metric_service.create_metrics_bulk(db, ROWS[:3])
+
+    # Duplicata ignorada não conta duas vezes
+    metric_service.create_metrics_bulk(db, [ROWS[0]], on_conflict="ignore")
+    assert _rollup(db, "day", datetime(2025, 5, 12)).count == 3
+
+    # Valor sobrescrito recalcula a semana afetada
+    metric_service.create_metrics_bulk(
+        db, [_row(50, datetime(2025, 5, 12, 10, 45))], on_conflict="update"
+    )
+    day = _rollup(db, "day", datetime(2025, 5, 12))
+    assert (day.count, float(day.sum_value), float(day.max_value)) == (3, 90.0, 50.0)
+
+def test_single_row_crud_keeps_rollups(db):
+    created = crud.create_metric(db, 1, 1, "followers", 10, datetime(2025, 5, 12, 10, 5))
+    crud.create_metric(db, 1, 1, "followers", 20, datetime(2025, 5, 12, 10, 45))
+    assert _rollup(db, "hour", datetime(2025, 5, 12, 10)).count == 2
+
+    crud.update_metric(db, created.id, value=40)
+    hour = _rollup(db, "hour", datetime(2025, 5, 12, 10))
+    assert (hour.count, float(hour.sum_value), float(hour.max_value)) == (2, 60.0, 40.0)
+
+    crud.delete_metric(db, created.id)
+    hour = _rollup(db, "hour", datetime(2025, 5, 12, 10))
+    assert (hour.count, float(hour.sum_value), float(hour.min_value)) == (1, 20.0, 20.0)
+
+def test_bulk_insert_returning_reports_inserted_rows():
+    db = Mock()
+    crud.bulk_insert_metrics_returning(db, [_row(10, datetime(2025, 5, 12, 10))], on_conflict="update")
+
+    sql = str(db.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (user_id, platform_id, metric_name, collected_at) DO UPDATE" in sql
+    assert "RETURNING" in sql and "xmax = 0" in sql
+
+def test_rollups_follow_rows_written_by_the_insert(db):
+    metric_service.create_metrics_bulk(db, ROWS[:2])
+
+    # Lote concorrente: a linha já gravada por outra transação volta como
+    # sobrescrita (ou nem volta, com "ignore") e não é somada de novo
+    db.query(Metric).filter(Metric.value == 20).update({"value": 25})
+    written = [
+        SimpleNamespace(**{**_row(25, datetime(2025, 5, 12, 10, 45)), "inserted": False}),
+        SimpleNamespace(**{**_row(30, datetime(2025, 5, 12, 10, 50)), "inserted": True}),
+    ]
+    for row in written:
+        row.collected_at = datetime.fromisoformat(row.collected_at)
+    db.add(Metric(user_id=1, platform_id=1, metric_name="followers", value=30,
+                  collected_at=datetime(2025, 5, 12, 10, 50)))
+    db.flush()
+
+    rollup_service.sync_written_metrics(db, written)
+
+    hour = _rollup(db, "hour", datetime(2025, 5, 12, 10))
+    assert (hour.count, float(hour.sum_value), float(hour.max_value)) == (3, 65.0, 30.0)
+
+def test_reads_match_raw_queries(db, monkeypatch):
+    metric_service.create_metrics_bulk(db, ROWS)
+    periods = [
+        (None, None),
+        (datetime(2025, 5, 12), datetime(2025, 5, 19)),  # semanas alinhadas
+        (datetime(2025, 5, 12, 10), datetime(2025, 5, 12, 11, 15)),  # fora do alinhamento
+    ]
+
+    with_rollups = []
+    for start, end in periods:
+        with_rollups.append((
+            metric_service.calculate_metrics(db, start, end),
+            metric_service.get_platform_metrics(db, 2, start, end),
+            metric_service.get_user_metrics(db, 1, start, end),
+        ))
+
+    monkeypatch.setattr(metric_service.settings, "METRIC_ROLLUPS_ENABLED", False)
+    for (start, end), expected in zip(periods, with_rollups):
+        calculated, platform, user = expected
+        assert calculated == pytest.approx(metric_service.calculate_metrics(db, start, end))
+
+        raw_platform = metric_service.get_platform_metrics(db, 2, start, end)
+        assert platform["total_metrics"] == raw_platform["total_metrics"]
+        assert platform["unique_users"] == raw_platform["unique_users"]
+        assert sorted(platform["metric_types"]) == sorted(raw_platform["metric_types"])
+
+        raw_user = metric_service.get_user_metrics(db, 1, start, end)
+        assert user["total_metrics"] == raw_user["total_metrics"]
+        assert sorted(user["platforms_used"]) == sorted(raw_user["platforms_used"])
+
+def test_rebuild_rollups_backfills_existing_metrics(db):
+    metrics = [
+        Metric(
+            user_id=row["user_id"],
+            platform_id=row["platform_id"],
+            metric_name=row["metric_name"],
+            value=row["value"],
+            collected_at=datetime.fromisoformat(row["collected_at"])
+        )
+        for row in ROWS
+    ]
+    db.add_all(metrics)
+    db.commit()
+    assert db.query(MetricRollup).count() == 0
+
+    processed = rollup_service.rebuild_rollups(db)
+
+    assert processed == len(ROWS)
+    week = _rollup(db, "week", datetime(2025, 5, 12))
+    assert (week.count, float(week.sum_value)) == (3, 60.0)
+
+    # Reexecutar não duplica os intervalos
+    rollup_service.rebuild_rollups(db)
+    assert _rollup(db, "week", datetime(2025, 5, 12)).count == 3
@@ -0,0 +1,103 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+from app.utils.pagination import CursorStore, cursor_store, iter_pages
+
+fakeredis = pytest.importorskip("fakeredis")
+
+PAGES = {None: (["a", "b"], "c1"), "c1": (["c", "d"], "c2"), "c2": (["e"], None)}
+
+@pytest.fixture
+def store():
+    return CursorStore(redis_client=fakeredis.FakeRedis())
+
+def _fetcher(fetched):
+    async def fetch_page(cursor):
+        fetched.append(cursor)
+        await asyncio.sleep(0)
+        return PAGES[cursor]
+    return fetch_page
+
+@pytest.mark.asyncio
+async def test_follows_cursors_and_prefetches_next_page(store):
+    fetched = []
+    items = []
+
+    async for item in iter_pages(_fetcher(fetched), resume_key="test", store=store):
+        items.append(item)
+        if item == "a":
+            await asyncio.sleep(0.01)
+            # A próxima página já foi pedida enquanto a atual é consumida
+            assert fetched == [None, "c1"]
+
+    assert items == ["a", "b", "c", "d", "e"]
+    assert store.get("test") is None
+
+@pytest.mark.asyncio
+async def test_interrupted_iteration_resumes_from_saved_cursor(store):
+    fetched = []
+    pages = iter_pages(_fetcher(fetched), resume_key="test", store=store)
+    async for item in pages:
+        if item == "c":
+            break
+    await pages.aclose()
+    assert store.get("test") == "c1"
+
+    fetched.clear()
+    items = [item async for item in iter_pages(_fetcher(fetched), resume_key="test", store=store)]
+    assert fetched[0] == "c1"
+    assert items == ["c", "d", "e"]
+
+    # Sem resume, começa do início mesmo com cursor salvo
+    store.save("test", "c2")
+    items = [item async for item in iter_pages(_fetcher([]), resume_key="test", resume=False, store=store)]
+    assert items[0] == "a"
+
+@pytest.mark.asyncio
+async def test_tweets_iterator_uses_next_token(monkeypatch):
+    from app.services.twitter_service import TwitterService
+
+    monkeypatch.setattr(TwitterService, "_setup_oauth", lambda self: setattr(
+        self, "oauth", MagicMock(token={"access_token": "tw-token"})
+    ))
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.params.get("pagination_token"))
+        if request.url.params.get("pagination_token") == "t2":
+            return httpx.Response(200, json={"data": [{"id": "3"}], "meta": {"result_count": 1}})
+        return httpx.Response(200, json={"data": [{"id": "1"}, {"id": "2"}], "meta": {"next_token": "t2"}})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch("app.core.social_api.get_async_client", return_value=client), \
+         patch("app.core.social_api.SocialAPI._quota_slot", return_value=MagicMock()), \
+         patch.object(cursor_store, "_redis", fakeredis.FakeRedis()):
+        tweets = [tweet["id"] async for tweet in TwitterService().iter_tweets("tw-1", page_size=500)]
+    await client.aclose()
+
+    assert tweets == ["1", "2", "3"]
+    assert seen == [None, "t2"]
+
+@pytest.mark.asyncio
+async def test_facebook_posts_iterator_follows_graph_paging():
+    from app.services.facebook_service import FacebookService
+
+    def handler(request):
+        after = request.url.params.get("after")
+        if after == "cur1":
+            return httpx.Response(200, json={"data": [{"id": "p2"}], "paging": {"cursors": {"after": "cur2"}}})
+        return httpx.Response(200, json={
+            "data": [{"id": "p1"}],
+            "paging": {"cursors": {"after": "cur1"}, "next": "https://graph.facebook.com/next"}
+        })
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch("app.core.social_api.get_async_client", return_value=client), \
+         patch("app.core.social_api.SocialAPI._quota_slot", return_value=MagicMock()), \
+         patch.object(cursor_store, "_redis", fakeredis.FakeRedis()):
+        posts = [post["id"] async for post in FacebookService().iter_facebook_posts("page-1")]
+    await client.aclose()
+
+    # Sem `paging.next` a última página encerra a iteração
+    assert posts == ["p1", "p2"]
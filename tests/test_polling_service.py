@@ -0,0 +1,88 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.db.models import Metric, Platform, User
+from app.services import polling_service
+from app.utils.collection_schedule import CollectionScheduler
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Platform(id=1, name="Facebook"))
+    session.add_all([
+        User(id=1, username="active", email="a@test.com", hashed_password="x", platform_id=1, platform_user_id="busy"),
+        User(id=2, username="flat", email="b@test.com", hashed_password="x", platform_id=1, platform_user_id="quiet"),
+    ])
+    start = datetime.now(timezone.utc) - timedelta(hours=6)
+    for hour in range(6):
+        collected_at = start + timedelta(hours=hour)
+        session.add(Metric(user_id=1, platform_id=1, metric_name="followers", value=1000 + 500 * hour, collected_at=collected_at))
+        session.add(Metric(user_id=2, platform_id=1, metric_name="followers", value=500, collected_at=collected_at))
+    session.commit()
+    yield session
+    session.close()
+
+@pytest.fixture
+def scheduler():
+    scheduler = CollectionScheduler(redis_client=fakeredis.FakeRedis(), shards=2, tick=0.01)
+    scheduler.sync([("facebook", "busy"), ("facebook", "quiet"), ("facebook", "new")])
+    return scheduler
+
+def _intervals(scheduler):
+    return {entry["account_id"]: entry for entry in polling_service.schedule_report(scheduler=scheduler)}
+
+def test_ewma_change_rate():
+    start = datetime(2025, 1, 1)
+    points = [(start + timedelta(hours=n), value) for n, value in enumerate([100, 110, 110, 121])]
+
+    rate, samples = polling_service.ewma_change_rate(points, alpha=0.5)
+    assert samples == 3
+    # 10%/h, depois 0 e 10%/h de novo
+    assert rate == pytest.approx(0.5 * 0.1 + 0.5 * (0.5 * 0 + 0.5 * 0.1))
+    assert polling_service.ewma_change_rate(points[:1]) == (None, 0)
+
+def test_interval_follows_change_rate_within_bounds(monkeypatch):
+    settings = polling_service.settings
+    monkeypatch.setattr(settings, "ADAPTIVE_TARGET_CHANGE", 0.01)
+    monkeypatch.setattr(settings, "ADAPTIVE_MIN_INTERVAL", 300.0)
+    monkeypatch.setattr(settings, "ADAPTIVE_MAX_INTERVAL", 21600.0)
+    monkeypatch.setattr(settings, "ADAPTIVE_MIN_SAMPLES", 3)
+
+    # 1%/h: 1% de variação a cada hora
+    assert polling_service.adapted_interval(0.01, 5, 900)[0] == pytest.approx(3600)
+    assert polling_service.adapted_interval(10.0, 5, 900)[0] == 300.0
+    assert polling_service.adapted_interval(0.0, 5, 900) == (21600.0, "sem variação no histórico: intervalo máximo")
+    assert polling_service.adapted_interval(0.5, 1, 900)[0] == 900
+
+def test_adapt_intervals_from_metric_history(db, scheduler):
+    assert polling_service.adapt_intervals(db, scheduler=scheduler) == 3
+
+    report = _intervals(scheduler)
+    assert report["busy"]["interval"] == polling_service.settings.ADAPTIVE_MIN_INTERVAL
+    assert report["busy"]["change_rate"] > 0.1
+    assert "limitado" in report["busy"]["reason"]
+    assert report["quiet"]["interval"] == polling_service.settings.ADAPTIVE_MAX_INTERVAL
+    assert report["new"]["interval"] == scheduler.default_interval("facebook")
+    assert "histórico insuficiente" in report["new"]["reason"]
+
+def test_webhook_boost_overrides_learned_interval(db, scheduler):
+    polling_service.adapt_intervals(db, scheduler=scheduler)
+    polling_service.boost("facebook", ["quiet", "untracked"], scheduler=scheduler)
+
+    report = _intervals(scheduler)
+    assert report["quiet"]["boosted"] is True
+    assert report["quiet"]["interval"] == polling_service.settings.ADAPTIVE_MIN_INTERVAL
+    assert "webhook" in report["quiet"]["reason"]
+    assert "untracked" not in report
+
+    # Enquanto o reforço vale, o recálculo não mexe na conta
+    assert polling_service.adapt_intervals(db, scheduler=scheduler) == 2
+    scheduler.redis.delete("collect:boost:facebook:quiet")
+    polling_service.adapt_intervals(db, scheduler=scheduler)
+    assert _intervals(scheduler)["quiet"]["interval"] == polling_service.settings.ADAPTIVE_MAX_INTERVAL
@@ -0,0 +1,89 @@
+import json
+import time
+import pytest
+from app.utils.rate_budget import BudgetStore, parse_graph_headers, parse_twitter_headers
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def _graph_headers(call_count, regain=0):
+    return {
+        "X-App-Usage": json.dumps({"call_count": 10, "total_cputime": 5, "total_time": 5}),
+        "X-Business-Use-Case-Usage": json.dumps({
+            "1234": [{
+                "type": "pages", "call_count": call_count, "total_cputime": 1,
+                "total_time": 1, "estimated_time_to_regain_access": regain
+            }]
+        })
+    }
+
+@pytest.fixture
+def store():
+    return BudgetStore(redis_client=fakeredis.FakeRedis(), local_ttl=0)
+
+class TestHeaderParsers:
+    def test_twitter_headers(self):
+        reset = time.time() + 900
+
+        budget = parse_twitter_headers({
+            "x-rate-limit-limit": "900", "x-rate-limit-remaining": "225", "x-rate-limit-reset": str(reset)
+        })
+        assert budget.usage == pytest.approx(0.75)
+        assert budget.blocked_until == 0
+
+        exhausted = parse_twitter_headers({
+            "X-Rate-Limit-Limit": "900", "X-Rate-Limit-Remaining": "0", "X-Rate-Limit-Reset": str(reset)
+        })
+        assert exhausted.usage == 1.0
+        assert exhausted.blocked_until == pytest.approx(reset)
+
+    def test_graph_headers_use_the_highest_usage(self):
+        budget = parse_graph_headers(_graph_headers(call_count=80))
+
+        assert budget.usage == pytest.approx(0.8)
+        assert budget.blocked_until == 0
+
+    def test_graph_regain_access_blocks(self):
+        budget = parse_graph_headers(_graph_headers(call_count=100, regain=19))
+
+        assert budget.usage == 1.0
+        assert budget.blocked_until == pytest.approx(time.time() + 19 * 60, abs=5)
+
+    def test_missing_headers(self):
+        assert parse_twitter_headers({}) is None
+        assert parse_graph_headers({"content-type": "application/json"}) is None
+
+class TestBudgetStore:
+    def test_throughput_drops_and_ramps_back(self, store):
+        store.observe("facebook", _graph_headers(call_count=90))
+        assert store.scale("facebook") == pytest.approx(0.2)
+
+        # Com folga a vazão sobe em passos, não de uma vez
+        store.observe("facebook", _graph_headers(call_count=20))
+        assert store.scale("facebook") == pytest.approx(0.3)
+        for _ in range(10):
+            store.observe("facebook", _graph_headers(call_count=20))
+        assert store.scale("facebook") == 1.0
+
+    def test_state_is_shared_between_workers(self, store):
+        other_worker = BudgetStore(redis_client=store.redis, local_ttl=0)
+        store.observe("twitter", {
+            "x-rate-limit-limit": "100", "x-rate-limit-remaining": "0", "x-rate-limit-reset": str(time.time() + 60)
+        })
+
+        assert 55 < other_worker.delay("twitter") <= 60
+        assert other_worker.scale("twitter") == pytest.approx(0.1)
+
+    def test_twitter_budget_is_scoped_and_graph_is_app_wide(self, store):
+        store.observe("twitter", {"x-rate-limit-limit": "100", "x-rate-limit-remaining": "5"}, "users/{id}:abc")
+        assert store.scale("twitter", "users/{id}:abc") == pytest.approx(0.1)
+        assert store.scale("twitter", "tweets:abc") == 1.0
+
+        # X-App-Usage vale para o app inteiro, qualquer que seja o endpoint
+        store.observe("facebook", _graph_headers(call_count=90), "{id}/posts:abc")
+        assert store.scale("facebook", "{id}/insights:def") == pytest.approx(0.2)
+
+    def test_unknown_platform_and_invalid_headers_are_ignored(self, store):
+        assert store.observe("whatsapp", {"x-rate-limit-remaining": "0"}) is None
+        assert store.observe("facebook", {"X-App-Usage": "not json"}) is None
+        assert store.delay("facebook") == 0
+        assert store.scale("facebook") == 1.0
@@ -1,63 +1,407 @@
-import pytest
+import asyncio
+import threading
 import time
-from unittest.mock import patch, MagicMock
-from app.utils.rate_limiter import rate_limited, Platform, Priority
-from app.utils.api_cache import cache
-
-class TestRateLimiter:
-    @patch('app.utils.rate_limiter.cache')
-    def test_platform_limits(self, mock_cache):
-        """Testa se os limites por plataforma são respeitados"""
-        mock_cache.get.return_value = {'count': 0, 'start_time': time.time()}
-        
-        @rate_limited(Platform.FACEBOOK)
-        def mock_facebook_call():
+import pytest
+from app.utils import rate_limiter
+from app.utils.rate_budget import BudgetStore
+from app.utils.rate_limiter import (
+    DistributedRateLimiter, Platform, Priority, PriorityScheduler, RateLimitExceeded, RateLimitResult,
+    rate_limit_key, rate_limited
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+@pytest.fixture(autouse=True)
+def budget(redis_client, monkeypatch):
+    """Orçamento das plataformas no Redis falso"""
+    store = BudgetStore(redis_client=redis_client)
+    monkeypatch.setattr(rate_limiter, "budget_store", store)
+    return store
+
+@pytest.fixture
+def platform_limiters(redis_client, monkeypatch):
+    """Limitadores de plataforma apontando para o Redis falso"""
+    limiters = {
+        platform: DistributedRateLimiter(limit, redis_client=redis_client)
+        for platform, limit in rate_limiter.PLATFORM_LIMITS.items()
+    }
+    monkeypatch.setattr(rate_limiter, "_limiters", limiters)
+    monkeypatch.setattr(rate_limiter, "_schedulers", {})
+    return limiters
+
+class ManualLimiter:
+    """Limitador controlado pelo teste: só libera as vagas concedidas"""
+
+    def __init__(self):
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def release(self, count=1):
+        with self._lock:
+            self.tokens += count
+
+    def acquire(self, key, cost=1, **kwargs):
+        with self._lock:
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return RateLimitResult(allowed=True, retry_after=0.0, remaining=self.tokens)
+        return RateLimitResult(allowed=False, retry_after=0.01, remaining=0)
+
+class KeyedLimiter:
+    """Vagas por chave, controladas pelo teste"""
+
+    def __init__(self, grant_delay=0.0):
+        self.tokens = {}
+        self.grant_delay = grant_delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def release(self, key, count=1):
+        with self._lock:
+            self.tokens[key] = self.tokens.get(key, 0) + count
+
+    def acquire(self, key, cost=1, **kwargs):
+        with self._lock:
+            self.calls.append(key)
+            allowed = self.tokens.get(key, 0) >= cost
+            if allowed:
+                self.tokens[key] -= cost
+        if not allowed:
+            return RateLimitResult(allowed=False, retry_after=0.05, remaining=0)
+        time.sleep(self.grant_delay)
+        return RateLimitResult(allowed=True, retry_after=0.0, remaining=0)
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+class TestDistributedRateLimiter:
+    def test_burst_then_exact_retry_after(self, redis_client):
+        limiter = DistributedRateLimiter(limit=5, period=1.0, redis_client=redis_client)
+
+        results = [limiter.acquire("rate_limit:test") for _ in range(5)]
+        assert all(result.allowed for result in results)
+        assert [result.remaining for result in results] == [4, 3, 2, 1, 0]
+
+        denied = limiter.acquire("rate_limit:test")
+        assert not denied.allowed
+        # Próxima vaga abre após um intervalo de emissão (1s / 5)
+        assert 0.15 < denied.retry_after <= 0.2
+
+    def test_denied_calls_do_not_consume_quota(self, redis_client):
+        limiter = DistributedRateLimiter(limit=2, period=10.0, redis_client=redis_client)
+        limiter.acquire("rate_limit:test")
+        limiter.acquire("rate_limit:test")
+
+        first = limiter.acquire("rate_limit:test")
+        second = limiter.acquire("rate_limit:test")
+
+        assert not first.allowed and not second.allowed
+        assert second.retry_after <= first.retry_after
+
+    def test_atomic_across_threads(self, redis_client):
+        limiter = DistributedRateLimiter(limit=10, period=60.0, redis_client=redis_client)
+        allowed = []
+
+        def worker():
+            for _ in range(5):
+                allowed.append(limiter.acquire("rate_limit:shared").allowed)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert allowed.count(True) == 10
+
+    def test_keys_are_isolated_per_token(self, redis_client):
+        limiter = DistributedRateLimiter(limit=1, period=60.0, redis_client=redis_client)
+        first = rate_limit_key(Platform.TWITTER, "get_user", "token-a")
+        second = rate_limit_key(Platform.TWITTER, "get_user", "token-b")
+
+        assert first != second
+        assert "token-a" not in first
+        assert limiter.acquire(first).allowed
+        assert limiter.acquire(second).allowed
+        assert not limiter.acquire(first).allowed
+
+class TestPriorityScheduler:
+    def _enqueue(self, scheduler, priority, order):
+        def call():
+            scheduler.acquire("key", priority)
+            order.append(priority)
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        assert _wait_for(lambda: scheduler.stats()["queue_depth"][priority.name] == 1)
+        return thread
+
+    def test_releases_by_priority(self):
+        limiter = ManualLimiter()
+        scheduler = PriorityScheduler(Platform.FACEBOOK, limiter=limiter, aging=60)
+        order = []
+        threads = [self._enqueue(scheduler, priority, order) for priority in (Priority.LOW, Priority.MEDIUM, Priority.HIGH)]
+
+        for expected in range(1, 4):
+            limiter.release()
+            assert _wait_for(lambda: len(order) == expected)
+        for thread in threads:
+            thread.join()
+
+        assert order == [Priority.HIGH, Priority.MEDIUM, Priority.LOW]
+        stats = scheduler.stats()
+        assert stats["queue_depth"] == {"HIGH": 0, "MEDIUM": 0, "LOW": 0}
+        assert stats["wait_time"]["LOW"]["max"] >= stats["wait_time"]["HIGH"]["max"] > 0
+
+    def test_aging_prevents_starvation(self):
+        limiter = ManualLimiter()
+        scheduler = PriorityScheduler(Platform.TWITTER, limiter=limiter, aging=0.05)
+        order = []
+        threads = [self._enqueue(scheduler, Priority.LOW, order)]
+        time.sleep(0.15)  # LOW já esperou mais que 2 níveis de aging
+        threads.append(self._enqueue(scheduler, Priority.HIGH, order))
+
+        for expected in range(1, 3):
+            limiter.release()
+            assert _wait_for(lambda: len(order) == expected)
+        for thread in threads:
+            thread.join()
+
+        assert order == [Priority.LOW, Priority.HIGH]
+
+    def test_timeout_leaves_the_queue(self):
+        scheduler = PriorityScheduler(Platform.TIKTOK, limiter=ManualLimiter())
+
+        with pytest.raises(RateLimitExceeded):
+            scheduler.acquire("key", Priority.LOW, max_wait=0.05)
+
+        stats = scheduler.stats()
+        assert stats["timeouts"] == 1
+        assert stats["queue_depth"]["LOW"] == 0
+
+    def test_exhausted_key_does_not_block_other_keys(self):
+        limiter = KeyedLimiter()
+        scheduler = PriorityScheduler(Platform.FACEBOOK, limiter=limiter, aging=60)
+        order = []
+
+        def call(key, priority):
+            scheduler.acquire(key, priority)
+            order.append(key)
+
+        blocked = threading.Thread(target=call, args=("exhausted", Priority.HIGH))
+        blocked.start()
+        assert _wait_for(lambda: scheduler.stats()["queue_depth"]["HIGH"] == 1)
+
+        # Chave com vaga passa direto, mesmo com outra chave na fila
+        limiter.release("free", 2)
+        scheduler.acquire("free", Priority.LOW, max_wait=0.5)
+
+        # Na fila, a chave com vaga é liberada antes da cabeça esgotada
+        queued = threading.Thread(target=call, args=("other", Priority.LOW))
+        queued.start()
+        assert _wait_for(lambda: scheduler.stats()["queue_depth"]["LOW"] == 1)
+        limiter.release("other")
+        assert _wait_for(lambda: order == ["other"])
+
+        limiter.release("exhausted")
+        blocked.join(timeout=3)
+        queued.join(timeout=3)
+        assert order == ["other", "exhausted"]
+
+    def test_grant_of_cancelled_waiter_goes_to_next(self):
+        limiter = KeyedLimiter(grant_delay=0.3)
+        scheduler = PriorityScheduler(Platform.TIKTOK, limiter=limiter, aging=60)
+        results = []
+
+        def call(max_wait):
+            try:
+                results.append(scheduler.acquire("key", Priority.HIGH, max_wait=max_wait))
+            except RateLimitExceeded:
+                results.append("timeout")
+
+        first = threading.Thread(target=call, args=(0.1,))
+        first.start()
+        assert _wait_for(lambda: scheduler.stats()["queue_depth"]["HIGH"] == 1)
+        second = threading.Thread(target=call, args=(5,))
+        second.start()
+        assert _wait_for(lambda: scheduler.stats()["queue_depth"]["HIGH"] == 2)
+
+        # A única vaga é concedida depois que a primeira chamada desistiu
+        limiter.release("key")
+        first.join()
+        second.join()
+
+        assert results[0] == "timeout"
+        assert isinstance(results[1], float)
+        assert limiter.tokens["key"] == 0
+
+    @pytest.mark.asyncio
+    async def test_async_waiters_share_the_queue(self):
+        limiter = ManualLimiter()
+        scheduler = PriorityScheduler(Platform.INSTAGRAM, limiter=limiter, aging=60)
+        order = []
+
+        async def call(priority):
+            await scheduler.acquire_async("key", priority)
+            order.append(priority)
+
+        tasks = [asyncio.ensure_future(call(priority)) for priority in (Priority.LOW, Priority.HIGH)]
+        while sum(scheduler.stats()["queue_depth"].values()) < 2:
+            await asyncio.sleep(0.01)
+        limiter.release(2)
+        await asyncio.gather(*tasks)
+
+        assert order == [Priority.HIGH, Priority.LOW]
+
+class TestRateLimitedDecorator:
+    def test_platform_limits(self, platform_limiters):
+        @rate_limited(Platform.FACEBOOK, max_wait=0)
+        def facebook_call():
             return "facebook_success"
-            
-        @rate_limited(Platform.TWITTER) 
-        def mock_twitter_call():
-            return "twitter_success"
-        
-        # Primeiras chamadas devem passar
-        assert mock_facebook_call() == "facebook_success"
-        assert mock_twitter_call() == "twitter_success"
-        
-        # Simular limite atingido
-        mock_cache.get.return_value = {'count': 5, 'start_time': time.time()}
-        with pytest.raises(Exception):
-            mock_facebook_call()
-
-    @patch('app.utils.rate_limiter.cache')
-    def test_priority_queue(self, mock_cache):
-        """Testa o sistema de prioridades na fila de espera"""
-        mock_cache.get.return_value = {'count': 5, 'start_time': time.time()}
-        
-        @rate_limited(Platform.INSTAGRAM, Priority.HIGH)
-        def high_priority_call():
-            return "high_priority"
-            
-        @rate_limited(Platform.INSTAGRAM, Priority.LOW)
-        def low_priority_call():
-            return "low_priority"
-        
-        # Chamadas devem ser enfileiradas
-        result = high_priority_call()
-        assert "high_priority" in result
-        
-    @patch('app.utils.rate_limiter.time.sleep')
-    def test_wait_time_calculation(self, mock_sleep):
-        """Testa o cálculo do tempo de espera"""
-        with patch('app.utils.rate_limiter.cache') as mock_cache:
-            mock_cache.get.return_value = {
-                'count': 5, 
-                'start_time': time.time() - 0.5  # 0.5 segundos passados
-            }
-            
-            @rate_limited(Platform.TIKTOK)
-            def tiktok_call():
-                pass
-                
+
+        for _ in range(rate_limiter.PLATFORM_LIMITS[Platform.FACEBOOK]):
+            assert facebook_call() == "facebook_success"
+
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            facebook_call()
+        assert 0 < exc_info.value.retry_after <= 0.2
+
+    def test_throttled_calls_wait_in_queue(self, platform_limiters):
+        @rate_limited(Platform.TIKTOK, Priority.HIGH, max_wait=5)
+        def tiktok_call():
+            return "ok"
+
+        for _ in range(rate_limiter.PLATFORM_LIMITS[Platform.TIKTOK]):
             tiktok_call()
-            mock_sleep.assert_called_once()
-            sleep_time = mock_sleep.call_args[0][0]
-            assert 0.4 < sleep_time < 0.6  # Devia esperar ~0.5s
\ No newline at end of file
+
+        assert tiktok_call() == "ok"
+        wait_time = rate_limiter.get_scheduler(Platform.TIKTOK).stats()["wait_time"]["HIGH"]
+        assert 0.2 < wait_time["max"] < 0.4  # Devia esperar ~1/4s
+
+    @pytest.mark.asyncio
+    async def test_async_calls_share_the_limit(self, platform_limiters):
+        @rate_limited(Platform.INSTAGRAM, endpoint="media", token="abc", max_wait=0)
+        async def instagram_call():
+            return "ok"
+
+        results = await asyncio.gather(
+            *(instagram_call() for _ in range(3)), return_exceptions=True
+        )
+
+        assert results.count("ok") == 2
+        assert isinstance(results[-1], RateLimitExceeded)
+
+class TestAdaptiveLimits:
+    def test_reported_usage_scales_the_limit(self, platform_limiters, budget):
+        budget.observe("facebook", {"X-App-Usage": '{"call_count": 95, "total_cputime": 10, "total_time": 10}'})
+        scheduler = rate_limiter.get_scheduler(Platform.FACEBOOK)
+        key = rate_limit_key(Platform.FACEBOOK, "api")
+
+        # 5 chamadas/s reduzidas a 10%: só a primeira passa na rajada
+        scheduler.acquire(key, max_wait=0)
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            scheduler.acquire(key, max_wait=0)
+        assert exc_info.value.retry_after > 1.5
+
+    def test_blocked_endpoint_fails_fast(self, platform_limiters, budget):
+        key = rate_limit_key(Platform.TWITTER, "api")
+        budget.observe("twitter", {
+            "x-rate-limit-limit": "900", "x-rate-limit-remaining": "0", "x-rate-limit-reset": str(time.time() + 600)
+        }, rate_limiter.quota_scope(key))
+        scheduler = rate_limiter.get_scheduler(Platform.TWITTER)
+
+        started = time.monotonic()
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            scheduler.acquire(key, max_wait=5)
+
+        assert time.monotonic() - started < 1
+        assert 590 < exc_info.value.retry_after <= 600
+
+        # Outros endpoints do Twitter têm cota própria e seguem liberados
+        scheduler.acquire(rate_limit_key(Platform.TWITTER, "other"), max_wait=0)
+
+class TestTenantQuotas:
+    @pytest.fixture
+    def quota_redis(self, redis_client, monkeypatch, platform_limiters):
+        monkeypatch.setattr(rate_limiter.cache, "redis_client", redis_client)
+        return redis_client
+
+    def test_peek_does_not_consume(self, redis_client):
+        limiter = DistributedRateLimiter(limit=2, period=60.0, redis_client=redis_client)
+
+        assert limiter.peek("rate_limit:test").remaining == 2
+        limiter.acquire("rate_limit:test")
+        assert limiter.peek("rate_limit:test").remaining == 1
+        assert limiter.peek("rate_limit:test").remaining == 1
+
+    def test_heavy_tenant_cannot_starve_others(self):
+        limiter = ManualLimiter()
+        scheduler = PriorityScheduler(Platform.FACEBOOK, limiter=limiter, aging=60, fair_share_spacing=1.0)
+        order = []
+
+        def call(tenant):
+            scheduler.acquire("key", Priority.MEDIUM, tenant=tenant)
+            order.append(tenant)
+
+        threads = []
+        for tenant in ["heavy"] * 5 + ["light"]:
+            thread = threading.Thread(target=call, args=(tenant,))
+            thread.start()
+            threads.append(thread)
+            queued = len(threads)
+            assert _wait_for(lambda: scheduler.stats()["queue_depth"]["MEDIUM"] == queued)
+
+        for expected in range(1, 3):
+            limiter.release()
+            assert _wait_for(lambda: len(order) == expected)
+        limiter.release(4)
+        for thread in threads:
+            thread.join()
+
+        # O tenant que chegou por último é atendido logo após a primeira vaga do pesado
+        assert order[:2] == ["heavy", "light"]
+        assert scheduler.stats()["tenants"]["heavy"] == {"queued": 0, "granted": 5, "rejected": 0}
+
+    def test_quota_report_per_tenant(self, quota_redis):
+        scheduler = rate_limiter.get_scheduler(Platform.TWITTER)
+        key_a = rate_limit_key(Platform.TWITTER, "users/{id}", "token-a")
+        key_b = rate_limit_key(Platform.TWITTER, "users/{id}", "token-b")
+        scheduler.acquire(key_a, tenant="user-1")
+        scheduler.acquire(key_a, tenant="user-1")
+        scheduler.acquire(key_b, tenant="user-2")
+
+        report = {entry["tenant"]: entry for entry in rate_limiter.quota_report(platform=Platform.TWITTER)}
+
+        limit = rate_limiter.PLATFORM_LIMITS[Platform.TWITTER]
+        assert report["user-1"]["remaining"] == limit - 2
+        assert report["user-2"]["remaining"] == limit - 1
+        assert report["user-1"]["endpoint"] == "users/{id}"
+        assert report["user-1"]["credential"] != report["user-2"]["credential"]
+        assert rate_limiter.quota_report(tenant="user-2")[0]["tenant"] == "user-2"
+
+    def test_admin_endpoint(self, quota_redis, monkeypatch):
+        from fastapi import HTTPException
+        from app.services.twitter_service import TwitterService
+        # O pacote de endpoints instancia o TwitterService na importação
+        monkeypatch.setattr(TwitterService, "_setup_oauth", lambda self: None)
+        from app.api.endpoints.admin import read_rate_limits
+
+        rate_limiter.get_scheduler(Platform.FACEBOOK).acquire(
+            rate_limit_key(Platform.FACEBOOK, "{id}", "page-token"), tenant="user-9"
+        )
+
+        body = read_rate_limits(platform="facebook", tenant="user-9")
+        assert [entry["remaining"] for entry in body["quotas"]] == [rate_limiter.PLATFORM_LIMITS[Platform.FACEBOOK] - 1]
+        assert body["schedulers"]["FACEBOOK"]["tenants"]["user-9"]["granted"] == 1
+
+        with pytest.raises(HTTPException):
+            read_rate_limits(platform="myspace", tenant=None)
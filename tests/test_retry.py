@@ -1,10 +1,12 @@
 import pytest
 from unittest.mock import patch, MagicMock
 import asyncio
-from app.utils.retry import retry_request, BackoffStrategy, CircuitBreaker
+from app.utils.retry import retry_request, BackoffStrategy, CircuitBreaker, RetryBudget, RetryPolicy, retry_after
 from fastapi import HTTPException
 import httpx
 import logging
+import requests
+import time
 
 class TestRetryMechanism:
     @patch('app.utils.retry.time.sleep')
@@ -83,4 +85,89 @@ class TestRetryMechanism:
                 await test_func()
                 
             # Verifica se usou o nível de log correto
-            assert mock_log.call_args[0][0] == logging.DEBUG
\ No newline at end of file
+            assert mock_log.call_args[0][0] == logging.DEBUG
+
+
+def _http_error(status, headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request("GET", "http://test.com"))
+    return httpx.HTTPStatusError(f"HTTP {status}", request=response.request, response=response)
+
+class TestRetryPolicy:
+    @patch('app.utils.retry.time.sleep')
+    def test_retries_only_transient_errors(self, mock_sleep):
+        calls = MagicMock(side_effect=[requests.exceptions.ConnectionError("reset"), _http_error(503), "ok"])
+
+        @RetryPolicy(max_retries=2, initial_delay=1)
+        def call():
+            return calls()
+
+        assert call() == "ok"
+        assert calls.call_count == 3
+
+        for error in (ValueError("bug"), _http_error(404)):
+            calls.reset_mock(side_effect=True)
+            calls.side_effect = error
+            with pytest.raises(type(error)):
+                call()
+            assert calls.call_count == 1
+
+    @patch('app.utils.retry.time.sleep')
+    def test_honors_retry_after(self, mock_sleep):
+        calls = MagicMock(side_effect=[_http_error(429, {"Retry-After": "4"}), "ok"])
+
+        @RetryPolicy(max_retries=2, initial_delay=1)
+        def call():
+            return calls()
+
+        assert call() == "ok"
+        assert mock_sleep.call_args[0][0] == pytest.approx(4, abs=0.2)
+
+    @patch('app.utils.retry.time.sleep')
+    def test_throttling_without_hint_or_long_wait_gives_up(self, mock_sleep):
+        policy = RetryPolicy(max_retries=2, max_retry_after=10)
+        reset = str(int(time.time()) + 900)
+
+        assert policy.next_delay(_http_error(429), 0) is None
+        assert policy.next_delay(_http_error(429, {"x-rate-limit-reset": reset}), 0) is None
+        assert policy.next_delay(_http_error(503, {"Retry-After": "60"}), 0) is None
+        mock_sleep.assert_not_called()
+
+    def test_retry_after_formats(self):
+        reset = str(int(time.time()) + 30)
+
+        assert retry_after(_http_error(503, {"Retry-After": "7"})) == 7
+        assert 0 < retry_after(_http_error(429, {"x-rate-limit-reset": reset})) <= 30
+        # Reset informado em toda resposta do Twitter: só vale com a cota esgotada
+        assert retry_after(_http_error(503, {"x-rate-limit-reset": reset, "x-rate-limit-remaining": "12"})) is None
+        assert retry_after(_http_error(503, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+        assert retry_after(ValueError("bug")) is None
+
+    @patch('app.utils.retry.time.sleep')
+    def test_budget_caps_retries(self, mock_sleep):
+        budget = RetryBudget(ratio=0.1, min_retries=1, window=10)
+        calls = MagicMock(side_effect=requests.exceptions.Timeout("lento"))
+
+        @RetryPolicy(max_retries=3, budget=budget)
+        def call():
+            return calls()
+
+        for _ in range(10):
+            with pytest.raises(requests.exceptions.Timeout):
+                call()
+
+        # 10 requisições: 10% mais 1 retentativa avulsa
+        assert calls.call_count == 12
+        assert budget.stats()["retries"] == 2
+        assert budget.stats()["requests"] == 10
+
+    @pytest.mark.asyncio
+    async def test_async_functions(self):
+        calls = MagicMock(side_effect=[_http_error(502), "ok"])
+
+        @RetryPolicy(max_retries=1)
+        async def call():
+            return calls()
+
+        with patch('asyncio.sleep') as mock_sleep:
+            assert await call() == "ok"
+        assert mock_sleep.await_count == 1
@@ -1,6 +1,11 @@
+import asyncio
 import pytest
+import httpx
+import requests
 from unittest.mock import Mock, patch
+from app.core import http_client
 from app.core.social_api import SocialAPI
+from app.utils.rate_limiter import Platform, RateLimitExceeded, credential_hash, get_scheduler, rate_limit_key
 from app.schemas.social import SocialMediaResponse
 
 class TestSocialAPI:
@@ -22,8 +27,8 @@ class TestSocialAPI:
 
     def test_make_request_retry(self, mock_api):
         mock_api.session.request.side_effect = [
-            Exception("Error 1"),
-            Exception("Error 2"),
+            requests.exceptions.ConnectionError("Error 1"),
+            requests.exceptions.Timeout("Error 2"),
             Mock(json=Mock(return_value={"key": "value"}))
         ]
 
@@ -31,6 +36,59 @@ class TestSocialAPI:
         assert result == {"key": "value"}
         assert mock_api.session.request.call_count == 3
 
+    def test_make_request_does_not_retry_throttled_calls(self, mock_api):
+        response = requests.Response()
+        response.status_code = 429
+        mock_api.session.request.return_value = response
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            mock_api._make_request("GET", "/test")
+        assert mock_api.session.request.call_count == 1
+
+        mock_api.session.request.side_effect = RateLimitExceeded("rate_limit:test", 3.0)
+        with pytest.raises(RateLimitExceeded):
+            mock_api._make_request("GET", "/test")
+        assert mock_api.session.request.call_count == 2
+
+    def test_make_request_feeds_rate_budget(self, mock_api):
+        mock_response = Mock(headers={"X-App-Usage": '{"call_count": 80}'})
+        mock_response.json.return_value = {"key": "value"}
+        mock_api.session.request.return_value = mock_response
+
+        with patch("app.core.social_api.budget_store") as mock_store:
+            mock_api._make_request("GET", "/test")
+
+        mock_store.observe.assert_called_once_with("test", mock_response.headers, None)
+
+    def test_rate_budget_is_scoped_by_endpoint_and_credential(self):
+        api = SocialAPI("twitter")
+        api.session = Mock()
+        api.session.request.return_value = Mock(headers={}, json=Mock(return_value={}))
+
+        with patch("app.core.social_api.budget_store") as mock_store, \
+             patch.object(api, "_quota_slot", return_value=api.rate_limiter):
+            api._make_request("GET", "/users/1", headers={"Authorization": "Bearer user-token"})
+
+        scope = f"users/{{id}}:{credential_hash('Bearer user-token')}"
+        mock_store.observe.assert_called_once_with("twitter", {}, scope)
+
+    def test_known_platforms_use_shared_scheduler(self):
+        api = SocialAPI("facebook")
+        slot = api._quota_slot(*api._quota("/12345/posts", {"access_token": "page-token"}, {}))
+
+        assert api.platform is Platform.FACEBOOK
+        assert slot.scheduler is get_scheduler(Platform.FACEBOOK)
+        assert slot.key == rate_limit_key(Platform.FACEBOOK, "{id}/posts", "page-token")
+        assert slot.tenant == credential_hash("page-token")
+
+    def test_quota_slot_is_per_credential_and_tenant(self):
+        api = SocialAPI("twitter")
+        key, credential = api._quota("/users/1", None, {"Authorization": "Bearer user-token"})
+        slot = api._quota_slot(key, credential, tenant="42")
+
+        assert slot.key == rate_limit_key(Platform.TWITTER, "users/{id}", "Bearer user-token")
+        assert slot.tenant == "42"
+
     def test_validate_response_success(self, mock_api):
         test_data = {
             "platform": "twitter",
@@ -46,4 +104,66 @@ class TestSocialAPI:
 
     def test_validate_response_failure(self, mock_api):
         with pytest.raises(ValueError):
-            mock_api.validate_response(SocialMediaResponse, {"invalid": "data"})
\ No newline at end of file
+            mock_api.validate_response(SocialMediaResponse, {"invalid": "data"})
+
+    @pytest.mark.asyncio
+    async def test_make_request_async_uses_shared_client(self, mock_api):
+        seen = []
+
+        def handler(request):
+            seen.append(request)
+            return httpx.Response(200, json={"key": "value"})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        mock_api.headers = {"X-Default": "1"}
+
+        with patch("app.core.social_api.get_async_client", return_value=client):
+            result = await mock_api._make_request_async(
+                "GET", "/test", params={"a": "b"}
+            )
+
+        assert result == {"key": "value"}
+        assert str(seen[0].url) == "http://test.com/test?a=b"
+        assert seen[0].headers["X-Default"] == "1"
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_make_request_async_retry(self, mock_api):
+        responses = [httpx.Response(503), httpx.Response(200, json={"ok": True})]
+
+        def handler(request):
+            return responses.pop(0)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        with patch("app.core.social_api.get_async_client", return_value=client), \
+             patch("asyncio.sleep") as mock_sleep:
+            result = await mock_api._make_request_async("GET", "/test")
+
+        assert result == {"ok": True}
+        assert mock_sleep.call_count == 1
+        await client.aclose()
+
+@pytest.mark.asyncio
+async def test_async_client_is_shared_and_closable():
+    client = http_client.get_async_client()
+    assert http_client.get_async_client() is client
+
+    await http_client.close_async_client()
+    assert client.is_closed
+    assert http_client.get_async_client() is not client
+    await http_client.close_async_client()
+
+def test_async_client_is_per_event_loop():
+    async def use_client():
+        client = http_client.get_async_client()
+        assert http_client.get_async_client() is client
+        await http_client.close_async_client()
+        return client
+
+    first = asyncio.run(use_client())
+    second = asyncio.run(use_client())
+
+    # Cada loop tem seu próprio pool; um cliente nunca é reutilizado em outro loop
+    assert first is not second
+    assert first.is_closed and second.is_closed
@@ -0,0 +1,123 @@
+import hashlib
+import hmac
+import json
+import pytest
+from unittest.mock import Mock, patch
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from starlette.requests import Request
+from app.utils.dedup import EventDeduplicator
+from app.utils.webhook_stream import WebhookStream
+from app.workers.webhook_consumer import WebhookConsumer, extract_events
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def _page_payload(changes):
+    return {
+        "object": "page",
+        "entry": [{"id": "page-1", "changes": [{"field": "feed", "value": {"n": n}} for n in range(changes)]}]
+    }
+
+@pytest.fixture(autouse=True)
+def deduplicators(monkeypatch):
+    redis_client = fakeredis.FakeRedis()
+    monkeypatch.setattr(
+        "app.workers.webhook_consumer.get_deduplicator",
+        lambda name: EventDeduplicator(name, redis_client=redis_client)
+    )
+
+@pytest.fixture
+def stream():
+    stream = WebhookStream(redis_client=fakeredis.FakeRedis(), key="test:webhooks", group="test-workers", claim_idle=60)
+    stream.ensure_group()
+    return stream
+
+def test_extract_events_only_from_facebook_pages():
+    events = extract_events("facebook", _page_payload(2))
+    assert events == [
+        {"event_type": "feed", "event_data": {"n": 0}, "page_id": "page-1"},
+        {"event_type": "feed", "event_data": {"n": 1}, "page_id": "page-1"}
+    ]
+    assert extract_events("instagram", _page_payload(2)) == []
+    assert extract_events("facebook", {"object": "user"}) == []
+
+def test_consumer_fans_out_in_batches_and_acks(stream):
+    stream.append("facebook", json.dumps(_page_payload(150)).encode())
+    stream.append("facebook", b"not json")
+    stream.append("twitter", b"{}")
+    dispatch = Mock()
+    consumer = WebhookConsumer(stream=stream, consumer="c1", dispatch=dispatch, fanout_batch=100, block_ms=0)
+
+    assert consumer.process_batch() == 3
+
+    # 150 mudanças viram 2 tarefas; o payload inválido é descartado
+    assert [len(call.args[0]) for call in dispatch.call_args_list] == [100, 50]
+    assert stream.stats()["pending"] == 0
+    assert consumer.process_batch() == 0
+
+def test_failed_dispatch_leaves_entries_for_another_worker(stream):
+    stream.append("facebook", json.dumps(_page_payload(1)).encode())
+    failing = WebhookConsumer(stream=stream, consumer="c1", dispatch=Mock(side_effect=ConnectionError), block_ms=0)
+
+    with pytest.raises(ConnectionError):
+        failing.process_batch()
+    assert stream.stats()["pending"] == 1
+
+    dispatch = Mock()
+    stream.claim_idle = 0
+    assert WebhookConsumer(stream=stream, consumer="c2", dispatch=dispatch, block_ms=0).process_batch() == 1
+    assert dispatch.call_count == 1
+    assert stream.stats()["pending"] == 0
+
+@pytest.fixture
+def webhooks(monkeypatch):
+    from app.services.twitter_service import TwitterService
+
+    # O pacote de endpoints instancia TwitterService na importação
+    monkeypatch.setattr(TwitterService, "_setup_oauth", lambda self: setattr(
+        self, "oauth", Mock(token={"access_token": "tw-token"})
+    ))
+    from app.api.endpoints import webhooks
+    return webhooks
+
+def _request(body, headers):
+    request = Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/webhooks/facebook",
+        "headers": [(name.encode(), value.encode()) for name, value in headers.items()]
+    })
+    request.state.verified_body = body
+    return request
+
+def _hub_signature(body):
+    return "sha256=" + hmac.new(b"fb-secret", body, hashlib.sha256).hexdigest()
+
+@pytest.mark.asyncio
+async def test_fast_ack_appends_raw_body_once(stream, webhooks):
+    body = json.dumps(_page_payload(200)).encode()
+    with patch.object(webhooks, "webhook_stream", stream), \
+         patch.object(webhooks.settings, "FACEBOOK_APP_SECRET", "fb-secret"), \
+         patch.object(webhooks.settings, "WEBHOOK_FAST_ACK", True):
+        response = await webhooks.handle_webhook("facebook", _request(body, {"x-hub-signature-256": _hub_signature(body)}))
+
+        assert response.status_code == 200
+        entries = stream.redis.xrange(stream.key)
+        assert len(entries) == 1
+        assert entries[0][1][b"body"] == body
+
+        with pytest.raises(HTTPException) as error:
+            await webhooks.handle_webhook("facebook", _request(body, {"x-hub-signature-256": "sha256=00"}))
+        assert error.value.status_code == 401
+
+@pytest.mark.asyncio
+async def test_fast_ack_fails_when_payload_cannot_be_stored(webhooks):
+    broken = Mock()
+    broken.append.side_effect = RedisError("down")
+    with patch.object(webhooks, "webhook_stream", broken), \
+         patch.object(webhooks.settings, "WEBHOOK_FAST_ACK", True):
+        with pytest.raises(HTTPException) as error:
+            await webhooks.handle_webhook("twitter", _request(b"{}", {}))
+
+    # 503 faz a plataforma reenviar em vez de perder o evento
+    assert error.value.status_code == 503